@@ -19,6 +19,8 @@ from app.models.user import User
 from app.models.account import BankAccount
 from app.models.transaction import Transaction
 from app.models.deposit import Deposit
+from app.models.transfer_batch import TransferBatch
+from app.models.balance_shard import BalanceShard
 # -------------------------------------------------------------
 
 target_metadata = Base.metadata                 # for autogenerate
@@ -0,0 +1,42 @@
+"""add pending partial indexes
+
+Revision ID: 3f6c0a9d7e12
+Revises: e8f14b6a9c20
+Create Date: 2026-10-18 14:05:33.271946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c0a9d7e12'
+down_revision: Union[str, Sequence[str], None] = 'e8f14b6a9c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING = sa.text("status = 'pending'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Partitioned parents cannot be indexed CONCURRENTLY; the index cascades to each partition
+    op.create_index('ix_transactions_pending_ts', 'transactions', ['timestamp'], unique=False,
+                    postgresql_where=PENDING, sqlite_where=PENDING)
+    op.create_index('ix_deposits_pending_ts', 'deposits', ['timestamp'], unique=False,
+                    postgresql_where=PENDING, sqlite_where=PENDING)
+    with op.get_context().autocommit_block():
+        op.create_index('ix_transfer_batches_pending_ts', 'transfer_batches', ['timestamp'], unique=False,
+                        postgresql_where=PENDING, sqlite_where=PENDING,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_transfer_batches_pending_ts', table_name='transfer_batches',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_index('ix_deposits_pending_ts', table_name='deposits')
+    op.drop_index('ix_transactions_pending_ts', table_name='transactions')
@@ -0,0 +1,47 @@
+"""add transfer batches
+
+Revision ID: 5e2b8c0d41a7
+Revises: c41f7a2e9d35
+Create Date: 2026-10-18 10:03:11.502917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8c0d41a7'
+down_revision: Union[str, Sequence[str], None] = 'c41f7a2e9d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transfer_batches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('from_account_number', sa.String(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('leg_count', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['from_account_number'], ['bank_accounts.account_number'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transfer_batches_id'), 'transfer_batches', ['id'], unique=False)
+    op.add_column('transactions', sa.Column('batch_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('transactions_batch_id_fkey', 'transactions', 'transfer_batches', ['batch_id'], ['id'])
+    op.create_index(op.f('ix_transactions_batch_id'), 'transactions', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_transactions_batch_id'), table_name='transactions')
+    op.drop_constraint('transactions_batch_id_fkey', 'transactions', type_='foreignkey')
+    op.drop_column('transactions', 'batch_id')
+    op.drop_index(op.f('ix_transfer_batches_id'), table_name='transfer_batches')
+    op.drop_table('transfer_batches')
@@ -0,0 +1,31 @@
+"""add account number sequence
+
+Revision ID: 7a3d9f1c2b64
+Revises: 5e2b8c0d41a7
+Create Date: 2026-10-18 11:02:17.530912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3d9f1c2b64'
+down_revision: Union[str, Sequence[str], None] = '5e2b8c0d41a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # INCREMENT must match app.models.account.BLOCK_SIZE: one nextval reserves a block
+    op.execute(sa.schema.CreateSequence(
+        sa.Sequence('account_number_seq', start=1, increment=100), if_not_exists=True
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence('account_number_seq'), if_exists=True))
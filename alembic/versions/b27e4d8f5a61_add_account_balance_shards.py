@@ -0,0 +1,43 @@
+"""add account balance shards
+
+Revision ID: b27e4d8f5a61
+Revises: 3f6c0a9d7e12
+Create Date: 2026-10-18 15:40:12.664018
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b27e4d8f5a61'
+down_revision: Union[str, Sequence[str], None] = '3f6c0a9d7e12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('bank_accounts', sa.Column('balance_shards', sa.Integer(), nullable=False,
+                                             server_default='0'))
+    op.create_table('account_balance_shards',
+    sa.Column('account_number', sa.String(), nullable=False),
+    sa.Column('shard', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['account_number'], ['bank_accounts.account_number'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('account_number', 'shard')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fold any outstanding sub-balances back before dropping them
+    op.execute(
+        'UPDATE bank_accounts SET balance = balance + s.total '
+        'FROM (SELECT account_number, sum(balance) AS total FROM account_balance_shards '
+        'GROUP BY account_number) AS s WHERE bank_accounts.account_number = s.account_number'
+    )
+    op.drop_table('account_balance_shards')
+    op.drop_column('bank_accounts', 'balance_shards')
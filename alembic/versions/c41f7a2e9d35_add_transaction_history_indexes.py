@@ -0,0 +1,43 @@
+"""add transaction history indexes
+
+Revision ID: c41f7a2e9d35
+Revises: 93d64205c3dc
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a2e9d35'
+down_revision: Union[str, Sequence[str], None] = '93d64205c3dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_transactions_from_ts_id', 'transactions',
+                        ['from_account_number', 'timestamp', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_transactions_to_ts_id', 'transactions',
+                        ['to_account_number', 'timestamp', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(op.f('ix_bank_accounts_user_id'), 'bank_accounts', ['user_id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_bank_accounts_user_id'), table_name='bank_accounts',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_transactions_to_ts_id', table_name='transactions',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_transactions_from_ts_id', table_name='transactions',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,121 @@
+"""partition transactions and deposits by month
+
+Revision ID: e8f14b6a9c20
+Revises: 7a3d9f1c2b64
+Create Date: 2026-10-18 12:26:51.804337
+
+Converts ``transactions`` and ``deposits`` into RANGE (timestamp)
+partitioned tables with one partition per month, plus a DEFAULT partition
+as a safety net. Existing rows are copied across, so run it in a
+maintenance window. Later partitions are created (and old ones archived)
+by ``python -m app.maintenance.partitions``.
+
+Postgres only; other dialects keep plain tables.
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8f14b6a9c20'
+down_revision: Union[str, Sequence[str], None] = '7a3d9f1c2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# Column DDL per table (the partition key must be part of the primary key)
+TABLES = {
+    'transactions': {
+        'columns': """
+            id integer NOT NULL DEFAULT nextval('transactions_id_seq'),
+            from_account_number varchar REFERENCES bank_accounts (account_number),
+            to_account_number varchar REFERENCES bank_accounts (account_number),
+            amount double precision NOT NULL,
+            reference varchar,
+            "timestamp" timestamp NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            status varchar,
+            batch_id integer REFERENCES transfer_batches (id)
+        """,
+        'names': 'id, from_account_number, to_account_number, amount, reference, "timestamp", status, batch_id',
+        'indexes': {
+            'ix_transactions_from_ts_id': 'from_account_number, "timestamp", id',
+            'ix_transactions_to_ts_id': 'to_account_number, "timestamp", id',
+            'ix_transactions_batch_id': 'batch_id',
+        },
+    },
+    'deposits': {
+        'columns': """
+            id integer NOT NULL DEFAULT nextval('deposits_id_seq'),
+            user_id integer NOT NULL REFERENCES users (id),
+            account_number varchar,
+            amount double precision NOT NULL,
+            status varchar,
+            "timestamp" timestamp NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        """,
+        'names': 'id, user_id, account_number, amount, status, "timestamp"',
+        'indexes': {},
+    },
+}
+
+
+def _months(first: date, last: date):
+    month = first.replace(day=1)
+    while month <= last:
+        nxt = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        yield month, nxt
+        month = nxt
+
+
+def _swap(table: str, partitioned: bool) -> None:
+    spec = TABLES[table]
+    old = f'{table}_old'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    op.execute(f'ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey')
+    for name in (f'ix_{table}_id', *spec['indexes']):
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+    if partitioned:
+        op.execute(f'CREATE TABLE {table} ({spec["columns"]}, PRIMARY KEY (id, "timestamp")) '
+                   f'PARTITION BY RANGE ("timestamp")')
+        first = op.get_bind().execute(sa.text(f'SELECT min("timestamp") FROM {old}')).scalar()
+        today = datetime.utcnow().date()
+        last = date(today.year + (today.month + MONTHS_AHEAD - 1) // 12,
+                    (today.month + MONTHS_AHEAD - 1) % 12 + 1, 1)
+        for lo, hi in _months((first or today), last):
+            op.execute(f"CREATE TABLE {table}_p{lo:%Y%m} PARTITION OF {table} "
+                       f"FOR VALUES FROM ('{lo}') TO ('{hi}')")
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+        select = spec['names'].replace('"timestamp"', '''COALESCE("timestamp", now() AT TIME ZONE 'utc')''')
+    else:
+        op.execute(f'CREATE TABLE {table} ({spec["columns"]}, PRIMARY KEY (id))')
+        select = spec['names']
+
+    op.execute(f'INSERT INTO {table} ({spec["names"]}) SELECT {select} FROM {old}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'DROP TABLE {old}')
+
+    # On a partitioned parent each index cascades to every partition
+    if not partitioned:
+        op.execute(f'CREATE INDEX ix_{table}_id ON {table} (id)')
+    for name, cols in spec['indexes'].items():
+        op.execute(f'CREATE INDEX {name} ON {table} ({cols})')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        _swap(table, partitioned=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        _swap(table, partitioned=False)
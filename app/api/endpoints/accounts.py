@@ -1,72 +1,86 @@
-import random
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.core.query_budget import query_budget
 from app.schemas.account import AccountCreate, AccountOut
 from app.models.account import BankAccount
-from app.api.endpoints.auth import get_current_user, get_db
+from app.api.endpoints.auth import get_current_user, get_current_user_read, get_db, get_read_db
+from app.api.responses import CachedJSONResponse
+from app.services.account_cache import accounts_query, cached_accounts, fill_accounts, refresh_accounts
+from app.services.account_numbers import allocate_account_number, check_account_number
+from app.services.balance_shards import account_balance
 
 router = APIRouter()
 
 
 # ─────────────────────────────────────────  Create Account
+def _create_account(db: Session, payload: AccountCreate, user) -> BankAccount:
+    # Client-supplied numbers are format/check-digit validated without a query;
+    # otherwise one is allocated. Uniqueness is enforced by the unique index.
+    if payload.account_number:
+        check_account_number(payload.account_number)
+
+    for _ in range(5):  # only the random (non-sequence) fallback can collide
+        new_acc = BankAccount(
+            user_id=user.id,
+            account_number=payload.account_number or allocate_account_number(db),
+            account_type=payload.account_type,
+            balance=0.0,
+        )
+        db.add(new_acc)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if payload.account_number:
+                raise HTTPException(status_code=400, detail="Account number already exists.")
+            continue
+        db.refresh(new_acc)
+        return new_acc
+
+    raise HTTPException(status_code=500, detail="Failed to generate unique account number.")
+
+
 @router.post("/", response_model=AccountOut)
+@query_budget(5)
 def create_account(
     payload: AccountCreate,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    # If account number not provided, generate a unique one
-    if not payload.account_number:
-        for _ in range(5):  # Retry max 5 times for uniqueness
-            number = f"{random.randint(10000000, 99999999)}"
-            if not db.query(BankAccount).filter_by(account_number=number).first():
-                break
-        else:
-            raise HTTPException(status_code=500, detail="Failed to generate unique account number.")
-    else:
-        number = payload.account_number
-        # Optional: prevent duplicates even if user manually provided one
-        if db.query(BankAccount).filter_by(account_number=number).first():
-            raise HTTPException(status_code=400, detail="Account number already exists.")
-
-    new_acc = BankAccount(
-        user_id=current_user.id,
-        account_number=number,
-        account_type=payload.account_type,
-        balance=0.0,
-    )
-    db.add(new_acc)
-    db.commit()
-    db.refresh(new_acc)
+    new_acc = _create_account(db, payload, current_user)
+    refresh_accounts(db, current_user.id)
     return new_acc
 
 
 # ─────────────────────────────────────────  Get all accounts
 @router.get("/", response_model=list[AccountOut])
+@query_budget(2)
 def get_accounts(
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_user_read),
 ):
-    return db.query(BankAccount).filter(BankAccount.user_id == current_user.id).all()
+    # Polled constantly: served from the write-through cache, the database only on a miss
+    body, version = cached_accounts(current_user.id)
+    if body is None:
+        rows = db.execute(accounts_query().where(BankAccount.user_id == current_user.id))
+        body = fill_accounts(current_user.id, version, rows)
+    return CachedJSONResponse(body)
 
 
 # ─────────────────────────────────────────  Delete account
-@router.delete("/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_account(
-    account_id: int,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
-):
+def _delete_account(db: Session, account_id: int, user) -> None:
     acc = (
         db.query(BankAccount)
-        .filter(BankAccount.id == account_id, BankAccount.user_id == current_user.id)
+        .filter(BankAccount.id == account_id, BankAccount.user_id == user.id)
         .first()
     )
     if not acc:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    if acc.balance != 0:
+    balance = account_balance(db, acc.account_number) if acc.balance_shards else acc.balance
+    if balance != 0:
         raise HTTPException(
             status_code=400,
             detail="Account balance must be zero before deletion"
@@ -76,3 +90,13 @@ def delete_account(
 
     db.delete(acc)
     db.commit()
+
+
+@router.delete("/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_account(
+    account_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    _delete_account(db, account_id, current_user)
+    refresh_accounts(db, current_user.id)
@@ -0,0 +1,43 @@
+# app/api/endpoints/admin.py
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from app.api.endpoints.auth import get_current_admin
+from app.core.profiler import PROFILE_NAME, list_profiles, profile_dir
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(get_current_admin)],
+)
+
+
+class ProfileOut(BaseModel):
+    name: str
+    captured_at: datetime
+    method: str
+    route: str
+    duration_ms: int
+    samples: int
+
+
+# ─────────────────────────────────────────────────────────────
+# Captured request profiles (see app/core/profiler.py)
+# ─────────────────────────────────────────────────────────────
+@router.get("/profiles", response_model=List[ProfileOut])
+def get_profiles():
+    """Newest first. Send ``X-Profile: 1`` with an admin token to capture one."""
+    return list_profiles()
+
+
+@router.get("/profiles/{name}", response_class=FileResponse)
+def download_profile(name: str):
+    """Collapsed stacks: open in speedscope or pipe through flamegraph.pl."""
+    path = profile_dir() / name
+    if not PROFILE_NAME.match(name) or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
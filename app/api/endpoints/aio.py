@@ -0,0 +1,427 @@
+# app/api/endpoints/aio.py
+"""
+Async twins of the auth, OTP, account, transaction and deposit endpoints,
+mounted ahead of the sync routers when settings.ASYNC_MODE is on (see
+app/main.py). Request/response contracts are identical to the sync
+versions, so this router stays out of the OpenAPI schema. Only the admin
+router has no twins.
+
+DB work uses an AsyncSession (asyncpg). The sync helpers in the endpoint
+modules are reused through ``AsyncSession.run_sync`` so business rules live
+in one place. AsyncSession commits skip the read-your-writes hook in
+app/db/routing.py, so every write pins the user with ``apin_primary``;
+reads (account list, history, export) go to the primary too. Redis goes
+through ``redis.asyncio``, bcrypt through the password pool and e-mail
+through the SMTP dispatcher queue, so nothing here parks a threadpool
+thread.
+"""
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.endpoints.accounts import _create_account, _delete_account
+
+from app.api.endpoints.auth import (
+    LOGIN_LOCKED_DETAIL,
+    LOGIN_LOCKOUT_DETAIL,
+    OTPVerifyRequest as LoginOTPVerifyRequest,
+    oauth2_scheme,
+    raise_for_otp_check,
+)
+from app.api.endpoints.deposit import _complete_deposit, _create_pending_deposit, _get_pending_deposit
+from app.api.endpoints.otp import OTP_LOCKED_DETAIL, OTP_LOCKOUT_DETAIL, OTPVerifyRequest
+from app.api.endpoints.transactions import _complete_transfer, _create_pending, _get_accounts
+from app.api.responses import CachedJSONResponse, RowsResponse
+from app.core.config import settings
+from app.core.password_pool import PasswordPoolBusy
+from app.core.query_budget import query_budget
+from app.core.security import create_access_token, decode_access_token, verify_password_async
+from app.db.routing import apin_primary
+from app.db.session import AsyncSessionLocal
+from app.models.account import BankAccount
+from app.models.user import User
+from app.schemas.account import (
+    AccountCreate,
+    AccountOut,
+    DepositConfirmRequest,
+    DepositInitRequest,
+    DepositInitResponse,
+)
+from app.schemas.token import Token
+from app.schemas.transaction import (
+    BatchInitiateResponse,
+    BatchTransferCreate,
+    BatchVerifyRequest,
+    BatchVerifyResponse,
+    TransactionCreate,
+    TransactionInitiateResponse,
+    TransactionOut,
+    TransactionVerifyRequest,
+)
+from app.schemas.user import LoginRequest, UserCreate, UserOut
+from app.services.account_cache import accounts_query, acached_accounts, afill_accounts, arefresh_accounts
+from app.services.auth_service import aregister_user, busy_error
+from app.services.batch_transfers import batch_payees, check_batch, insert_batch, otp_scope
+from app.services.group_commit import get_group_committer
+from app.services.principal_cache import Principal, aget_principal
+from app.services.risk import aconfirm_step_up, amark_step_up, ascreen_transfer, raise_for_risk
+from app.services.settlement import apply_deposit, apply_transfer, settle_batch
+from app.services.statement_export import MEDIA_TYPES, astream_statement
+from app.services.transaction_history import history_page
+from app.utils.otp import (
+    acheck_otp,
+    acreate_and_store_otp,
+)
+from app.utils.idempotency import arun_idempotent
+from app.utils.mailer import enqueue_otp_email
+from app.utils.ratelimit import acheck_rate_limit
+
+router = APIRouter(include_in_schema=False)
+
+# ────────────────────────────────
+# Utilities
+# ────────────────────────────────
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    payload = decode_access_token(token)
+    if payload is None or "sub" not in payload:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    user = await aget_principal(db, payload["sub"])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+# ────────────────────────────────
+# Auth
+# ────────────────────────────────
+@router.post("/auth/register", response_model=UserOut)
+@query_budget(3)
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    return await aregister_user(db, user_data)
+
+
+@router.post("/auth/login")
+@query_budget(1)
+async def login_for_otp(payload: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
+    await acheck_rate_limit("login", request, payload.username)
+    user = (await db.execute(select(User).where(User.email == payload.username))).scalars().first()
+    try:
+        ok = user is not None and await verify_password_async(payload.password, user.hashed_password)
+    except PasswordPoolBusy:
+        raise busy_error()
+    if not ok:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+
+    otp = await acreate_and_store_otp(user.id)
+    enqueue_otp_email(user.email, otp)
+    return {"msg": "OTP sent to your email. Please verify to complete login."}
+
+
+@router.post("/auth/login/verify", response_model=Token)
+@query_budget(1)
+async def verify_login_otp(
+    payload: LoginOTPVerifyRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await acheck_rate_limit("otp_verify", request, payload.username)
+    user = (await db.execute(select(User).where(User.email == payload.username))).scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    raise_for_otp_check(
+        await acheck_otp(user.id, payload.otp_code),
+        locked_detail=LOGIN_LOCKED_DETAIL,
+        lockout_detail=LOGIN_LOCKOUT_DETAIL,
+    )
+
+    access_token = create_access_token(data={"sub": user.email})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.get("/auth/me", response_model=UserOut)
+@query_budget(1)
+async def read_current_user(current_user: Principal = Depends(get_current_user_async)):
+    return current_user
+
+# ────────────────────────────────
+# OTP
+# ────────────────────────────────
+@router.post("/otp/send", status_code=status.HTTP_200_OK)
+async def send_otp(request: Request, current_user: Principal = Depends(get_current_user_async)):
+    await acheck_rate_limit("otp_send", request, current_user.id)
+    code = await acreate_and_store_otp(current_user.id)
+    enqueue_otp_email(current_user.email, code)
+    return {"msg": "OTP sent to your e-mail"}
+
+
+@router.post("/otp/verify", status_code=status.HTTP_200_OK)
+async def verify_otp_endpoint(
+    payload: OTPVerifyRequest,
+    request: Request,
+    current_user: Principal = Depends(get_current_user_async),
+):
+    await acheck_rate_limit("otp_verify", request, current_user.id)
+    raise_for_otp_check(
+        await acheck_otp(current_user.id, payload.otp_code),
+        locked_detail=OTP_LOCKED_DETAIL,
+        lockout_detail=OTP_LOCKOUT_DETAIL,
+    )
+    return {"msg": "OTP verified successfully"}
+
+# ────────────────────────────────
+# Accounts
+# ────────────────────────────────
+@router.post("/accounts/", response_model=AccountOut)
+@query_budget(5)
+async def create_account(
+    payload: AccountCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    new_acc = await db.run_sync(_create_account, payload, current_user)
+    await apin_primary(current_user.email)
+    await arefresh_accounts(db, current_user.id)
+    return new_acc
+
+
+@router.get("/accounts/", response_model=list[AccountOut])
+@query_budget(2)
+async def get_accounts(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    body, version = await acached_accounts(current_user.id)
+    if body is None:
+        rows = await db.execute(accounts_query().where(BankAccount.user_id == current_user.id))
+        body = await afill_accounts(current_user.id, version, rows)
+    return CachedJSONResponse(body)
+
+
+@router.delete("/accounts/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_account(
+    account_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    await db.run_sync(_delete_account, account_id, current_user)
+    await apin_primary(current_user.email)
+    await arefresh_accounts(db, current_user.id)
+
+# ────────────────────────────────
+# Transactions
+# ────────────────────────────────
+@router.post("/transactions/initiate", response_model=TransactionInitiateResponse, status_code=201)
+@query_budget(5)
+async def initiate_transfer(
+    payload: TransactionCreate,
+    request: Request,
+    idempotency_key: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    await acheck_rate_limit("initiate", request, current_user.id)
+
+    async def initiate():
+        src, dst = await db.run_sync(lambda s: _get_accounts(payload, s, current_user))
+        decision = await ascreen_transfer(current_user.id, src.account_number, payload.amount, dst.account_number)
+        raise_for_risk(decision)
+        pending = await db.run_sync(_create_pending, src, dst, payload)
+        await apin_primary(current_user.email)
+
+        otp_code = await acreate_and_store_otp(pending.id)
+        if decision.step_up:
+            await amark_step_up(pending.id)
+        enqueue_otp_email(current_user.email, otp_code)
+
+        return TransactionInitiateResponse(transaction_id=pending.id, step_up=decision.step_up)
+
+    return await arun_idempotent("transfer", current_user.id, idempotency_key, payload, 201, initiate)
+
+
+@router.post("/transactions/verify", response_model=TransactionOut, status_code=200)
+@query_budget(9)
+async def verify_transfer(
+    payload: TransactionVerifyRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    tx_id = payload.transaction_id
+    await aconfirm_step_up(db, tx_id, payload.password, current_user)
+    raise_for_otp_check(
+        await acheck_otp(tx_id, payload.otp_code),
+        locked_detail="Too many failed OTP attempts. This transaction is locked for 5 minutes.",
+        lockout_detail="Transaction locked after 3 failed OTP attempts. Please try again later.",
+    )
+    if settings.SETTLEMENT_GROUP_COMMIT:
+        # run_sync would block the loop waiting on the group; await its future instead
+        tx = await get_group_committer().arun(apply_transfer, tx_id, current_user.id, subject=current_user.email)
+    else:
+        tx = await db.run_sync(_complete_transfer, tx_id, current_user)
+        await apin_primary(current_user.email)
+    await arefresh_accounts(db, current_user.id, [tx["to_account_number"]])
+    return tx
+
+
+@router.post("/transactions/batch/initiate", response_model=BatchInitiateResponse, status_code=201)
+@query_budget(6)
+async def initiate_batch(
+    payload: BatchTransferCreate,
+    request: Request,
+    idempotency_key: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    await acheck_rate_limit("initiate", request, current_user.id)
+
+    async def initiate():
+        source, total = await db.run_sync(check_batch, payload, current_user)
+        decision = await ascreen_transfer(current_user.id, source, total, payees=batch_payees(payload))
+        raise_for_risk(decision)
+        batch = await db.run_sync(insert_batch, payload, current_user, source, total)
+        await apin_primary(current_user.email)
+
+        otp_code = await acreate_and_store_otp(otp_scope(batch.id))
+        if decision.step_up:
+            await amark_step_up(otp_scope(batch.id))
+        enqueue_otp_email(current_user.email, otp_code)
+
+        return BatchInitiateResponse(
+            batch_id=batch.id,
+            leg_count=batch.leg_count,
+            total_amount=batch.total_amount,
+            step_up=decision.step_up,
+        )
+
+    return await arun_idempotent("batch", current_user.id, idempotency_key, payload, 201, initiate)
+
+
+@router.post("/transactions/batch/verify", response_model=BatchVerifyResponse, status_code=200)
+@query_budget(13)
+async def verify_batch(
+    payload: BatchVerifyRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    await aconfirm_step_up(db, otp_scope(payload.batch_id), payload.password, current_user)
+    raise_for_otp_check(
+        await acheck_otp(otp_scope(payload.batch_id), payload.otp_code),
+        locked_detail="Too many failed OTP attempts. This batch is locked for 5 minutes.",
+        lockout_detail="Batch locked after 3 failed OTP attempts. Please try again later.",
+    )
+    report = await db.run_sync(settle_batch, payload.batch_id, current_user.id)
+    await apin_primary(current_user.email)
+    await arefresh_accounts(db, current_user.id,
+                            [leg["to_account_number"] for leg in report["legs"] if leg["status"] == "completed"])
+    return report
+
+
+@router.get("/transactions/", response_model=list[TransactionOut])
+@query_budget(3)
+async def list_my_transactions(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None, description="X-Next-Cursor value from the previous page"),
+    status: str | None = Query(None, description="pending / completed / failed ..."),
+    direction: Literal["all", "in", "out"] = "all",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    rows, next_cursor = await db.run_sync(
+        lambda s: history_page(s, current_user.id, limit=limit, cursor=cursor, direction=direction,
+                               status=status, since=since, until=until)
+    )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return RowsResponse(rows, headers=headers)
+
+
+@router.get("/transactions/export")
+async def export_statement(
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    status: str | None = None,
+    direction: Literal["all", "in", "out"] = "all",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    archived: bool = Query(False, description="Also include months moved to the cold archive"),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    filename = f"statement-{datetime.utcnow():%Y%m%d}.{format}" + (".gz" if gzip else "")
+    body = astream_statement(
+        current_user.id,
+        format,
+        gzip=gzip,
+        direction=direction,
+        status=status,
+        since=since,
+        until=until,
+        include_archived=archived,
+    )
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# ────────────────────────────────
+# Deposits (the sync router is mounted under a doubled /deposit prefix)
+# ────────────────────────────────
+@router.post("/deposit/deposit/initiate", response_model=DepositInitResponse)
+@query_budget(4)
+async def initiate_deposit(
+    payload: DepositInitRequest,
+    request: Request,
+    idempotency_key: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    await acheck_rate_limit("initiate", request, current_user.id)
+
+    async def initiate():
+        deposit = await db.run_sync(_create_pending_deposit, payload, current_user)
+        await apin_primary(current_user.email)
+
+        otp = await acreate_and_store_otp(deposit.id)
+        enqueue_otp_email(current_user.email, otp)
+
+        return DepositInitResponse(deposit_id=deposit.id)
+
+    return await arun_idempotent("deposit", current_user.id, idempotency_key, payload, 200, initiate)
+
+
+@router.post("/deposit/deposit/confirm")
+@query_budget(6)
+async def confirm_deposit(
+    payload: DepositConfirmRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    deposit = await db.run_sync(_get_pending_deposit, payload.deposit_id, current_user)
+    raise_for_otp_check(
+        await acheck_otp(deposit.id, payload.otp),
+        locked_detail="Too many failed attempts. Try again in 5 minutes.",
+        lockout_detail="Deposit locked after 3 failed OTP attempts.",
+    )
+    if settings.SETTLEMENT_GROUP_COMMIT:
+        new_balance = await get_group_committer().arun(apply_deposit, deposit.id, current_user.id,
+                                                       subject=current_user.email)
+        result = {"msg": "Deposit successful", "new_balance": new_balance}
+    else:
+        result = await db.run_sync(_complete_deposit, deposit, current_user)
+        await apin_primary(current_user.email)
+    await arefresh_accounts(db, current_user.id)
+    return result
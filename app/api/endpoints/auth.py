@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from app.schemas.user import UserCreate, UserOut, LoginRequest
 from app.schemas.token import Token
-from app.services.auth_service import register_user, authenticate_user
-from app.core.security import decode_access_token, create_access_token
+from app.services.auth_service import busy_error, register_user
+from app.core.password_pool import PasswordPoolBusy
+from app.core.security import decode_access_token, create_access_token, hash_password_async, verify_password_async
+from app.core.query_budget import query_budget
 from app.db.session import SessionLocal
+from app.db.routing import read_session
 from app.models.user import User
-from app.utils.otp import create_and_store_otp, verify_otp, send_otp_email
+from app.services.principal_cache import Principal, get_principal
+from app.utils.otp import acreate_and_store_otp, check_otp, OTPCheck, OTP_MAX_TRIES
+from app.utils.mailer import enqueue_otp_email
+from app.utils.ratelimit import acheck_rate_limit, check_rate_limit
 from fastapi.security import OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login/verify")  # or just dummy endpoint
 
@@ -25,38 +32,96 @@ def get_db():
 
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+def _token_subject(token: str) -> str:
     payload = decode_access_token(token)
     if payload is None or "sub" not in payload:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    return payload["sub"]
+
+
+def get_read_db(token: str = Depends(oauth2_scheme)):
+    """Session for read-only endpoints: a replica unless the user just wrote (see app/db/routing.py)."""
+    db = read_session(_token_subject(token))
+    try:
+        yield db
+    finally:
+        db.close()
 
-    user = db.query(User).filter(User.email == payload["sub"]).first()
+
+def _principal(db: Session, subject: str) -> Principal:
+    # Cached snapshot of the user row; only a cache miss touches the DB
+    user = get_principal(db, subject)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Principal:
+    subject = _token_subject(token)
+    db.info["subject"] = subject        # commits on this session pin the user to the primary
+    return _principal(db, subject)
+
+
+def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
+
+
+def get_current_user_read(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db)
+) -> Principal:
+    return _principal(db, _token_subject(token))
+
+
+def raise_for_otp_check(result: OTPCheck, locked_detail: str, lockout_detail: str) -> None:
+    """Map a check_otp outcome onto the HTTP errors the OTP-gated endpoints use."""
+    if result.ok:
+        return
+    if result.status == "locked":
+        raise HTTPException(403, detail=lockout_detail if result.newly_locked else locked_detail)
+    if result.status == "expired":
+        raise HTTPException(401, detail="OTP expired or not issued. Please request a new one.")
+    raise HTTPException(401, detail=f"Invalid OTP. Attempt {result.attempts}/{OTP_MAX_TRIES}")
+
+
 # ────────────────────────────────
 # Register
 # ────────────────────────────────
+# register and login are async so bcrypt is awaited on the event loop; only
+# their short DB calls borrow a threadpool thread, which /accounts and
+# /transactions share. A signup or login storm gets 503s, not their threads.
 @router.post("/register", response_model=UserOut)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    return register_user(db, user_data)
+@query_budget(3)
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+    try:
+        hashed = await hash_password_async(user_data.password)
+    except PasswordPoolBusy:
+        raise busy_error()
+    return await run_in_threadpool(register_user, db, user_data, hashed)
 
 # ────────────────────────────────
 # Login Step 1: Send OTP
 # ────────────────────────────────
 @router.post("/login")
-def login_for_otp(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = authenticate_user(db, payload.username, payload.password)
-    if not user:
+@query_budget(1)
+async def login_for_otp(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    # Cheap 429 before bcrypt and SMTP
+    await acheck_rate_limit("login", request, payload.username)
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.email == payload.username).first())
+    try:
+        ok = user is not None and await verify_password_async(payload.password, user.hashed_password)
+    except PasswordPoolBusy:
+        raise busy_error()
+    if not ok:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    otp = create_and_store_otp(user.id)
-    send_otp_email(user.email, otp)
+    otp = await acreate_and_store_otp(user.id)
+    enqueue_otp_email(user.email, otp)
     return {"msg": "OTP sent to your email. Please verify to complete login."}
 
 # ────────────────────────────────
@@ -66,16 +131,23 @@ class OTPVerifyRequest(BaseModel):
     username: str
     otp_code: str
 
+LOGIN_LOCKED_DETAIL = "Too many failed OTP attempts. Login is locked for 5 minutes."
+LOGIN_LOCKOUT_DETAIL = "Login locked after 3 failed OTP attempts. Please try again later."
+
 @router.post("/login/verify", response_model=Token)
-def verify_login_otp(payload: OTPVerifyRequest, db: Session = Depends(get_db)):
+@query_budget(1)
+def verify_login_otp(payload: OTPVerifyRequest, request: Request, db: Session = Depends(get_db)):
+    check_rate_limit("otp_verify", request, payload.username)
     user = db.query(User).filter(User.email == payload.username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_otp(user.id, payload.otp_code):
-        raise HTTPException(status_code=400, detail="Invalid or expired OTP")
+    raise_for_otp_check(
+        check_otp(user.id, payload.otp_code),
+        locked_detail=LOGIN_LOCKED_DETAIL,
+        lockout_detail=LOGIN_LOCKOUT_DETAIL,
+    )
 
-    
     access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -83,5 +155,6 @@ def verify_login_otp(payload: OTPVerifyRequest, db: Session = Depends(get_db)):
 # Authenticated User Info
 # ────────────────────────────────
 @router.get("/me", response_model=UserOut)
-def read_current_user(current_user: User = Depends(get_current_user)):
+@query_budget(1)
+def read_current_user(current_user: Principal = Depends(get_current_user_read)):
     return current_user
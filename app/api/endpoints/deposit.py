@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from sqlalchemy.orm import Session
-from app.api.endpoints.auth import get_current_user, get_db
+from app.api.endpoints.auth import get_current_user, get_db, raise_for_otp_check
 from app.models.account import BankAccount
 from app.models.deposit import Deposit
 from app.utils.otp import (
+    check_otp,
     create_and_store_otp,
-    send_otp_email,
-    verify_otp,
-    is_otp_locked,
-    increment_otp_failures,
-    reset_otp_failures,
 )
+from app.utils.idempotency import run_idempotent
+from app.utils.mailer import enqueue_otp_email
+from app.utils.ratelimit import check_rate_limit
+from app.services.account_numbers import check_account_number
+from app.core.config import settings
+from app.core.query_budget import query_budget
+from app.services.account_cache import refresh_accounts
+from app.services.group_commit import get_group_committer
+from app.services.settlement import apply_deposit, settle_deposit
 from app.schemas.account import (
     DepositInitRequest,
     DepositInitResponse,
@@ -19,23 +24,19 @@ from app.schemas.account import (
 
 router = APIRouter(prefix="/deposit", tags=["Deposit"])
 
-@router.post("/initiate", response_model=DepositInitResponse)
-def initiate_deposit(
-    payload: DepositInitRequest,
-    bg: BackgroundTasks,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
-):
+# ────────────────────────── helpers ──────────────────────────
+def _create_pending_deposit(db: Session, payload: DepositInitRequest, user) -> Deposit:
+    check_account_number(payload.account_number)
     acc = db.query(BankAccount).filter_by(
         account_number=payload.account_number,
-        user_id=current_user.id
+        user_id=user.id
     ).first()
 
     if not acc:
         raise HTTPException(404, detail="Account not found")
 
     deposit = Deposit(
-        user_id=current_user.id,
+        user_id=user.id,
         account_number=payload.account_number,
         amount=payload.amount,
         status="pending"
@@ -43,47 +44,62 @@ def initiate_deposit(
     db.add(deposit)
     db.commit()
     db.refresh(deposit)
+    return deposit
 
-    otp = create_and_store_otp(deposit.id)
-    bg.add_task(send_otp_email, current_user.email, otp)
-
-    return DepositInitResponse(deposit_id=deposit.id)
+def _get_pending_deposit(db: Session, deposit_id: int, user) -> Deposit:
+    deposit = db.get(Deposit, deposit_id)
 
-@router.post("/confirm")
-def confirm_deposit(
-    payload: DepositConfirmRequest,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
-):
-    deposit = db.get(Deposit, payload.deposit_id)
-
-    if not deposit or deposit.user_id != current_user.id:
+    if not deposit or deposit.user_id != user.id:
         raise HTTPException(404, detail="Deposit not found")
 
     if deposit.status != "pending":
         raise HTTPException(409, detail="Deposit already processed")
+    return deposit
+
+def _complete_deposit(db: Session, deposit: Deposit, user) -> dict:
+    """Credit a pending deposit whose OTP has already been verified."""
+    if settings.SETTLEMENT_GROUP_COMMIT:
+        new_balance = get_group_committer().run(apply_deposit, deposit.id, user.id, subject=user.email)
+    else:
+        new_balance = settle_deposit(db, deposit.id, user.id)
+    return {"msg": "Deposit successful", "new_balance": new_balance}
+
+@router.post("/initiate", response_model=DepositInitResponse)
+@query_budget(4)
+def initiate_deposit(
+    payload: DepositInitRequest,
+    request: Request,
+    idempotency_key: str | None = Header(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_rate_limit("initiate", request, current_user.id)
 
-    if is_otp_locked(deposit.id):
-        raise HTTPException(403, detail="Too many failed attempts. Try again in 5 minutes.")
+    def initiate():
+        deposit = _create_pending_deposit(db, payload, current_user)
 
-    if not verify_otp(deposit.id, payload.otp):
-        attempts, locked = increment_otp_failures(deposit.id)
-        if locked:
-            raise HTTPException(403, detail="Deposit locked after 3 failed OTP attempts.")
-        raise HTTPException(401, detail=f"Invalid OTP. Attempt {attempts}/3")
+        otp = create_and_store_otp(deposit.id)
+        enqueue_otp_email(current_user.email, otp)
 
-    reset_otp_failures(deposit.id)
+        return DepositInitResponse(deposit_id=deposit.id)
 
-    acc = db.query(BankAccount).filter_by(
-        account_number=deposit.account_number,
-        user_id=current_user.id
-    ).first()
+    return run_idempotent("deposit", current_user.id, idempotency_key, payload, 200, initiate)
 
-    if not acc:
-        raise HTTPException(404, detail="Account not found")
+@router.post("/confirm")
+@query_budget(6)
+def confirm_deposit(
+    payload: DepositConfirmRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    deposit = _get_pending_deposit(db, payload.deposit_id, current_user)
 
-    acc.balance += deposit.amount
-    deposit.status = "completed"
-    db.commit()
+    raise_for_otp_check(
+        check_otp(deposit.id, payload.otp),
+        locked_detail="Too many failed attempts. Try again in 5 minutes.",
+        lockout_detail="Deposit locked after 3 failed OTP attempts.",
+    )
 
-    return {"msg": "Deposit successful", "new_balance": acc.balance}
+    result = _complete_deposit(db, deposit, current_user)
+    refresh_accounts(db, current_user.id)
+    return result
@@ -1,15 +1,16 @@
 # app/api/endpoints/otp.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from app.utils.otp import (
+    check_otp,
     create_and_store_otp,
-    verify_otp,
-    send_otp_email,
 )
-from app.api.endpoints.auth import get_current_user, get_db
-from app.models.user import User
+from app.utils.mailer import enqueue_otp_email
+from app.utils.ratelimit import check_rate_limit
+from app.api.endpoints.auth import get_current_user, get_db, raise_for_otp_check
+from app.services.principal_cache import Principal
 
 router = APIRouter(
     prefix="/otp",
@@ -21,8 +22,9 @@ router = APIRouter(
 # ─────────────────────────────────────────────────────────────
 @router.post("/send", status_code=status.HTTP_200_OK)
 def send_otp(
+    request: Request,
     db: Session = Depends(get_db),  #  kept for symmetry / future use
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """
     Generate a new OTP for the logged-in user, store it in Redis,
@@ -30,11 +32,12 @@ def send_otp(
 
     Returns just a success message (code never returned in prod).
     """
+    check_rate_limit("otp_send", request, current_user.id)
     code = create_and_store_otp(current_user.id)
 
     # ── DEV / PROD switch ───────────────────────────────────
-    # In production, integrate a real e-mail service.
-    send_otp_email(current_user.email, code)
+    # Queued for the pooled SMTP dispatcher; returns immediately.
+    enqueue_otp_email(current_user.email, code)
     # -- for dev you might also return the code:
     # return {"otp": code}
     # --------------------------------------------------------
@@ -47,16 +50,25 @@ def send_otp(
 class OTPVerifyRequest(BaseModel):
     otp_code: str = Field(..., min_length=6, max_length=6, pattern=r"^\d{6}$")
 
+OTP_LOCKED_DETAIL = "Too many failed OTP attempts. Try again in 5 minutes."
+OTP_LOCKOUT_DETAIL = "OTP locked after 3 failed attempts. Please try again later."
+
 @router.post("/verify", status_code=status.HTTP_200_OK)
 def verify_otp_endpoint(
     payload: OTPVerifyRequest,
+    request: Request,
     db: Session = Depends(get_db),          # kept for symmetry / future use
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """
-    Verify a 6-digit OTP. 401 on failure, 200 on success.
+    Verify a 6-digit OTP. 401 on failure, 403 while locked, 200 on success.
     """
-    # Will raise HTTPException(401) if invalid / expired
-    verify_otp(current_user.id, payload.otp_code)
+    check_rate_limit("otp_verify", request, current_user.id)
+    # 401 if invalid / expired, 403 once locked
+    raise_for_otp_check(
+        check_otp(current_user.id, payload.otp_code),
+        locked_detail=OTP_LOCKED_DETAIL,
+        lockout_detail=OTP_LOCKOUT_DETAIL,
+    )
 
     return {"msg": "OTP verified successfully"}
@@ -2,25 +2,52 @@
 from __future__ import annotations
 
 import logging
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app import db
-from app.api.endpoints.auth import get_current_user, get_db
+from app.api.endpoints.auth import (
+    get_current_user,
+    get_current_user_read,
+    get_db,
+    get_read_db,
+    raise_for_otp_check,
+)
+from app.api.responses import RowsResponse
+from app.db.routing import read_session
 from app.models.account import BankAccount
 from app.models.transaction import Transaction
+from app.services.account_cache import refresh_accounts
+from app.services.account_numbers import check_account_number
+from app.services.balance_shards import account_balance
+from app.services.batch_transfers import create_batch, otp_scope
+from app.core.config import settings
+from app.core.query_budget import query_budget
+from app.services.group_commit import get_group_committer
+from app.services.risk import confirm_step_up, mark_step_up, raise_for_risk, screen_transfer
+from app.services.settlement import apply_transfer, settle_batch, settle_transfer
+from app.services.transaction_history import history_page
+from app.services.statement_export import MEDIA_TYPES, stream_statement
 from app.schemas.transaction import (
+    BatchInitiateResponse,
+    BatchTransferCreate,
+    BatchVerifyRequest,
+    BatchVerifyResponse,
     TransactionCreate,
     TransactionInitiateResponse,
     TransactionOut,
     TransactionVerifyRequest,
 )
 from app.utils.otp import (
+    check_otp,
     create_and_store_otp,
-    verify_otp,
-    send_otp_email,          # ← NEW name only
 )
+from app.utils.idempotency import run_idempotent
+from app.utils.mailer import enqueue_otp_email
+from app.utils.ratelimit import check_rate_limit
 
 log = logging.getLogger(__name__)
 router = APIRouter()
@@ -28,8 +55,8 @@ router = APIRouter()
 # ────────────────────────── helpers ──────────────────────────
 def _get_accounts(tx: TransactionCreate, db: Session, user):
     """Validate accounts and balances, return (src, dst)."""
-    from_acc = str(tx.from_account_number)
-    to_acc = str(tx.to_account_number)
+    from_acc = check_account_number(str(tx.from_account_number))
+    to_acc = check_account_number(str(tx.to_account_number))
     src = (
         db.query(BankAccount)
         .filter(
@@ -51,125 +78,199 @@ def _get_accounts(tx: TransactionCreate, db: Session, user):
         raise HTTPException(400, detail="Source and destination cannot be the same")
     if tx.amount <= 0:
         raise HTTPException(400, detail="Amount must be positive")
-    if src.balance < tx.amount:
+    balance = account_balance(db, src.account_number) if src.balance_shards else src.balance
+    if balance < tx.amount:
         raise HTTPException(400, detail="Insufficient balance")
     return src, dst
 
+def _create_pending(db: Session, src: BankAccount, dst: BankAccount, payload: TransactionCreate) -> Transaction:
+    pending = Transaction(
+        from_account_number=src.account_number,
+        to_account_number=dst.account_number,
+        amount=payload.amount,
+        reference=payload.reference,
+        status="pending",
+    )
+    db.add(pending)
+    db.commit()
+    db.refresh(pending)
+    return pending
+
+def _complete_transfer(db: Session, tx_id: int, user) -> dict:
+    """Apply a pending transfer whose OTP has already been verified."""
+    if settings.SETTLEMENT_GROUP_COMMIT:
+        return get_group_committer().run(apply_transfer, tx_id, user.id, subject=user.email)
+    return settle_transfer(db, tx_id, user.id)
+
 # ───────────────── POST /transactions/initiate ──────────────
 @router.post(
     "/initiate",
     response_model=TransactionInitiateResponse,
     status_code=201,
 )
+@query_budget(5)
 def initiate_transfer(
     payload: TransactionCreate,
-    bg: BackgroundTasks,
+    request: Request,
+    idempotency_key: str | None = Header(None),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    src, dst = _get_accounts(payload, db, current_user)
+    check_rate_limit("initiate", request, current_user.id)
 
-    pending = Transaction(
-        from_account_number=src.account_number,
-        to_account_number=dst.account_number,
-        amount=payload.amount,
-        reference=payload.reference,
-        status="pending",
-    )
-    db.add(pending)
-    db.commit()
-    db.refresh(pending)
+    def initiate():
+        src, dst = _get_accounts(payload, db, current_user)
+        # Velocity / new-payee rules: one Redis call, before anything is written
+        decision = screen_transfer(current_user.id, src.account_number, payload.amount, dst.account_number)
+        raise_for_risk(decision)
+        pending = _create_pending(db, src, dst, payload)
 
-    otp_code = create_and_store_otp(pending.id)
-    # send e-mail out of request/response cycle
-    bg.add_task(send_otp_email, current_user.email, otp_code)
+        otp_code = create_and_store_otp(pending.id)
+        if decision.step_up:
+            mark_step_up(pending.id)
+        # handed to the SMTP dispatcher, sent out of request/response cycle
+        enqueue_otp_email(current_user.email, otp_code)
 
-    return TransactionInitiateResponse(transaction_id=pending.id)
+        return TransactionInitiateResponse(transaction_id=pending.id, step_up=decision.step_up)
 
-# ───────────────── POST /transactions/verify ────────────────
-from app.utils.otp import (
-    verify_otp,
-    is_otp_locked,
-    increment_otp_failures,
-    reset_otp_failures,
-)
+    # A retried request with the same Idempotency-Key replays the first response
+    return run_idempotent("transfer", current_user.id, idempotency_key, payload, 201, initiate)
 
+# ───────────────── POST /transactions/verify ────────────────
 @router.post("/verify", response_model=TransactionOut, status_code=200)
+@query_budget(9)
 def verify_transfer(
     payload: TransactionVerifyRequest,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     tx_id = payload.transaction_id
+    # Transfers the risk checks flagged at initiate also need the password
+    confirm_step_up(db, tx_id, payload.password, current_user)
 
-    # 1️⃣ Check if this transaction is temporarily locked
-    if is_otp_locked(tx_id):
-        raise HTTPException(
-            status_code=403,
-            detail="Too many failed OTP attempts. This transaction is locked for 5 minutes."
-        )
+    # 1️⃣–3️⃣ Lock check, OTP compare/consume and failure count in one Redis call
+    raise_for_otp_check(
+        check_otp(tx_id, payload.otp_code),
+        locked_detail="Too many failed OTP attempts. This transaction is locked for 5 minutes.",
+        lockout_detail="Transaction locked after 3 failed OTP attempts. Please try again later.",
+    )
 
-    # 2️⃣ Verify OTP
-    if not verify_otp(tx_id, payload.otp_code):
-        attempts, locked = increment_otp_failures(tx_id)
-        if locked:
-            raise HTTPException(
-                status_code=403,
-                detail="Transaction locked after 3 failed OTP attempts. Please try again later."
-            )
-        raise HTTPException(
-            status_code=401,
-            detail=f"Invalid OTP. Attempt {attempts}/3"
-        )
+    # 4️⃣ fetch transaction and perform the balance transfer
+    tx = _complete_transfer(db, tx_id, current_user)
+    # 5️⃣ write the new balances of both sides through to the account cache
+    refresh_accounts(db, current_user.id, [tx["to_account_number"]])
+    return tx
 
-    # 3️⃣ OTP is valid — clear failure count
-    reset_otp_failures(tx_id)
 
-    # 4️⃣ fetch transaction
-    tx = db.get(Transaction, tx_id)
-    if not tx:
-        raise HTTPException(404, detail="Transaction not found")
-    if tx.status != "pending":
-        raise HTTPException(409, detail="Transaction already processed")
+# ───────────────── POST /transactions/batch/initiate ────────
+@router.post("/batch/initiate", response_model=BatchInitiateResponse, status_code=201)
+@query_budget(6)
+def initiate_batch(
+    payload: BatchTransferCreate,
+    request: Request,
+    idempotency_key: str | None = Header(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Stage up to 1000 payouts from one account behind a single OTP."""
+    check_rate_limit("initiate", request, current_user.id)
 
-    src = db.query(BankAccount).filter_by(account_number=tx.from_account_number).first()
-    dst = db.query(BankAccount).filter_by(account_number=tx.to_account_number).first()
+    def initiate():
+        batch, decision = create_batch(db, payload, current_user)
+
+        otp_code = create_and_store_otp(otp_scope(batch.id))
+        if decision.step_up:
+            mark_step_up(otp_scope(batch.id))
+        enqueue_otp_email(current_user.email, otp_code)
+
+        return BatchInitiateResponse(
+            batch_id=batch.id,
+            leg_count=batch.leg_count,
+            total_amount=batch.total_amount,
+            step_up=decision.step_up,
+        )
 
-    if src.user_id != current_user.id:
-        raise HTTPException(403, detail="Not owner of source account")
+    return run_idempotent("batch", current_user.id, idempotency_key, payload, 201, initiate)
 
-    # 5️⃣ Perform the balance transfer
-    try:
-        src.balance -= tx.amount
-        dst.balance += tx.amount
-        tx.status = "completed"
-        db.commit()
-        db.refresh(tx)
-        return tx
-    except SQLAlchemyError as exc:
-        db.rollback()
-        log.exception("DB error completing transfer")
-        raise HTTPException(500, detail="Database error") from exc
+# ───────────────── POST /transactions/batch/verify ──────────
+@router.post("/batch/verify", response_model=BatchVerifyResponse, status_code=200)
+@query_budget(13)
+def verify_batch(
+    payload: BatchVerifyRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    confirm_step_up(db, otp_scope(payload.batch_id), payload.password, current_user)
+    raise_for_otp_check(
+        check_otp(otp_scope(payload.batch_id), payload.otp_code),
+        locked_detail="Too many failed OTP attempts. This batch is locked for 5 minutes.",
+        lockout_detail="Batch locked after 3 failed OTP attempts. Please try again later.",
+    )
+    # every leg settles (or none does) in one DB transaction
+    report = settle_batch(db, payload.batch_id, current_user.id)
+    refresh_accounts(db, current_user.id,
+                     [leg["to_account_number"] for leg in report["legs"] if leg["status"] == "completed"])
+    return report
 
 
 # ───────────────── GET /transactions/ ───────────────────────
 @router.get("/", response_model=list[TransactionOut])
+@query_budget(3)
 def list_my_transactions(
-    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None, description="X-Next-Cursor value from the previous page"),
+    status: str | None = Query(None, description="pending / completed / failed ..."),
+    direction: Literal["all", "in", "out"] = "all",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_user_read),
+):
+    """
+    Newest-first history, keyset-paginated on (timestamp, id). When more
+    rows exist the next page's cursor is returned in the X-Next-Cursor header.
+    """
+    rows, next_cursor = history_page(
+        db,
+        current_user.id,
+        limit=limit,
+        cursor=cursor,
+        direction=direction,
+        status=status,
+        since=since,
+        until=until,
+    )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return RowsResponse(rows, headers=headers)
+
+
+# ───────────────── GET /transactions/export ─────────────────
+@router.get("/export")
+def export_statement(
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    status: str | None = None,
+    direction: Literal["all", "in", "out"] = "all",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    archived: bool = Query(False, description="Also include months moved to the cold archive"),
     current_user=Depends(get_current_user),
 ):
-    my_numbers = [
-        acc.account_number
-        for acc in db.query(BankAccount)
-        .filter(BankAccount.user_id == current_user.id)
-        .all()
-    ]
-    return (
-        db.query(Transaction)
-        .filter(
-            (Transaction.from_account_number.in_(my_numbers))
-            | (Transaction.to_account_number.in_(my_numbers))
-        )
-        .order_by(Transaction.timestamp.desc())
-        .all()
+    """Stream the full (filtered) history as CSV or NDJSON, optionally gzipped."""
+    filename = f"statement-{datetime.utcnow():%Y%m%d}.{format}" + (".gz" if gzip else "")
+    body = stream_statement(
+        current_user.id,
+        format,
+        gzip=gzip,
+        direction=direction,
+        status=status,
+        since=since,
+        until=until,
+        include_archived=archived,
+        session_factory=lambda: read_session(current_user.email),
+    )
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
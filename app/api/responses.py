@@ -0,0 +1,29 @@
+# app/api/responses.py
+"""
+orjson responses for trusted read paths.
+
+List endpoints select plain column tuples with Core ``select()`` and hand
+them to ``RowsResponse``. Returning a Response instance makes FastAPI skip
+``response_model`` validation and ``jsonable_encoder``, while the model on
+the route decorator still publishes the OpenAPI schema. Only use it where
+the selected column labels are exactly the model's fields and the database
+already guarantees their types. ``CachedJSONResponse`` sends a body that was
+serialized that way earlier (app/services/account_cache.py) byte for byte.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy import Row
+
+
+class RowsResponse(ORJSONResponse):
+    """A JSON array of objects, one per row, keyed by the row's column labels."""
+
+    def __init__(self, rows: Iterable[Row], **kwargs):
+        super().__init__([row._asdict() for row in rows], **kwargs)
+
+
+class CachedJSONResponse(Response):
+    media_type = "application/json"
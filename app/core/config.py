@@ -6,6 +6,97 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
 
+    # Async stack: asyncpg engine + redis.asyncio on the hot endpoints
+    ASYNC_MODE: bool = False
+    ASYNC_DATABASE_URL: str | None = None    # default: DATABASE_URL with +asyncpg
+
+    # Read replicas for GET endpoints (comma-separated URLs; empty = primary only)
+    READ_REPLICA_URLS: str = ""
+    READ_REPLICA_CHECK_SECONDS: float = 5.0      # health probe interval per replica
+    READ_REPLICA_RETRY_SECONDS: float = 30.0     # how long a failed replica is skipped
+    READ_YOUR_WRITES_SECONDS: int = 5            # primary pin after a user's commit
+
+    # Prometheus metrics on /metrics (per-route latency, SQL, Redis, SMTP, pools)
+    METRICS_ENABLED: bool = True
+
+    # Per-request SQL statement budgets + N+1 detection (development / tests)
+    QUERY_BUDGET_ENABLED: bool = False
+    QUERY_BUDGET_REPEAT_THRESHOLD: int = 3    # same statement this often in one request = N+1
+
+    # Per-request stack sampling (X-Profile: 1 from an admin, or a random share of traffic)
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_PERCENT: float = 0.0      # 0-100
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_MAX_FILES: int = 200
+
+    # Lifespan warm-up: pooled connections opened before /health/ready says yes
+    WARMUP_DB_CONNECTIONS: int = 5
+    WARMUP_REDIS_CONNECTIONS: int = 5
+    WARMUP_RETRY_SECONDS: float = 2.0
+
+    # Group commit: batch OTP-confirmed settlements into one transaction
+    SETTLEMENT_GROUP_COMMIT: bool = False
+    SETTLEMENT_GROUP_MAX_OPS: int = 64
+    SETTLEMENT_GROUP_WINDOW_MS: float = 2.0
+    SETTLEMENT_GROUP_TIMEOUT_SECONDS: float = 10.0     # callers get a 503 after this
+
+    # Sharded sub-balances for hot accounts
+    BALANCE_FOLD_INTERVAL_SECONDS: float = 5.0
+    BALANCE_SHARD_REFRESH_SECONDS: float = 30.0
+
+    # Pending-row reaper (lifespan task)
+    PENDING_REAPER_ENABLED: bool = True
+    PENDING_REAPER_INTERVAL_SECONDS: float = 60.0
+    PENDING_REAPER_BATCH_SIZE: int = 500
+    PENDING_EXPIRY_SECONDS: int | None = None    # default: OTP_TTL_SECONDS + 60
+
+    # Monthly partitions + cold archive (python -m app.maintenance.partitions)
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_ENSURE_ENABLED: bool = True     # lifespan task creating upcoming months
+    PARTITION_ENSURE_INTERVAL_SECONDS: float = 6 * 3600
+    PARTITION_RETENTION_MONTHS: int = 24      # older transactions partitions are archived and dropped
+    ARCHIVE_DIR: str = "archive"              # gzip CSV per table/month
+
+    # Sliding-window rate limits, "<count>/<second|minute|hour>" ("" = unlimited)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN_PER_IP: str = "30/minute"
+    RATE_LIMIT_LOGIN_PER_ACCOUNT: str = "5/minute"
+    RATE_LIMIT_OTP_SEND_PER_IP: str = "20/minute"
+    RATE_LIMIT_OTP_SEND_PER_ACCOUNT: str = "3/minute"
+    RATE_LIMIT_OTP_VERIFY_PER_IP: str = "60/minute"
+    RATE_LIMIT_OTP_VERIFY_PER_ACCOUNT: str = "10/minute"
+    RATE_LIMIT_INITIATE_PER_IP: str = "60/minute"
+    RATE_LIMIT_INITIATE_PER_ACCOUNT: str = "20/minute"
+
+    # Velocity / fraud checks on transfer initiate (app/services/risk.py).
+    # Rules: "<user|account>:<count|amount>:<threshold>/<minute|hour|day>:<step_up|deny>", comma-separated;
+    # a rule fires when the window total *including this transfer* goes over the threshold.
+    RISK_CHECKS_ENABLED: bool = True
+    RISK_RULES: str = (
+        "user:count:10/minute:deny,"
+        "account:count:30/hour:step_up,"
+        "account:amount:5000/hour:step_up,"
+        "account:amount:20000/day:deny,"
+        "user:amount:50000/day:deny"
+    )
+    RISK_NEW_PAYEE_SECONDS: int = 86_400       # a payee first paid this recently is still "new"
+    RISK_NEW_PAYEE_MIN_AMOUNT: float = 1000.0  # ... and only matters from this amount up
+    RISK_NEW_PAYEE_ACTION: str = "step_up"
+
+    # Write-through cache of GET /accounts/ bodies (app/services/account_cache.py)
+    BALANCE_CACHE_ENABLED: bool = True
+    BALANCE_CACHE_TTL_SECONDS: int = 60
+
+    # Principal cache (get_current_user)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10_000
+    PRINCIPAL_CACHE_REDIS: bool = False      # shared second tier across workers
+
+    # bcrypt process pool (0 workers = hash inline)
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_MAX_QUEUE: int = 16
+    PASSWORD_POOL_TIMEOUT_SECONDS: float = 10.0
+
     class Config:
         env_file = ".env"  # Path to your .env file
 
@@ -0,0 +1,155 @@
+# app/core/instrumentation.py
+"""
+Hooks that feed app/core/metrics.py.
+
+- ``MetricsMiddleware`` (pure ASGI, so streamed bodies are timed to the
+  last chunk) records latency and status per route *template*, plus how
+  many SQL statements the request ran and how long they took.
+- ``before/after_cursor_execute`` listeners on the Engine class time
+  every statement on every engine (primary, replicas, the async engine's
+  sync core) and add it to the current request's tally, which lives in a
+  context variable (Starlette copies the context into the threadpool that
+  runs sync endpoints).
+- Gauges for each built engine's pool and for the existing ``*_stats()``
+  snapshots (mailer, bcrypt pool, group committer).
+"""
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import Engine, event
+
+from app.core import metrics
+from app.core.password_pool import password_pool_stats
+from app.db import session as db_session
+from app.db.routing import replicas
+from app.utils.mailer import mailer_stats
+
+
+class _RequestTally:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_tally: ContextVar[_RequestTally | None] = ContextVar("request_db_tally", default=None)
+
+
+# ─────────────────────────────
+# SQL timing
+# ─────────────────────────────
+_VERBS = {"select", "insert", "update", "delete"}
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    verb = statement.lstrip()[:6].lower()
+    metrics.DB_SECONDS.observe(elapsed, verb if verb in _VERBS else "other")
+    tally = _tally.get()
+    if tally is not None:
+        tally.queries += 1
+        tally.seconds += elapsed
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(ctx):
+    started = ctx.connection.info.get("query_started") if ctx.connection is not None else None
+    if started:
+        started.pop()
+
+
+# ─────────────────────────────
+# HTTP
+# ─────────────────────────────
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        tally = _RequestTally()
+        token = _tally.set(tally)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _tally.reset(token)
+            # FastAPI puts the matched APIRoute in the scope; templates keep cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            metrics.HTTP_REQUESTS.inc(method, path, str(status))
+            metrics.HTTP_SECONDS.observe(elapsed, method, path)
+            metrics.HTTP_DB_QUERIES.observe(tally.queries, method, path)
+            metrics.HTTP_DB_SECONDS.observe(tally.seconds, method, path)
+
+
+# ─────────────────────────────
+# Gauges
+# ─────────────────────────────
+def _engines():
+    """(role, Engine) for every engine already built; never builds one."""
+    if db_session._engine is not None:
+        yield "primary", db_session._engine
+    if db_session._async_engine is not None:
+        yield "primary_async", db_session._async_engine.sync_engine
+    for i, replica in enumerate(replicas.replicas):
+        if replica._engine is not None:
+            yield f"replica{i}", replica._engine
+
+def _pool_gauge(read):
+    def collect():
+        for role, engine in _engines():
+            value = read(engine.pool)
+            if value is not None:
+                yield {"engine": role}, value
+    return collect
+
+def _waiters(pool) -> int | None:
+    # QueuePool blocks checkouts on a Condition; its waiter list is the queue of waiting threads
+    condition = getattr(getattr(pool, "_pool", None), "not_empty", None)
+    waiters = getattr(condition, "_waiters", None)
+    return len(waiters) if waiters is not None else None
+
+def _sized(name):
+    return lambda pool: getattr(pool, name)() if hasattr(pool, name) else None
+
+
+metrics.register(metrics.Gauge("db_pool_size", "Configured pool size", _pool_gauge(_sized("size"))))
+metrics.register(metrics.Gauge(
+    "db_pool_checked_out", "Connections currently checked out", _pool_gauge(_sized("checkedout"))))
+metrics.register(metrics.Gauge(
+    "db_pool_checked_in", "Idle connections in the pool", _pool_gauge(_sized("checkedin"))))
+metrics.register(metrics.Gauge(
+    "db_pool_overflow", "Connections beyond pool_size (negative = unopened slots)", _pool_gauge(_sized("overflow"))))
+metrics.register(metrics.Gauge("db_pool_waiters", "Threads waiting for a connection", _pool_gauge(_waiters)))
+
+metrics.register_snapshot("mailer", "SMTP dispatcher", mailer_stats)
+metrics.register_snapshot("password_pool", "bcrypt process pool", password_pool_stats)
+
+
+def _group_commit_stats() -> dict:
+    from app.services import group_commit
+    committer = group_commit._committer
+    return committer.stats() if committer is not None else {
+        "groups_total": 0, "ops_total": 0, "fallbacks_total": 0, "avg_group_size": 0.0, "queue_depth": 0,
+    }
+
+metrics.register_snapshot("group_commit", "Settlement group committer", _group_commit_stats)
@@ -0,0 +1,149 @@
+# app/core/metrics.py
+"""
+In-process metrics rendered in the Prometheus text format.
+
+Counters and histograms are plain dicts keyed by label values behind one
+lock each. A scrape of /metrics walks those dicts and calls the registered
+gauge callbacks (pool sizes, queue depths), so it costs microseconds and
+never touches the database or Redis. Values are per process; with several
+workers, scrape each one (or sum in Prometheus).
+
+Recording sites: MetricsMiddleware (HTTP), the SQLAlchemy cursor hooks in
+app/core/instrumentation.py (DB), the timed Redis clients in
+app/utils/otp.py and the SMTP dispatcher in app/utils/mailer.py.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Callable, Iterable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+GaugeFn = Callable[[], Iterable[tuple[dict, float]]]
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.doc, self.labelnames = name, doc, labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.doc, self.labelnames, self.buckets = name, doc, labelnames, buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(row)) for labels, row in self._values.items()]
+        names = self.labelnames + ("le",)
+        for labels, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {row[-1]}"
+
+
+class Gauge:
+    """Read at scrape time from ``fn``, which yields (labels, value) pairs."""
+
+    def __init__(self, name: str, doc: str, fn: GaugeFn, kind: str = "gauge"):
+        self.name, self.doc, self.fn, self.kind = name, doc, fn, kind
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.fn():
+            names = tuple(labels)
+            yield f"{self.name}{_labels(names, tuple(labels[n] for n in names))} {value}"
+
+
+_registry: list = []
+_registry_lock = threading.Lock()
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+def register_snapshot(prefix: str, doc: str, snapshot: Callable[[], dict]) -> None:
+    """Export every numeric field of an existing ``*_stats()`` snapshot dict."""
+    def field(key: str) -> GaugeFn:
+        return lambda: [({}, snapshot()[key])]
+
+    for key, value in snapshot().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            kind = "counter" if key.endswith("_total") else "gauge"
+            register(Gauge(f"{prefix}_{key}", f"{doc}: {key}", field(key), kind))
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines: list[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ─────────────────────────────
+# Metrics recorded across the app
+# ─────────────────────────────
+HTTP_REQUESTS = register(Counter(
+    "http_requests_total", "HTTP responses by route template and status", ("method", "route", "status")))
+HTTP_SECONDS = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")))
+HTTP_DB_QUERIES = register(Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ("method", "route"), COUNT_BUCKETS))
+HTTP_DB_SECONDS = register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request", ("method", "route"), FAST_BUCKETS))
+DB_SECONDS = register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency by verb", ("verb",), FAST_BUCKETS))
+REDIS_SECONDS = register(Histogram(
+    "redis_command_duration_seconds", "Redis command latency", ("command",), FAST_BUCKETS))
+REDIS_ERRORS = register(Counter(
+    "redis_command_errors_total", "Redis commands that raised", ("command",)))
+SMTP_SECONDS = register(Histogram(
+    "smtp_send_duration_seconds", "SMTP send_message latency by outcome", ("outcome",), LATENCY_BUCKETS))
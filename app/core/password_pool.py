@@ -0,0 +1,192 @@
+# app/core/password_pool.py
+"""
+Bounded process pool for bcrypt work.
+
+bcrypt is deliberately slow; running it inline ties up a request thread
+(and the GIL-heavy parts of passlib) for hundreds of milliseconds. Work is
+shipped to a small process pool instead, and the number of hashes allowed
+in flight is capped so a login storm is rejected fast rather than queueing
+behind itself and starving the shared AnyIO threadpool.
+
+Only awaiting callers (``run_async``) may queue behind busy workers. A sync
+caller (``run``) holds a threadpool thread while it waits, so it gets
+PasswordPoolBusy (503) unless a worker is idle right now.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from app.core.config import settings
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+
+# ─────────────────────────────
+# Metrics
+# ─────────────────────────────
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.wait_seconds_total = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": settings.PASSWORD_POOL_WORKERS,
+                "capacity": _capacity(),
+                "queue_depth": self.in_flight,
+                "rejected_total": self.rejected,
+                "completed_total": self.completed,
+                "hash_seconds_total": self.hash_seconds_total,
+                "hash_seconds_max": self.hash_seconds_max,
+                "wait_seconds_total": self.wait_seconds_total,
+            }
+
+
+stats = _Stats()
+
+def password_pool_stats() -> dict:
+    return stats.snapshot()
+
+
+# ─────────────────────────────
+# Pool lifecycle
+# ─────────────────────────────
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_slots: threading.BoundedSemaphore | None = None
+
+def _capacity() -> int:
+    return settings.PASSWORD_POOL_WORKERS + settings.PASSWORD_POOL_MAX_QUEUE
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(_capacity())
+            if _executor is None:
+                # spawn, not fork: the parent is multi-threaded by the time we get here
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+def shutdown_password_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def _discard_broken(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died; the next submit builds a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def pool_enabled() -> bool:
+    return settings.PASSWORD_POOL_WORKERS > 0
+
+
+# ─────────────────────────────
+# Submission
+# ─────────────────────────────
+def _timed(fn: Callable[..., Any], *args) -> tuple[Any, float]:
+    """Runs inside the worker process."""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+def submit(fn: Callable[..., Any], *args, may_queue: bool = True) -> Future:
+    """
+    Queue ``fn(*args)`` on the pool. Raises PasswordPoolBusy immediately
+    if the pool already holds its maximum number of jobs, or, with
+    ``may_queue=False``, if no worker is idle.
+    """
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        with stats._lock:
+            stats.rejected += 1
+        raise PasswordPoolBusy("password hashing queue is full")
+
+    with stats._lock:
+        if not may_queue and stats.in_flight >= settings.PASSWORD_POOL_WORKERS:
+            stats.rejected += 1
+            _slots.release()
+            raise PasswordPoolBusy("no idle password hashing worker")
+        stats.in_flight += 1
+    queued_at = time.perf_counter()
+    outer: Future = Future()
+
+    def _done(inner: Future) -> None:
+        _slots.release()
+        with stats._lock:
+            stats.in_flight -= 1
+        exc = inner.exception()
+        if isinstance(exc, BrokenProcessPool):
+            # A worker was killed mid-hash: rebuild the pool and let the caller answer 503
+            _discard_broken(executor)
+            busy = PasswordPoolBusy("password hashing worker died")
+            busy.__cause__ = exc
+            outer.set_exception(busy)
+            return
+        if exc is not None:
+            outer.set_exception(exc)
+            return
+        result, hash_seconds = inner.result()
+        with stats._lock:
+            stats.completed += 1
+            stats.hash_seconds_total += hash_seconds
+            stats.hash_seconds_max = max(stats.hash_seconds_max, hash_seconds)
+            stats.wait_seconds_total += time.perf_counter() - queued_at - hash_seconds
+        outer.set_result(result)
+
+    try:
+        try:
+            inner = executor.submit(_timed, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill etc.); start a fresh pool once
+            _discard_broken(executor)
+            executor = _get_executor()
+            inner = executor.submit(_timed, fn, *args)
+    except Exception:
+        _slots.release()
+        with stats._lock:
+            stats.in_flight -= 1
+        raise
+    inner.add_done_callback(_done)
+    return outer
+
+def run(fn: Callable[..., Any], *args) -> Any:
+    """Blocking helper for sync callers; never queues (see the module docstring)."""
+    try:
+        return submit(fn, *args, may_queue=False).result(timeout=settings.PASSWORD_POOL_TIMEOUT_SECONDS)
+    except TimeoutError as exc:
+        raise PasswordPoolBusy("password hashing timed out") from exc
+
+async def run_async(fn: Callable[..., Any], *args) -> Any:
+    """Awaitable helper; keeps the event loop and threadpool free while bcrypt runs."""
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(submit(fn, *args)),
+            timeout=settings.PASSWORD_POOL_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError as exc:
+        raise PasswordPoolBusy("password hashing timed out") from exc
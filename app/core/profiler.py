@@ -0,0 +1,210 @@
+# app/core/profiler.py
+"""
+On-demand per-request stack sampling.
+
+A request is profiled when it carries ``X-Profile: 1`` together with the
+bearer token of an admin (``User.is_admin``), or at random for
+PROFILE_SAMPLE_PERCENT of requests. For its duration a daemon thread
+samples ``sys._current_frames()`` every PROFILE_INTERVAL_MS for the
+threads doing that request's work: the event-loop thread, plus the
+threadpool thread running a sync endpoint (``track_endpoint_threads``
+wraps each sync endpoint so it announces its thread to the active
+profile). Idle samples (selector / lock waits) are dropped.
+
+The result is written to PROFILE_DIR as a collapsed-stack file
+(``frame;frame;frame count`` per line), which flamegraph.pl,
+speedscope and inferno read directly. Only the newest PROFILE_MAX_FILES
+are kept. Admins list and download them through /admin/profiles.
+
+Caveats: on the event loop, samples from other requests' coroutines that
+interleave with this one are included. Work a sync endpoint hands to
+other threads (the bcrypt process pool, group commit) shows up only as
+the wait for it.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_NAME = re.compile(r"^[0-9TZ-]+_[A-Z]+_[\w.-]+_\d+ms\.collapsed$")
+
+# Leaf frames that mean "this thread is waiting, not working"
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+
+class _Profile:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.threads: set[int] = {threading.get_ident()}
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is not None and not frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    self.samples[_collapse(frame)] += 1
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+_active: ContextVar[_Profile | None] = ContextVar("request_profile", default=None)
+
+
+# ─────────────────────────────
+# Endpoint thread tracking
+# ─────────────────────────────
+def _tracked(fn):
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        ident = threading.get_ident()
+        profile.threads.add(ident)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.threads.discard(ident)
+    return run
+
+def track_endpoint_threads(app: FastAPI) -> None:
+    """Wrap every sync endpoint so a profiled request also samples its threadpool thread."""
+    for route in app.routes:
+        call = getattr(getattr(route, "dependant", None), "call", None)
+        if isinstance(route, APIRoute) and inspect.isfunction(call) and not (
+            asyncio.iscoroutinefunction(call) or inspect.isgeneratorfunction(call)
+        ):
+            route.dependant.call = _tracked(call)
+
+
+# ─────────────────────────────
+# Storage
+# ─────────────────────────────
+def profile_dir() -> Path:
+    return Path(settings.PROFILE_DIR)
+
+def _write(profile: _Profile, method: str, route: str, elapsed: float) -> Path | None:
+    if not profile.samples:
+        return None
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    slug = re.sub(r"[^\w.-]+", "-", route.strip("/")) or "root"
+    path = directory / f"{stamp}_{method}_{slug}_{int(elapsed * 1000)}ms.collapsed"
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in profile.samples.most_common()))
+
+    # Keep the newest PROFILE_MAX_FILES
+    files = sorted(directory.glob("*.collapsed"))
+    for old in files[: max(0, len(files) - settings.PROFILE_MAX_FILES)]:
+        old.unlink(missing_ok=True)
+    return path
+
+def list_profiles() -> list[dict]:
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    out = []
+    for path in sorted(directory.glob("*.collapsed"), reverse=True):
+        stamp, method, rest = path.stem.split("_", 2)
+        route, duration = rest.rsplit("_", 1)
+        out.append({
+            "name": path.name,
+            "captured_at": datetime.strptime(stamp, "%Y%m%dT%H%M%S%fZ").replace(tzinfo=timezone.utc),
+            "method": method,
+            "route": route,
+            "duration_ms": int(duration.removesuffix("ms")),
+            "samples": sum(int(line.rsplit(" ", 1)[1]) for line in path.read_text().splitlines()),
+        })
+    return out
+
+
+# ─────────────────────────────
+# Middleware
+# ─────────────────────────────
+def _requested_by_admin(authorization: str) -> bool:
+    from app.api.endpoints.auth import _principal, _token_subject
+    from app.db.session import SessionLocal
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    db = SessionLocal()
+    try:
+        return _principal(db, _token_subject(token)).is_admin
+    except Exception:
+        return False
+    finally:
+        db.close()
+
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def _wanted(self, scope) -> bool:
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) == b"1":
+            authorization = headers.get(b"authorization", b"").decode("latin-1")
+            return await asyncio.to_thread(_requested_by_admin, authorization)
+        return random.random() * 100 < settings.PROFILE_SAMPLE_PERCENT
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not await self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = _Profile(settings.PROFILE_INTERVAL_MS / 1000)
+        token = _active.set(profile)
+        started = time.perf_counter()
+        profile.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - started
+            _active.reset(token)
+            await asyncio.to_thread(profile.stop)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            try:
+                path = await asyncio.to_thread(_write, profile, scope["method"], route, elapsed)
+                if path is not None:
+                    log.info("profiled %s %s in %.0f ms → %s", scope["method"], route, elapsed * 1000, path)
+            except OSError:
+                log.exception("could not write request profile")
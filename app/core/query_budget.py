@@ -0,0 +1,159 @@
+# app/core/query_budget.py
+"""
+Per-request SQL statement budgets and an N+1 detector.
+
+Hot endpoints declare how many statements they may run:
+
+    @router.post("/verify", response_model=TransactionOut)
+    @query_budget(6)
+    def verify_transfer(...): ...
+
+With QUERY_BUDGET_ENABLED (development, tests) ``QueryBudgetMiddleware``
+opens a ``QueryBudget`` around every request. Engine-level cursor hooks
+count each statement into the open budget; when the request ends, going
+over the declared limit or running the same statement text
+QUERY_BUDGET_REPEAT_THRESHOLD or more times (the N+1 signature) is logged
+with the app frames that issued it and appended to ``violations``. The
+pytest plugin in app/testing/pytest_plugin.py turns those into test
+failures. Disabled, the middleware costs one attribute check per request.
+
+``QueryBudget`` is also a context manager for code outside a request:
+
+    with QueryBudget(3, label="fold"):
+        fold(db, account_number)      # QueryBudgetExceeded on a 4th statement
+
+Statements run by the group-commit thread belong to no request and are
+not counted.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, TypeVar
+
+from sqlalchemy import Engine, event
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A block or request ran more SQL statements than it declared."""
+
+
+@dataclass
+class _Seen:
+    count: int = 0
+    stack: list[str] = field(default_factory=list)     # app frames of the first occurrence
+
+
+def _app_stack() -> list[str]:
+    return [
+        f"{frame.filename}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(_APP_ROOT) and frame.filename != _THIS_FILE
+    ]
+
+
+class QueryBudget:
+    def __init__(self, limit: int | None = None, *, label: str = "",
+                 repeat_threshold: int | None = None, capture_stacks: bool = True):
+        self.limit = limit
+        self.label = label
+        self.repeat_threshold = repeat_threshold or settings.QUERY_BUDGET_REPEAT_THRESHOLD
+        self.capture_stacks = capture_stacks
+        self.count = 0
+        self.statements: dict[str, _Seen] = {}
+        self._parent: QueryBudget | None = None
+        self._token = None
+
+    def record(self, statement: str) -> None:
+        self.count += 1
+        seen = self.statements.get(statement)
+        if seen is None:
+            seen = self.statements[statement] = _Seen(stack=_app_stack() if self.capture_stacks else [])
+        seen.count += 1
+        if self._parent is not None:
+            self._parent.record(statement)
+
+    @property
+    def exceeded(self) -> bool:
+        return self.limit is not None and self.count > self.limit
+
+    def repeated(self) -> dict[str, _Seen]:
+        """Statements run ``repeat_threshold`` or more times: likely N+1 loops."""
+        return {stmt: seen for stmt, seen in self.statements.items() if seen.count >= self.repeat_threshold}
+
+    def findings(self) -> list[str]:
+        found = []
+        if self.exceeded:
+            found.append(f"{self.label or 'block'} ran {self.count} SQL statements, budget is {self.limit}")
+        for stmt, seen in self.repeated().items():
+            where = "\n    ".join(seen.stack[-6:]) or "(no app frames)"
+            found.append(
+                f"{self.label or 'block'} ran the same statement {seen.count}x (N+1?):\n"
+                f"  {' '.join(stmt.split())[:300]}\n  first issued from:\n    {where}"
+            )
+        return found
+
+    def __enter__(self) -> "QueryBudget":
+        self._parent = _current.get()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current.reset(self._token)
+        if exc_type is None and self.exceeded:
+            raise QueryBudgetExceeded("\n".join(self.findings()))
+
+
+_current: ContextVar[QueryBudget | None] = ContextVar("query_budget", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    budget = _current.get()
+    if budget is not None:
+        budget.record(statement)
+
+
+def query_budget(limit: int) -> Callable[[F], F]:
+    """Declare the most SQL statements an endpoint may run per request."""
+    def mark(fn: F) -> F:
+        fn.__query_budget__ = limit
+        return fn
+    return mark
+
+
+# Findings of the requests checked so far (the pytest plugin drains this)
+violations: deque[str] = deque(maxlen=1000)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.QUERY_BUDGET_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        budget = QueryBudget()
+        with budget:
+            await self.app(scope, receive, send)
+        # The route, and so its declared budget, is only known once routing has run
+        route = scope.get("route")
+        budget.limit = getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+        budget.label = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+        for finding in budget.findings():
+            log.warning("query budget: %s", finding)
+            violations.append(finding)
@@ -3,15 +3,39 @@ from typing import Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core import password_pool
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def hash_password(password: str) -> str:
+# Inline variants; these are also what the pool workers execute
+def _hash_inline(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_inline(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# bcrypt goes through the bounded process pool unless PASSWORD_POOL_WORKERS=0.
+# Both raise password_pool.PasswordPoolBusy when the queue is full.
+def hash_password(password: str) -> str:
+    if not password_pool.pool_enabled():
+        return _hash_inline(password)
+    return password_pool.run(_hash_inline, password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if not password_pool.pool_enabled():
+        return _verify_inline(plain_password, hashed_password)
+    return password_pool.run(_verify_inline, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    if not password_pool.pool_enabled():
+        return _hash_inline(password)
+    return await password_pool.run_async(_hash_inline, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    if not password_pool.pool_enabled():
+        return _verify_inline(plain_password, hashed_password)
+    return await password_pool.run_async(_verify_inline, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -0,0 +1,80 @@
+# app/core/warmup.py
+"""
+Readiness-gated warm-up, run from the lifespan.
+
+Importing the app opens nothing: the engine and the Redis clients are built
+on first use. At startup this task pre-opens WARMUP_DB_CONNECTIONS pooled
+database connections and WARMUP_REDIS_CONNECTIONS Redis connections (plus
+their async twins in ASYNC_MODE) and renders the OpenAPI schema, retrying
+every WARMUP_RETRY_SECONDS until everything answers. ``/health/ready``
+reports 503 until then, so a load balancer only routes to warm workers and
+an unreachable Redis or database shows up as "not ready" with a logged
+reason instead of as errors on the first requests.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.db.session import get_async_engine, get_engine
+from app.utils import otp
+
+log = logging.getLogger(__name__)
+
+
+def _warm_db(n: int) -> None:
+    engine = get_engine()
+    conns = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conns.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in conns:
+            conn.close()            # back to the pool, still open
+
+def _warm_redis(n: int) -> None:
+    pool = otp.get_redis().connection_pool
+    conns = [pool.get_connection() for _ in range(n)]
+    for conn in conns:
+        pool.release(conn)
+
+async def _awarm_db(n: int) -> None:
+    engine = get_async_engine()
+    conns = []
+    try:
+        for _ in range(n):
+            conn = await engine.connect()
+            conns.append(conn)
+            await conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in conns:
+            await conn.close()
+
+async def _awarm_redis(n: int) -> None:
+    pool = otp.get_async_redis().connection_pool
+    conns = [await pool.get_connection() for _ in range(n)]
+    for conn in conns:
+        await pool.release(conn)
+
+
+async def warm_up(app: FastAPI) -> None:
+    """Open the pools and build the schema, then mark the app ready."""
+    while True:
+        try:
+            await asyncio.to_thread(_warm_db, settings.WARMUP_DB_CONNECTIONS)
+            await asyncio.to_thread(_warm_redis, settings.WARMUP_REDIS_CONNECTIONS)
+            if settings.ASYNC_MODE:
+                await _awarm_db(settings.WARMUP_DB_CONNECTIONS)
+                await _awarm_redis(settings.WARMUP_REDIS_CONNECTIONS)
+            break
+        except Exception:
+            log.warning("warm-up failed; retrying in %.1fs", settings.WARMUP_RETRY_SECONDS, exc_info=True)
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+    app.openapi()
+    app.state.ready = True
+    log.info("warm-up complete")
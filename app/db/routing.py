@@ -0,0 +1,189 @@
+# app/db/routing.py
+"""
+Read-replica routing.
+
+GET endpoints take their session from ``read_session`` instead of
+SessionLocal. Replicas from settings.READ_REPLICA_URLS are picked
+round-robin, skipping any that failed a ``SELECT 1`` probe or dropped a
+connection, for READ_REPLICA_RETRY_SECONDS. The probes run every
+READ_REPLICA_CHECK_SECONDS on a lifespan task (``run_replica_monitor``), off
+the request path, so picking a replica never waits on a connect. With no
+healthy replica, reads go to the primary.
+
+Read-your-writes: a primary session that commits a write on behalf of an
+authenticated user (``session.info["subject"]``, set by get_current_user)
+pins that user to the primary for READ_YOUR_WRITES_SECONDS. The pin lives
+in Redis so it holds across workers. AsyncSession commits (ASYNC_MODE) and
+group commits do not go through that hook; they call ``apin_primary`` /
+``pin_primary`` themselves. Checking the pin costs every replica-routed
+read one Redis EXISTS (only when replicas are configured and one is
+healthy); if Redis cannot answer, the read goes to the primary.
+
+Replica engines are created on first use, like the primary's, so importing
+the app never loads a DBAPI driver or opens a pool.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+
+from redis.exceptions import RedisError
+from sqlalchemy import Engine, create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.utils import otp
+
+log = logging.getLogger(__name__)
+
+
+# ─────────────────────────────
+# Replica set
+# ─────────────────────────────
+class _Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+        self._engine: Engine | None = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    engine = create_engine(self.url, pool_pre_ping=True)
+                    event.listen(engine, "handle_error", self._on_error)
+                    self._engine = engine
+        return self._engine
+
+    def dispose(self) -> None:
+        engine, self._engine = self._engine, None
+        if engine is not None:
+            engine.dispose()
+
+    def _on_error(self, ctx) -> None:
+        if ctx.is_disconnect or ctx.connection is None:
+            self.mark_down()
+
+    def mark_down(self) -> None:
+        if time.monotonic() >= self.down_until:
+            log.warning("read replica %s marked down", make_url(self.url).render_as_string())
+        self.down_until = time.monotonic() + settings.READ_REPLICA_RETRY_SECONDS
+
+    def healthy(self) -> bool:
+        """Never blocks: probes run on the monitor task."""
+        return time.monotonic() >= self.down_until
+
+    def probe(self) -> bool:
+        """``SELECT 1``; marks the replica down on failure. Blocking, so never on a request thread."""
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except SQLAlchemyError:
+            self.mark_down()
+            return False
+        return True
+
+
+class ReplicaSet:
+    def __init__(self, urls: list[str]):
+        self.replicas = [_Replica(url) for url in urls]
+        self._turn = itertools.count()
+
+    def pick(self):
+        """Next healthy replica engine in round-robin order, or None."""
+        n = len(self.replicas)
+        start = next(self._turn)
+        for i in range(n):
+            replica = self.replicas[(start + i) % n]
+            if replica.healthy():
+                return replica.engine
+        return None
+
+    def probe_all(self) -> None:
+        for replica in self.replicas:
+            replica.probe()
+
+    def dispose(self) -> None:
+        """Close pooled replica connections (lifespan shutdown); rebuilt on next use."""
+        for replica in self.replicas:
+            replica.dispose()
+
+
+replicas = ReplicaSet([url.strip() for url in settings.READ_REPLICA_URLS.split(",") if url.strip()])
+
+async def run_replica_monitor(interval: float | None = None) -> None:
+    """Lifespan task: probe every replica, off the event loop, until cancelled."""
+    interval = interval or settings.READ_REPLICA_CHECK_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(replicas.probe_all)
+        except Exception:
+            log.exception("read replica probe failed")
+        await asyncio.sleep(interval)
+
+
+# ─────────────────────────────
+# Read-your-writes pin
+# ─────────────────────────────
+def _pin_key(subject: str) -> str:
+    return f"rw:pin:{subject}"
+
+def pin_primary(subject: str) -> None:
+    try:
+        otp.get_redis().setex(_pin_key(subject), settings.READ_YOUR_WRITES_SECONDS, 1)
+    except RedisError:
+        log.warning("could not set read-your-writes pin for %s", subject, exc_info=True)
+
+async def apin_primary(subject: str) -> None:
+    """pin_primary for ASYNC_MODE writes; a no-op without replicas."""
+    if not replicas.replicas:
+        return
+    try:
+        await otp.get_async_redis().setex(_pin_key(subject), settings.READ_YOUR_WRITES_SECONDS, 1)
+    except RedisError:
+        log.warning("could not set read-your-writes pin for %s", subject, exc_info=True)
+
+def is_pinned(subject: str) -> bool:
+    try:
+        return bool(otp.get_redis().exists(_pin_key(subject)))
+    except RedisError:
+        return True                            # unsure → read from the primary
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _executed(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _committed(session):
+    wrote = session.info.pop("wrote", False)
+    subject = session.info.get("subject")
+    if wrote and subject and replicas.replicas:
+        pin_primary(subject)
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _rolled_back(session, previous_transaction):
+    session.info.pop("wrote", None)
+
+
+# ─────────────────────────────
+# Sessions
+# ─────────────────────────────
+def read_session(subject: str | None = None) -> Session:
+    """A session for read-only work: a replica when one is healthy and the user is not pinned."""
+    engine = replicas.pick() if replicas.replicas else None
+    if engine is not None and not (subject and is_pinned(subject)):
+        return SessionLocal(bind=engine)
+    return SessionLocal()
@@ -1,9 +1,74 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
 
-# SQLAlchemy Engine
-engine = create_engine(settings.DATABASE_URL)
+# SQLAlchemy Engine, built on first use (the lifespan warms it up) so that
+# importing the app never loads the DBAPI driver
+_engine: Engine | None = None
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.DATABASE_URL)
+    return _engine
+
+
+class _PrimarySession(Session):
+    """Binds to the primary engine when no other bind is given."""
+
+    def __init__(self, bind=None, **kw):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kw)
+
 
 # DB session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=_PrimarySession, autocommit=False, autoflush=False)
+
+# ─────────────────────────────
+# Async stack (settings.ASYNC_MODE)
+# ─────────────────────────────
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL if set, else DATABASE_URL with its async driver."""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    return url.set(drivername=_ASYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(
+        hide_password=False
+    )
+
+# Built on first use so the sync-only deployment never imports asyncpg
+_async_engine: AsyncEngine | None = None
+_AsyncSessionLocal: async_sessionmaker | None = None
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(async_database_url())
+    return _async_engine
+
+def AsyncSessionLocal():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        _AsyncSessionLocal = async_sessionmaker(
+            get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal()
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection (lifespan shutdown); engines are rebuilt on next use."""
+    global _engine, _async_engine, _AsyncSessionLocal
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
@@ -1,23 +1,99 @@
-from fastapi import FastAPI
-from app.api.endpoints import auth, accounts, transactions, otp
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response, status
+from fastapi.responses import PlainTextResponse
+from app.api.endpoints import admin, auth, accounts, transactions, otp
 from app.api.endpoints import deposit as deposit_router
-from app.db.session import engine
-from app.db.base import Base
-from app.models import *  # ensures models are registered
+from app.core import metrics
+from app.core.config import settings
+from app.core.instrumentation import MetricsMiddleware
+from app.core.profiler import ProfilerMiddleware, track_endpoint_threads
+from app.core.query_budget import QueryBudgetMiddleware
+from app.core.warmup import warm_up
+from app.db.routing import replicas, run_replica_monitor
+from app.db.session import dispose_engines
+from app.maintenance.partitions import run_partition_keeper
 from fastapi.openapi.utils import get_openapi
+from app.services.balance_shards import run_folder
+from app.services.group_commit import stop_group_committer
+from app.services.pending_reaper import run_reaper
+from app.services.principal_cache import start_principal_listener, stop_principal_listener
+from app.utils.mailer import stop_dispatcher
+from app.utils.otp import close_redis
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing is connected at import time; pools are opened here
+    app.state.ready = False
+    tasks = [asyncio.create_task(warm_up(app)), asyncio.create_task(run_folder())]
+    if settings.PENDING_REAPER_ENABLED:
+        tasks.append(asyncio.create_task(run_reaper()))
+    if settings.PARTITION_ENSURE_ENABLED:
+        tasks.append(asyncio.create_task(run_partition_keeper()))
+    if replicas.replicas:
+        tasks.append(asyncio.create_task(run_replica_monitor()))
+    start_principal_listener()      # other workers' principal invalidations (PRINCIPAL_CACHE_REDIS)
+    yield
+    for task in tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    stop_group_committer()          # flush settlements still queued
+    await asyncio.to_thread(stop_dispatcher)     # flush queued OTP e-mail
+    await asyncio.to_thread(stop_principal_listener)
+    await dispose_engines()
+    replicas.dispose()
+    await close_redis()
+
 
 app = FastAPI(
     title="Secure Banking Backend API",
     description="A secure banking system simulation built with FastAPI, JWT, PostgreSQL, and Docker.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Register API routes
+if settings.ASYNC_MODE:
+    # Async twins must be registered first so they shadow the sync routes
+    from app.api.endpoints import aio
+    app.include_router(aio.router)
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(accounts.router, prefix="/accounts", tags=["Accounts"])
 app.include_router(transactions.router, prefix="/transactions", tags=["Transactions"])
 app.include_router(otp.router, tags=["OTP"])
 app.include_router(deposit_router.router, prefix="/deposit", tags=["Deposit"])
+app.include_router(admin.router)
+
+# ────────────────────────────────
+# Health (liveness / readiness probes)
+# ────────────────────────────────
+@app.get("/health/live", tags=["Health"])
+def live():
+    return {"status": "ok"}
+
+@app.get("/health/ready", tags=["Health"])
+def ready(response: Response):
+    if not getattr(app.state, "ready", False):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "warming up"}
+    return {"status": "ready"}
+
+# Checks declared @query_budget limits when QUERY_BUDGET_ENABLED (read per request)
+app.add_middleware(QueryBudgetMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Stack-samples requests sent with X-Profile: 1 by an admin, or PROFILE_SAMPLE_PERCENT of traffic
+app.add_middleware(ProfilerMiddleware)
+track_endpoint_threads(app)
 
 # ────────────────────────────────
 # Swagger JWT Auth Support
@@ -0,0 +1,48 @@
+# app/maintenance/balance_shards.py
+"""
+Designate hot accounts for sharded sub-balances.
+
+    python -m app.maintenance.balance_shards enable 22222222 --shards 8
+    python -m app.maintenance.balance_shards disable 22222222
+    python -m app.maintenance.balance_shards fold      # fold every sharded account now
+
+Workers pick up a change within BALANCE_SHARD_REFRESH_SECONDS; until then
+they keep crediting the main row, which is always correct.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+
+from app.db.session import SessionLocal
+from app.services.balance_shards import disable_sharding, enable_sharding, fold_all
+
+log = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance.balance_shards")
+    parser.add_argument("command", choices=("enable", "disable", "fold"))
+    parser.add_argument("account_number", nargs="?")
+    parser.add_argument("--shards", type=int, default=8)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command != "fold" and not args.account_number:
+        parser.error(f"{args.command} needs an account number")
+
+    db = SessionLocal()
+    try:
+        if args.command == "enable":
+            enable_sharding(db, args.account_number, args.shards)
+            log.info("account %s now has %d sub-balances", args.account_number, args.shards)
+        elif args.command == "disable":
+            disable_sharding(db, args.account_number)
+            log.info("account %s folded and unsharded", args.account_number)
+        else:
+            log.info("folded %d account(s)", fold_all(db))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# app/maintenance/partitions.py
+"""
+Partition maintenance for the monthly RANGE-partitioned tables.
+
+    python -m app.maintenance.partitions ensure     # create upcoming months
+    python -m app.maintenance.partitions archive    # dump + drop expired months
+    python -m app.maintenance.partitions run        # both (daily cron)
+
+``ensure`` keeps PARTITION_MONTHS_AHEAD months of empty partitions ahead of
+today so inserts never land in the DEFAULT partition. It also runs in
+every app process (``run_partition_keeper``, a lifespan task), so a missed
+cron cannot let months pile up in DEFAULT. Postgres refuses to create a
+partition whose range already has rows in DEFAULT, so for such a month
+(and for any month found only in DEFAULT) ``ensure`` detaches DEFAULT,
+creates the partition, moves those rows into it and re-attaches DEFAULT,
+all in one transaction.
+
+``archive`` writes every ``transactions`` partition that ended more than
+PARTITION_RETENTION_MONTHS ago to a gzip CSV (see
+app/services/transaction_archive.py), then detaches and drops it in one
+short transaction. The file is written first, so a crash leaves the
+partition attached and the next run simply redoes it. ``deposits``
+partitions are kept: nothing reads deposits back from the archive.
+
+Postgres only; on any other database both commands are no-ops.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.services.transaction_archive import ARCHIVE_COLUMNS, archive_path, write_archive
+
+log = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("transactions", "deposits")
+ARCHIVED_TABLES = tuple(ARCHIVE_COLUMNS)
+FETCH_SIZE = 5000
+
+
+def add_months(month: date, n: int) -> date:
+    idx = month.year * 12 + month.month - 1 + n
+    return date(idx // 12, idx % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+def list_partitions(conn: Connection, table: str) -> list[tuple[str, date]]:
+    """Monthly partitions of ``table`` as (name, first day), oldest first; DEFAULT excluded."""
+    names = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ),
+        {"table": table},
+    ).scalars()
+    pattern = re.compile(rf"^{table}_p(\d{{4}})(\d{{2}})$")
+    found = []
+    for name in names:
+        m = pattern.match(name)
+        if m:
+            found.append((name, date(int(m[1]), int(m[2]), 1)))
+    return sorted(found, key=lambda p: p[1])
+
+
+# ─────────────────────────────
+# Commands
+# ─────────────────────────────
+def _default_months(conn: Connection, default: str) -> set[date]:
+    """Months that currently have rows in the DEFAULT partition."""
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar() is None:
+        return set()
+    return {
+        m.date() for m in conn.execute(text(
+            f"SELECT DISTINCT date_trunc('month', \"timestamp\") FROM {default}"
+        )).scalars()
+    }
+
+def ensure_partitions(engine: Engine, months_ahead: int | None = None) -> list[str]:
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    this_month = datetime.utcnow().date().replace(day=1)
+    created = []
+    for table in PARTITIONED_TABLES:
+        default = f"{table}_default"
+        with engine.begin() as conn:
+            # Workers run this concurrently; one of them does the DDL
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"partitions:{table}"})
+            have = {month for _, month in list_partitions(conn, table)}
+            stranded = _default_months(conn, default) - have
+            wanted = {add_months(this_month, i) for i in range(months_ahead + 1)} | stranded
+            missing = sorted(wanted - have)
+            if stranded:
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+            for month in missing:
+                name = partition_name(table, month)
+                lo, hi = month, add_months(month, 1)
+                conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{lo}') TO ('{hi}')"
+                ))
+                if month in stranded:
+                    moved = conn.execute(text(
+                        f"WITH moved AS (DELETE FROM {default} "
+                        f"WHERE \"timestamp\" >= '{lo}' AND \"timestamp\" < '{hi}' RETURNING *) "
+                        f"INSERT INTO {table} SELECT * FROM moved"
+                    )).rowcount
+                    log.warning("moved %d rows of %s out of %s", moved, name, default)
+                created.append(name)
+            if stranded:
+                conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    return created
+
+def archive_partitions(
+    engine: Engine,
+    retention_months: int | None = None,
+    archive_dir: str | Path | None = None,
+) -> list[Path]:
+    retention_months = settings.PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    cutoff = add_months(datetime.utcnow().date().replace(day=1), -retention_months)
+    written = []
+    for table in ARCHIVED_TABLES:
+        with engine.connect() as conn:
+            expired = [(n, m) for n, m in list_partitions(conn, table) if add_months(m, 1) <= cutoff]
+        columns = ARCHIVE_COLUMNS[table]
+        for name, month in expired:
+            path = archive_path(table, month, archive_dir)
+            select_list = ", ".join(f'"{c}"' for c in columns)
+            with engine.connect() as conn:
+                rows = conn.execution_options(yield_per=FETCH_SIZE).execute(text(
+                    f'SELECT {select_list} FROM {name} ORDER BY "timestamp" DESC, id DESC'
+                ))
+                count = write_archive(path, columns, rows)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+            log.info("archived %s (%d rows) to %s", name, count, path)
+            written.append(path)
+    return written
+
+
+def _ensure_once() -> list[str]:
+    from app.db.session import get_engine
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        return []
+    return ensure_partitions(engine)
+
+async def run_partition_keeper(interval: float | None = None) -> None:
+    """Lifespan task: ``ensure`` at startup and then every interval, off the event loop."""
+    interval = interval or settings.PARTITION_ENSURE_INTERVAL_SECONDS
+    while True:
+        try:
+            for name in await asyncio.to_thread(_ensure_once):
+                log.info("created partition %s", name)
+        except Exception:
+            log.exception("partition ensure pass failed")
+        await asyncio.sleep(interval)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance.partitions")
+    parser.add_argument("command", choices=("ensure", "archive", "run"))
+    parser.add_argument("--months-ahead", type=int, default=None)
+    parser.add_argument("--retention-months", type=int, default=None)
+    parser.add_argument("--archive-dir", default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from app.db.session import get_engine
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        log.info("%s is not partitioned; nothing to do", engine.dialect.name)
+        return
+    if args.command in ("ensure", "run"):
+        for name in ensure_partitions(engine, args.months_ahead):
+            log.info("created partition %s", name)
+    if args.command in ("archive", "run"):
+        archive_partitions(engine, args.retention_months, args.archive_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, String
+from sqlalchemy import Column, Integer, Float, ForeignKey, Sequence, String
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
+# Each nextval reserves BLOCK_SIZE account-number bodies (see app/services/account_numbers.py)
+BLOCK_SIZE = 100
+account_number_seq = Sequence("account_number_seq", start=1, increment=BLOCK_SIZE, metadata=Base.metadata)
+
 class BankAccount(Base):
     __tablename__ = "bank_accounts"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     account_number = Column(String, unique=True, index=True, nullable=False)
     account_type = Column(String, nullable=False, default="savings")
     balance = Column(Float, default=0.0)
+    # >0 for hot accounts: credits are spread over this many BalanceShard rows
+    balance_shards = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship to user
     owner = relationship("User", back_populates="accounts")
@@ -0,0 +1,16 @@
+# app/models/balance_shard.py
+from sqlalchemy import Column, Integer, Float, String, ForeignKey
+from app.db.base import Base
+
+class BalanceShard(Base):
+    """
+    One of N sub-balances of a hot account (bank_accounts.balance_shards = N).
+    Credits land on a random shard; the account's balance is its own
+    ``balance`` plus the sum of its shards. See app/services/balance_shards.py.
+    """
+    __tablename__ = "account_balance_shards"
+
+    account_number = Column(String, ForeignKey("bank_accounts.account_number", ondelete="CASCADE"),
+                            primary_key=True)
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    balance = Column(Float, nullable=False, default=0.0)
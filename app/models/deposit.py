@@ -1,17 +1,22 @@
 # app/models/deposit.py
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
 
 class Deposit(Base):
+    # Monthly RANGE partitions on timestamp, like transactions
     __tablename__ = "deposits"
+    __table_args__ = (
+        Index("ix_deposits_pending_ts", "timestamp",
+              postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     account_number = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
-    status = Column(String, default="pending")
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    status = Column(String, default="pending")  # values: pending, completed, expired
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)  # partition key
 
     user = relationship("User", back_populates="deposits")
@@ -1,18 +1,30 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, String
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, String, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
 
 class Transaction(Base):
+    # On Postgres this is RANGE-partitioned by month on timestamp, with
+    # PRIMARY KEY (id, timestamp) (migration e8f14b6a9c20); id alone stays
+    # the ORM identity. Partitions: app/maintenance/partitions.py
     __tablename__ = "transactions"
+    __table_args__ = (
+        # keyset history: one ordered range scan per (account, direction)
+        Index("ix_transactions_from_ts_id", "from_account_number", "timestamp", "id"),
+        Index("ix_transactions_to_ts_id", "to_account_number", "timestamp", "id"),
+        # pending-expiry reaper: only ever as big as the live pending set
+        Index("ix_transactions_pending_ts", "timestamp",
+              postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     from_account_number = Column(String, ForeignKey("bank_accounts.account_number"), nullable=False)
     to_account_number = Column(String, ForeignKey("bank_accounts.account_number"), nullable=False)
     amount = Column(Float, nullable=False)
     reference = Column(String, nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    status = Column(String, default="completed")  # values: completed, failed, pending
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)  # partition key
+    status = Column(String, default="completed")  # values: completed, failed, pending, expired
+    batch_id = Column(Integer, ForeignKey("transfer_batches.id"), nullable=True, index=True)
 
     from_account = relationship(
         "BankAccount",
@@ -25,3 +37,5 @@ class Transaction(Base):
         foreign_keys=[to_account_number],
         back_populates="incoming_transactions"
     )
+
+    batch = relationship("TransferBatch", back_populates="legs")
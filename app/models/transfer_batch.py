@@ -0,0 +1,23 @@
+# app/models/transfer_batch.py
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Index, text
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.base import Base
+
+class TransferBatch(Base):
+    """One OTP-confirmed payout run; its legs are Transaction rows with batch_id set."""
+    __tablename__ = "transfer_batches"
+    __table_args__ = (
+        Index("ix_transfer_batches_pending_ts", "timestamp",
+              postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    from_account_number = Column(String, ForeignKey("bank_accounts.account_number"), nullable=False)
+    total_amount = Column(Float, nullable=False)
+    leg_count = Column(Integer, nullable=False)
+    status = Column(String, default="pending")  # values: pending, completed, partial, failed, expired
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+    legs = relationship("Transaction", back_populates="batch")
@@ -3,7 +3,7 @@ from typing import Optional, Literal
 
 class AccountCreate(BaseModel):
     account_type: Literal["savings", "current"] = "savings"
-    account_number: str
+    account_number: Optional[str] = None      # allocated server-side when omitted
 
 class AccountOut(BaseModel):
     id: int
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 
@@ -12,6 +12,7 @@ class TransactionCreate(BaseModel):
 class TransactionInitiateResponse(BaseModel):
     transaction_id: int
     message: str = "OTP sent to your e-mail"      # no OTP field!
+    step_up: bool = False                         # verify must also carry the password
 
     class Config:
         orm_mode = True
@@ -20,6 +21,7 @@ class TransactionInitiateResponse(BaseModel):
 class TransactionVerifyRequest(BaseModel):
     transaction_id: int
     otp_code: str
+    password: str | None = None                   # required when initiate returned step_up
 
 
 class TransactionOut(BaseModel):
@@ -33,3 +35,48 @@ class TransactionOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+# ──────────────────────────────
+# Batch transfers
+# ──────────────────────────────
+
+class BatchTransferLeg(BaseModel):
+    to_account_number: str
+    amount: float
+    reference: str | None = None
+
+
+class BatchTransferCreate(BaseModel):
+    from_account_number: str
+    legs: list[BatchTransferLeg] = Field(..., min_items=1, max_items=1000)
+
+
+class BatchInitiateResponse(BaseModel):
+    batch_id: int
+    leg_count: int
+    total_amount: float
+    message: str = "OTP sent to your e-mail"
+    step_up: bool = False
+
+
+class BatchVerifyRequest(BaseModel):
+    batch_id: int
+    otp_code: str
+    password: str | None = None
+
+
+class BatchLegResult(BaseModel):
+    transaction_id: int
+    to_account_number: str
+    amount: float
+    status: str
+    detail: str | None = None
+
+
+class BatchVerifyResponse(BaseModel):
+    batch_id: int
+    status: str
+    completed: int
+    failed: int
+    legs: list[BatchLegResult]
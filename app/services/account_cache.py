@@ -0,0 +1,205 @@
+# app/services/account_cache.py
+"""
+Write-through Redis cache of each user's ``GET /accounts/`` body.
+
+Per user there are two keys: ``acctlist:{user}`` holds the serialized JSON
+array (served as-is, no DB and no re-encoding), and ``acctlist:{user}:v``
+is a version counter. Writers and readers order themselves on it:
+
+- A path that commits a balance or account change then calls
+  ``refresh_accounts``. It bumps the versions of every affected user (the
+  actor plus the owners of credited accounts), then re-reads their account
+  lists from the primary and stores each one only if its version is still
+  the one it bumped to. A later writer has bumped again and stores its own,
+  fresher list, so an older write can never land on top of it.
+- A read miss notes the version *before* querying (a replica is fine) and
+  stores its result only if that version is unchanged and no writer has
+  filled the key in the meantime.
+
+Hits cost one MGET. On a miss or any Redis error the endpoint reads the
+database exactly as before. Entries expire after
+BALANCE_CACHE_TTL_SECONDS, which also bounds staleness if Redis was
+unreachable when a writer tried to refresh it.
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from typing import Final, Iterable
+
+import orjson
+from redis.exceptions import RedisError
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.account import BankAccount
+from app.services.balance_shards import total_balance
+from app.utils import otp
+
+log = logging.getLogger(__name__)
+
+_VERSION_TTL_SECONDS: Final = 86_400     # outlives any cached body; refreshed on every bump
+
+# KEYS: version key per user; ARGV[1] = version TTL (s). Returns the new versions.
+_BUMP_LUA = r"""
+local versions = {}
+for i, key in ipairs(KEYS) do
+  versions[i] = redis.call('INCR', key)
+  redis.call('EXPIRE', key, tonumber(ARGV[1]))
+end
+return versions
+"""
+
+# KEYS: (version key, body key) per user
+# ARGV: ttl (s), only_if_absent (0/1), then (version, body) per user
+# Stores each body only while its version is current. Returns how many were stored.
+_FILL_LUA = r"""
+local ttl = tonumber(ARGV[1])
+local only_if_absent = ARGV[2] == '1'
+local stored = 0
+for i = 1, #KEYS, 2 do
+  local current = tonumber(redis.call('GET', KEYS[i]) or '0')
+  if current == tonumber(ARGV[i + 2]) and not (only_if_absent and redis.call('EXISTS', KEYS[i + 1]) == 1) then
+    redis.call('SET', KEYS[i + 1], ARGV[i + 3], 'EX', ttl)
+    stored = stored + 1
+  end
+end
+return stored
+"""
+
+
+def accounts_query():
+    """The ``GET /accounts/`` columns (sharded accounts report main + sub-balances)."""
+    return select(BankAccount.id, BankAccount.account_number, BankAccount.account_type, total_balance())
+
+
+def serialize(rows: Iterable[Row]) -> str:
+    return orjson.dumps([row._asdict() for row in rows]).decode()
+
+
+# ─────────────────────────────
+# Redis key helpers
+# ─────────────────────────────
+def _body_key(user_id: int) -> str:
+    return f"acctlist:{user_id}"
+
+def _version_key(user_id: int) -> str:
+    return f"acctlist:{user_id}:v"
+
+def _fill_args(bodies: dict[int, tuple[int, str]], only_if_absent: bool) -> tuple[list[str], list]:
+    keys, args = [], [settings.BALANCE_CACHE_TTL_SECONDS, int(only_if_absent)]
+    for user_id, (version, body) in bodies.items():
+        keys.extend((_version_key(user_id), _body_key(user_id)))
+        args.extend((version, body))
+    return keys, args
+
+
+# ─────────────────────────────
+# Reads
+# ─────────────────────────────
+def cached_accounts(user_id: int) -> tuple[str | None, int | None]:
+    """(cached body, version) — body None on a miss, version None if Redis failed."""
+    if not settings.BALANCE_CACHE_ENABLED:
+        return None, None
+    try:
+        body, version = otp.get_redis().mget(_body_key(user_id), _version_key(user_id))
+    except RedisError:
+        log.warning("account cache: redis read failed", exc_info=True)
+        return None, None
+    return body, int(version or 0)
+
+def fill_accounts(user_id: int, version: int | None, rows: Iterable[Row]) -> str:
+    """Serialize a read-miss result and cache it if ``version`` is still current."""
+    body = serialize(rows)
+    if version is not None:
+        try:
+            keys, args = _fill_args({user_id: (version, body)}, only_if_absent=True)
+            otp.script(_FILL_LUA)(keys=keys, args=args, client=otp.get_redis())
+        except RedisError:
+            log.warning("account cache: redis fill failed", exc_info=True)
+    return body
+
+async def acached_accounts(user_id: int) -> tuple[str | None, int | None]:
+    if not settings.BALANCE_CACHE_ENABLED:
+        return None, None
+    try:
+        body, version = await otp.get_async_redis().mget(_body_key(user_id), _version_key(user_id))
+    except RedisError:
+        log.warning("account cache: redis read failed", exc_info=True)
+        return None, None
+    return body, int(version or 0)
+
+async def afill_accounts(user_id: int, version: int | None, rows: Iterable[Row]) -> str:
+    body = serialize(rows)
+    if version is not None:
+        try:
+            keys, args = _fill_args({user_id: (version, body)}, only_if_absent=True)
+            await otp.script(_FILL_LUA, asynchronous=True)(keys=keys, args=args, client=otp.get_async_redis())
+        except RedisError:
+            log.warning("account cache: redis fill failed", exc_info=True)
+    return body
+
+
+# ─────────────────────────────
+# Write-through (call after the commit)
+# ─────────────────────────────
+def _owners_query(user_id: int, credited: Iterable[str]):
+    return select(BankAccount.user_id).where(
+        BankAccount.account_number.in_(sorted(set(credited))), BankAccount.user_id != user_id
+    ).distinct()
+
+def _bodies(rows: Iterable[Row], versions: dict[int, int]) -> dict[int, tuple[int, str]]:
+    by_user: dict[int, list[dict]] = defaultdict(list)
+    for row in rows:
+        entry = row._asdict()
+        by_user[entry.pop("user_id")].append(entry)
+    # A user whose last account was just deleted caches an empty list
+    return {user_id: (version, orjson.dumps(by_user[user_id]).decode()) for user_id, version in versions.items()}
+
+def refresh_accounts(db: Session, user_id: int, credited: Iterable[str] = ()) -> None:
+    """
+    Re-cache the account lists of ``user_id`` and of the owners of the
+    ``credited`` account numbers: at most two short queries on ``db``
+    (the primary) and two Redis calls; skipped when the cache is off.
+    """
+    if not settings.BALANCE_CACHE_ENABLED:
+        return
+    credited = list(credited)
+    users = [user_id, *(db.execute(_owners_query(user_id, credited)).scalars() if credited else ())]
+    try:
+        bumped = otp.script(_BUMP_LUA)(
+            keys=[_version_key(u) for u in users], args=[_VERSION_TTL_SECONDS], client=otp.get_redis()
+        )
+    except RedisError:
+        log.warning("account cache: redis bump failed; entries expire in %ss",
+                    settings.BALANCE_CACHE_TTL_SECONDS, exc_info=True)
+        return
+    # Read only after the bump: anything committed before it is in these rows
+    rows = db.execute(accounts_query().add_columns(BankAccount.user_id).where(BankAccount.user_id.in_(users)))
+    keys, args = _fill_args(_bodies(rows, dict(zip(users, map(int, bumped)))), only_if_absent=False)
+    try:
+        otp.script(_FILL_LUA)(keys=keys, args=args, client=otp.get_redis())
+    except RedisError:
+        log.warning("account cache: redis fill failed", exc_info=True)
+
+async def arefresh_accounts(db: AsyncSession, user_id: int, credited: Iterable[str] = ()) -> None:
+    if not settings.BALANCE_CACHE_ENABLED:
+        return
+    credited = list(credited)
+    users = [user_id, *((await db.execute(_owners_query(user_id, credited))).scalars() if credited else ())]
+    try:
+        bumped = await otp.script(_BUMP_LUA, asynchronous=True)(
+            keys=[_version_key(u) for u in users], args=[_VERSION_TTL_SECONDS], client=otp.get_async_redis()
+        )
+    except RedisError:
+        log.warning("account cache: redis bump failed; entries expire in %ss",
+                    settings.BALANCE_CACHE_TTL_SECONDS, exc_info=True)
+        return
+    rows = await db.execute(accounts_query().add_columns(BankAccount.user_id).where(BankAccount.user_id.in_(users)))
+    keys, args = _fill_args(_bodies(rows, dict(zip(users, map(int, bumped)))), only_if_absent=False)
+    try:
+        await otp.script(_FILL_LUA, asynchronous=True)(keys=keys, args=args, client=otp.get_async_redis())
+    except RedisError:
+        log.warning("account cache: redis fill failed", exc_info=True)
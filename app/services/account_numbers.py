@@ -0,0 +1,115 @@
+# app/services/account_numbers.py
+"""
+Account-number allocation and validation.
+
+New numbers are 10 digits: a 9-digit body plus a Luhn check digit, so a
+mistyped number is rejected before any query runs. Bodies come from the
+``account_number_seq`` Postgres sequence, which steps by BLOCK_SIZE: each
+worker reserves a whole block with one ``nextval`` and hands numbers out of
+it in memory (hi/lo), so allocation is normally free of round trips and
+never collides. Uniqueness is left to the unique index on
+``bank_accounts.account_number``.
+
+On databases without sequences (SQLite in dev) bodies are random and the
+caller retries the insert on IntegrityError.
+
+Only numbers shaped like ours (10 digits, no leading zero) are checked
+offline. Accounts opened before allocation existed may carry any number the
+client picked, so every other shape is left to the account lookup (404).
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.account import BLOCK_SIZE, account_number_seq
+
+BODY_BASE = 100_000_000           # bodies are 9 digits: 100000000 … 999999999
+BODY_MAX = 999_999_999
+NUMBER_LENGTH = len(str(BODY_MAX)) + 1
+
+
+# ─────────────────────────────
+# Check digit
+# ─────────────────────────────
+def luhn_digit(body: str) -> str:
+    """Check digit that makes ``body + digit`` pass the Luhn test."""
+    total = 0
+    for i, ch in enumerate(reversed(body)):
+        d = int(ch)
+        if i % 2 == 0:          # doubled positions, counted from the right of the body
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return str(-total % 10)
+
+def with_check_digit(body: int | str) -> str:
+    body = str(body)
+    return body + luhn_digit(body)
+
+def looks_allocated(number: str) -> bool:
+    """Same shape as the numbers allocate_account_numbers hands out."""
+    return len(number) == NUMBER_LENGTH and number.isdigit() and number[0] != "0"
+
+def is_valid_account_number(number: str) -> bool:
+    """False only for an allocated-looking number with a wrong check digit."""
+    return not looks_allocated(number) or luhn_digit(number[:-1]) == number[-1]
+
+def check_account_number(number: str) -> str:
+    """Raise 400 for a mistyped allocated number without touching the database."""
+    if not is_valid_account_number(number):
+        raise HTTPException(400, detail=f"Invalid account number: {number}")
+    return number
+
+
+# ─────────────────────────────
+# Allocation
+# ─────────────────────────────
+class _BlockAllocator:
+    """Per-process hi/lo allocator over the stepping sequence."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._next = 0
+        self._end = 0
+
+    def take(self, db: Session, count: int) -> list[int]:
+        with self._lock:
+            if self._pid != os.getpid():        # forked worker: never reuse the parent's block
+                self._pid, self._next, self._end = os.getpid(), 0, 0
+            values: list[int] = []
+            while len(values) < count:
+                if self._next >= self._end:
+                    start = db.execute(select(account_number_seq.next_value())).scalar_one()
+                    self._next, self._end = start, start + BLOCK_SIZE
+                n = min(count - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + n))
+                self._next += n
+            return values
+
+
+_allocator = _BlockAllocator()
+
+def _uses_sequence(db: Session) -> bool:
+    return db.get_bind().dialect.supports_sequences
+
+def allocate_account_numbers(db: Session, count: int = 1) -> list[str]:
+    """
+    ``count`` fresh account numbers. Costs at most one ``nextval`` per
+    BLOCK_SIZE numbers on Postgres, nothing elsewhere.
+    """
+    if _uses_sequence(db):
+        bodies = [BODY_BASE + v for v in _allocator.take(db, count)]
+        if bodies and bodies[-1] > BODY_MAX:
+            raise HTTPException(500, detail="Account number space exhausted")
+    else:
+        bodies = [random.randint(BODY_BASE, BODY_MAX) for _ in range(count)]
+    return [with_check_digit(body) for body in bodies]
+
+def allocate_account_number(db: Session) -> str:
+    return allocate_account_numbers(db, 1)[0]
@@ -1,27 +1,70 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import hash_password, hash_password_async, verify_password, create_access_token
+from app.core.password_pool import PasswordPoolBusy
 
-def register_user(db: Session, user: UserCreate):
+def busy_error() -> HTTPException:
+    """503 for a saturated password pool (any endpoint that checks a password)."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+def register_user(db: Session, user: UserCreate, hashed: str | None = None):
+    """``hashed``: the password already hashed by an async caller (bcrypt stays off this thread)."""
     existing_user = db.query(User).filter(User.email == user.email).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
+
+    if hashed is None:
+        try:
+            hashed = hash_password(user.password)
+        except PasswordPoolBusy:
+            raise busy_error()
+
     new_user = User(
         email=user.email,
-        hashed_password=hash_password(user.password)
+        hashed_password=hashed
     )
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
     return new_user
 
+async def aregister_user(db: AsyncSession, user: UserCreate):
+    """Async twin of register_user (ASYNC_MODE)."""
+    existing_user = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    try:
+        hashed = await hash_password_async(user.password)
+    except PasswordPoolBusy:
+        raise busy_error()
+
+    new_user = User(
+        email=user.email,
+        hashed_password=hashed
+    )
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+    if not user:
         return None
+    try:
+        if not verify_password(password, user.hashed_password):
+            return None
+    except PasswordPoolBusy:
+        raise busy_error()
     return user
 
 def login_user(db: Session, email: str, password: str):
@@ -0,0 +1,198 @@
+# app/services/balance_shards.py
+"""
+Sharded sub-balances for hot destination accounts.
+
+An account with ``balance_shards = N`` takes credits on one of N
+``account_balance_shards`` rows picked at random instead of on its own
+``bank_accounts`` row, so N concurrent incoming transfers lock N different
+tuples instead of queueing on one. Its balance is the main row plus the
+sum of its shards (``total_balance``).
+
+Money flows back into the main row by folding: a background task folds
+every hot account each BALANCE_FOLD_INTERVAL_SECONDS, and a debit that the
+main row alone cannot cover folds first and retries. Folding locks the
+main row before the shards, the same order a debit takes, so the two
+cannot deadlock; plain credits only ever lock one shard.
+
+Which accounts are sharded is read from the database and cached per
+process for BALANCE_SHARD_REFRESH_SECONDS. A credit aimed at a shard that
+no longer exists falls back to the main row, so a stale cache is harmless.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.account import BankAccount
+from app.models.balance_shard import BalanceShard
+
+log = logging.getLogger(__name__)
+
+_NO_SYNC = {"synchronize_session": False}
+
+
+# ─────────────────────────────
+# Which accounts are sharded (per-process cache)
+# ─────────────────────────────
+class _ShardMap:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = float("-inf")
+        self._counts: dict[str, int] = {}
+
+    def get(self, db: Session) -> dict[str, int]:
+        if time.monotonic() - self._loaded_at < settings.BALANCE_SHARD_REFRESH_SECONDS:
+            return self._counts
+        with self._lock:
+            if time.monotonic() - self._loaded_at >= settings.BALANCE_SHARD_REFRESH_SECONDS:
+                self._counts = dict(
+                    db.execute(
+                        select(BankAccount.account_number, BankAccount.balance_shards)
+                        .where(BankAccount.balance_shards > 0)
+                    ).all()
+                )
+                self._loaded_at = time.monotonic()
+        return self._counts
+
+    def clear(self) -> None:
+        self._loaded_at = float("-inf")
+
+
+_shard_map = _ShardMap()
+
+def shard_counts(db: Session) -> dict[str, int]:
+    """{account_number: N} for every sharded account."""
+    return _shard_map.get(db)
+
+
+# ─────────────────────────────
+# Reads
+# ─────────────────────────────
+def _shard_sum(account_number_col):
+    return (
+        select(func.coalesce(func.sum(BalanceShard.balance), 0.0))
+        .where(BalanceShard.account_number == account_number_col)
+        .scalar_subquery()
+    )
+
+def total_balance():
+    """SQL expression: main balance plus shards (correlated to BankAccount)."""
+    return (BankAccount.balance + _shard_sum(BankAccount.account_number)).label("balance")
+
+def account_balance(db: Session, account_number: str) -> float | None:
+    return db.execute(
+        select(total_balance()).where(BankAccount.account_number == account_number)
+    ).scalar_one_or_none()
+
+
+# ─────────────────────────────
+# Writes
+# ─────────────────────────────
+def credit_shard(db: Session, account_number: str, amount: float, shards: int,
+                 owner_id: int | None = None) -> float | None:
+    """Credit a random shard; returns the shard's new balance or None if there is no such shard."""
+    stmt = (
+        update(BalanceShard)
+        .where(BalanceShard.account_number == account_number,
+               BalanceShard.shard == random.randrange(shards))
+        .values(balance=BalanceShard.balance + amount)
+        .returning(BalanceShard.balance)
+        .execution_options(**_NO_SYNC)
+    )
+    if owner_id is not None:
+        stmt = stmt.where(exists().where(BankAccount.account_number == account_number,
+                                         BankAccount.user_id == owner_id))
+    return db.execute(stmt).scalar_one_or_none()
+
+def fold(db: Session, account_number: str) -> float:
+    """Move every shard's balance into the main row (caller commits). Returns the amount moved."""
+    db.execute(
+        select(BankAccount.id).where(BankAccount.account_number == account_number).with_for_update()
+    )
+    # Postgres cannot FOR UPDATE an aggregate: lock the rows, sum here
+    moved = sum(
+        db.execute(
+            select(BalanceShard.balance)
+            .where(BalanceShard.account_number == account_number)
+            .with_for_update()
+        ).scalars()
+    )
+    if moved:
+        db.execute(
+            update(BalanceShard).where(BalanceShard.account_number == account_number)
+            .values(balance=0.0).execution_options(**_NO_SYNC)
+        )
+        db.execute(
+            update(BankAccount).where(BankAccount.account_number == account_number)
+            .values(balance=BankAccount.balance + moved).execution_options(**_NO_SYNC)
+        )
+    return moved
+
+def fold_all(db: Session) -> int:
+    """Fold every sharded account, one short transaction each. Returns how many moved money."""
+    folded = 0
+    for account_number in list(shard_counts(db)):
+        try:
+            if fold(db, account_number):
+                folded += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            log.exception("folding %s failed", account_number)
+    return folded
+
+
+# ─────────────────────────────
+# Designation
+# ─────────────────────────────
+def enable_sharding(db: Session, account_number: str, shards: int) -> None:
+    if shards < 1:
+        raise ValueError("shards must be at least 1")
+    fold(db, account_number)
+    db.execute(delete(BalanceShard).where(BalanceShard.account_number == account_number))
+    db.execute(insert(BalanceShard),
+               [{"account_number": account_number, "shard": i, "balance": 0.0} for i in range(shards)])
+    db.execute(
+        update(BankAccount).where(BankAccount.account_number == account_number)
+        .values(balance_shards=shards).execution_options(**_NO_SYNC)
+    )
+    db.commit()
+    _shard_map.clear()
+
+def disable_sharding(db: Session, account_number: str) -> None:
+    fold(db, account_number)
+    db.execute(delete(BalanceShard).where(BalanceShard.account_number == account_number))
+    db.execute(
+        update(BankAccount).where(BankAccount.account_number == account_number)
+        .values(balance_shards=0).execution_options(**_NO_SYNC)
+    )
+    db.commit()
+    _shard_map.clear()
+
+
+# ─────────────────────────────
+# Background folding (lifespan task)
+# ─────────────────────────────
+def fold_once() -> int:
+    db = SessionLocal()
+    try:
+        return fold_all(db)
+    finally:
+        db.close()
+
+async def run_folder(interval: float | None = None) -> None:
+    interval = interval or settings.BALANCE_FOLD_INTERVAL_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(fold_once)
+        except Exception:
+            log.exception("balance folding pass failed")
+        await asyncio.sleep(interval)
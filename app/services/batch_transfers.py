@@ -0,0 +1,106 @@
+# app/services/batch_transfers.py
+"""
+Batch (payroll-style) transfers: one source, many payees, one OTP.
+
+Creating a batch costs a fixed number of round trips whatever the leg
+count: one lookup for the source, one ``IN`` query for every destination,
+and one multi-row INSERT for the pending legs. The batch total goes
+through the velocity checks (app/services/risk.py) as one initiate, and
+every distinct destination through the new-payee rule with the sum of its
+legs.
+"""
+from __future__ import annotations
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.account import BankAccount
+from app.models.transaction import Transaction
+from app.models.transfer_batch import TransferBatch
+from app.schemas.transaction import BatchTransferCreate
+from app.services.account_numbers import check_account_number
+from app.services.balance_shards import total_balance
+from app.services.risk import RiskDecision, raise_for_risk, screen_transfer
+
+
+def otp_scope(batch_id: int) -> str:
+    """OTP / lockout scope, kept apart from single-transfer ids."""
+    return f"batch:{batch_id}"
+
+def batch_payees(payload: BatchTransferCreate) -> dict[str, float]:
+    """Destination → total it receives, for the new-payee rule."""
+    payees: dict[str, float] = {}
+    for leg in payload.legs:
+        payees[leg.to_account_number] = payees.get(leg.to_account_number, 0.0) + leg.amount
+    return payees
+
+def check_batch(db: Session, payload: BatchTransferCreate, user) -> tuple[str, float]:
+    """Validate accounts, amounts and funds without writing; returns (source, total)."""
+    check_account_number(payload.from_account_number)
+    for leg in payload.legs:
+        check_account_number(leg.to_account_number)
+
+    src = db.execute(
+        select(BankAccount.account_number, total_balance()).where(
+            BankAccount.account_number == payload.from_account_number,
+            BankAccount.user_id == user.id,
+        )
+    ).first()
+    if not src:
+        raise HTTPException(404, detail="Source account not found")
+
+    destinations = {leg.to_account_number for leg in payload.legs}
+    found = set(
+        db.execute(
+            select(BankAccount.account_number).where(BankAccount.account_number.in_(destinations))
+        ).scalars()
+    )
+    missing = sorted(destinations - found)
+    if missing:
+        raise HTTPException(404, detail=f"Destination account(s) not found: {', '.join(missing)}")
+    if src.account_number in destinations:
+        raise HTTPException(400, detail="Source and destination cannot be the same")
+    if any(leg.amount <= 0 for leg in payload.legs):
+        raise HTTPException(400, detail="Amount must be positive")
+
+    total = sum(leg.amount for leg in payload.legs)
+    if src.balance < total:
+        raise HTTPException(400, detail="Insufficient balance")
+    return src.account_number, total
+
+def insert_batch(db: Session, payload: BatchTransferCreate, user, source: str, total: float) -> TransferBatch:
+    """Write the batch and its pending legs (one multi-row INSERT) and commit."""
+    batch = TransferBatch(
+        user_id=user.id,
+        from_account_number=source,
+        total_amount=total,
+        leg_count=len(payload.legs),
+        status="pending",
+    )
+    db.add(batch)
+    db.flush()
+
+    db.execute(
+        insert(Transaction),
+        [
+            {
+                "from_account_number": source,
+                "to_account_number": leg.to_account_number,
+                "amount": leg.amount,
+                "reference": leg.reference,
+                "status": "pending",
+                "batch_id": batch.id,
+            }
+            for leg in payload.legs
+        ],
+    )
+    db.commit()
+    db.refresh(batch)
+    return batch
+
+def create_batch(db: Session, payload: BatchTransferCreate, user) -> tuple[TransferBatch, RiskDecision]:
+    source, total = check_batch(db, payload, user)
+    decision = screen_transfer(user.id, source, total, payees=batch_payees(payload))
+    raise_for_risk(decision)
+    return insert_batch(db, payload, user, source, total), decision
@@ -0,0 +1,237 @@
+# app/services/group_commit.py
+"""
+Group-commit settlement queue (settings.SETTLEMENT_GROUP_COMMIT).
+
+Instead of one COMMIT (and one WAL fsync) per OTP-confirmed settlement,
+callers hand their ``apply_*`` call to a single worker thread. The worker
+collects whatever arrives within SETTLEMENT_GROUP_WINDOW_MS (up to
+SETTLEMENT_GROUP_MAX_OPS operations), runs each one inside its own
+SAVEPOINT in one transaction, commits once and then resolves every
+caller's future with its own result or error. A failing operation only
+rolls back its savepoint, so it never poisons the rest of the group.
+
+If the group transaction itself fails (deadlock, serialization error,
+lost connection) every operation that had succeeded is retried alone
+with its own commit, so callers still get exactly one outcome each.
+
+Callers wait at most SETTLEMENT_GROUP_TIMEOUT_SECONDS and then get a 503;
+an operation that has not started by then is cancelled and never runs.
+Each operation carries the caller's token subject, and committed callers
+are pinned to the primary (read-your-writes, app/db/routing.py) before
+their futures resolve, because the group session commits for many users.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.routing import pin_primary, replicas
+
+log = logging.getLogger(__name__)
+
+ApplyFn = Callable[..., Any]      # apply_transfer / apply_deposit / apply_batch
+
+
+@dataclass
+class _Op:
+    fn: ApplyFn
+    args: tuple
+    subject: str | None = None        # pinned to the primary once committed
+    future: Future = field(default_factory=Future)
+    result: Any = None
+
+
+def _db_error(exc: SQLAlchemyError) -> HTTPException:
+    log.error("DB error in grouped settlement: %s", exc)
+    return HTTPException(500, detail="Database error")
+
+def _timed_out(future: Future) -> HTTPException:
+    if future.cancel():
+        return HTTPException(503, detail="Settlement queue is busy. Please try again.")
+    # Already running: it may still commit
+    return HTTPException(503, detail="Settlement is taking longer than usual. Check its status before retrying.")
+
+def _close(db: Session) -> None:
+    try:
+        db.close()
+    except Exception:
+        log.warning("closing a group-commit session failed", exc_info=True)
+
+def _pin(ops: list[_Op]) -> None:
+    if replicas.replicas:
+        for subject in {op.subject for op in ops if op.subject}:
+            pin_primary(subject)
+
+
+class GroupCommitter:
+    def __init__(self, session_factory: Callable[[], Session], max_ops: int | None = None,
+                 window_ms: float | None = None, timeout: float | None = None):
+        self.session_factory = session_factory
+        self.max_ops = max_ops or settings.SETTLEMENT_GROUP_MAX_OPS
+        self.window = (window_ms if window_ms is not None else settings.SETTLEMENT_GROUP_WINDOW_MS) / 1000
+        self.timeout = timeout or settings.SETTLEMENT_GROUP_TIMEOUT_SECONDS
+        self._queue: "queue.Queue[_Op | None]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.groups = 0
+        self.ops = 0
+        self.fallbacks = 0
+
+    # ── public ────────────────────────────────────────
+    def submit(self, fn: ApplyFn, *args, subject: str | None = None) -> Future:
+        self._ensure_started()
+        op = _Op(fn, args, subject)
+        self._queue.put(op)
+        return op.future
+
+    def run(self, fn: ApplyFn, *args, subject: str | None = None) -> Any:
+        """Blocking submit (sync endpoints run in the threadpool); 503 after the timeout."""
+        future = self.submit(fn, *args, subject=subject)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise _timed_out(future) from None
+
+    async def arun(self, fn: ApplyFn, *args, subject: str | None = None) -> Any:
+        future = self.submit(fn, *args, subject=subject)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise _timed_out(future) from None
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "groups_total": self.groups,
+            "ops_total": self.ops,
+            "fallbacks_total": self.fallbacks,
+            "avg_group_size": round(self.ops / self.groups, 2) if self.groups else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
+
+    # ── worker ────────────────────────────────────────
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="settlement-group-commit", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> tuple[list[_Op], bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        group = [first]
+        deadline = time.monotonic() + self.window
+        while len(group) < self.max_ops:
+            remaining = deadline - time.monotonic()
+            try:
+                op = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if op is None:
+                return group, True
+            group.append(op)
+        return group, False
+
+    def _loop(self) -> None:
+        while True:
+            group, stop = self._collect()
+            # Callers that timed out and cancelled are dropped here
+            group = [op for op in group if op.future.set_running_or_notify_cancel()]
+            try:
+                if group:
+                    self._apply_group(group)
+            except Exception:
+                # Never let one bad group kill the worker (and strand every later caller)
+                log.exception("settlement group failed")
+                for op in group:
+                    if not op.future.done():
+                        op.future.set_exception(HTTPException(500, detail="Database error"))
+            if stop:
+                return
+
+    def _apply_group(self, group: list[_Op]) -> None:
+        self.groups += 1
+        self.ops += len(group)
+        applied: list[_Op] = []
+        db = self.session_factory()
+        try:
+            for op in group:
+                try:
+                    with db.begin_nested():          # SAVEPOINT per operation
+                        op.result = op.fn(db, *op.args)
+                    applied.append(op)
+                except HTTPException as exc:
+                    op.future.set_exception(exc)
+                except SQLAlchemyError as exc:
+                    op.future.set_exception(_db_error(exc))
+            db.commit()
+            committed = True
+        except Exception:
+            db.rollback()
+            committed = False
+            log.warning("group commit of %d ops failed; settling one by one", len(group), exc_info=True)
+        finally:
+            _close(db)
+
+        if committed:
+            _pin(applied)
+            for op in applied:
+                op.future.set_result(op.result)
+            return
+        self.fallbacks += 1
+        for op in group:
+            if not op.future.done():
+                self._apply_alone(op)
+
+    def _apply_alone(self, op: _Op) -> None:
+        db = self.session_factory()
+        try:
+            result = op.fn(db, *op.args)
+            db.commit()
+            _pin([op])
+            op.future.set_result(result)
+        except HTTPException as exc:
+            db.rollback()
+            op.future.set_exception(exc)
+        except SQLAlchemyError as exc:
+            db.rollback()
+            op.future.set_exception(_db_error(exc))
+        except Exception as exc:
+            db.rollback()
+            op.future.set_exception(exc)
+        finally:
+            _close(db)
+
+
+_committer: GroupCommitter | None = None
+_committer_lock = threading.Lock()
+
+def get_group_committer() -> GroupCommitter:
+    global _committer
+    with _committer_lock:
+        if _committer is None:
+            from app.db.session import SessionLocal
+            _committer = GroupCommitter(SessionLocal)
+        return _committer
+
+def stop_group_committer() -> None:
+    if _committer is not None:
+        _committer.stop()
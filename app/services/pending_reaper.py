@@ -0,0 +1,108 @@
+# app/services/pending_reaper.py
+"""
+Expire pending transfers, batches and deposits whose OTP can no longer arrive.
+
+An initiate call inserts a ``pending`` row and the OTP for it expires in
+Redis after OTP_TTL_SECONDS; without this reaper the row would stay pending
+forever. Each pass flips rows older than the expiry cutoff to ``expired``
+in bounded batches of
+``UPDATE ... WHERE id IN (SELECT id ... LIMIT n FOR UPDATE SKIP LOCKED)``,
+committing after every batch, so it never holds many locks or blocks a
+concurrent settlement, and several workers can reap side by side. The
+inner SELECT is served by the partial ``status = 'pending'`` indexes, which
+stay as small as the live pending set.
+
+Started from the app lifespan (app/main.py) when PENDING_REAPER_ENABLED.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.deposit import Deposit
+from app.models.transaction import Transaction
+from app.models.transfer_batch import TransferBatch
+from app.utils.otp import OTP_TTL_SECONDS
+
+log = logging.getLogger(__name__)
+
+_NO_SYNC = {"synchronize_session": False}
+
+
+def expiry_cutoff(now: datetime | None = None) -> datetime:
+    # A grace period past the OTP TTL, so a verify already in flight still settles
+    seconds = settings.PENDING_EXPIRY_SECONDS or OTP_TTL_SECONDS + 60
+    return (now or datetime.utcnow()) - timedelta(seconds=seconds)
+
+def _expire_batch(db: Session, model, cutoff: datetime, limit: int, *extra) -> list[int]:
+    claim = (
+        select(model.id)
+        .where(model.status == "pending", model.timestamp < cutoff, *extra)
+        .order_by(model.timestamp)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return list(
+        db.execute(
+            update(model)
+            .where(model.id.in_(claim.scalar_subquery()), model.timestamp < cutoff)  # prunes partitions
+            .values(status="expired")
+            .returning(model.id)
+            .execution_options(**_NO_SYNC)
+        ).scalars()
+    )
+
+def reap_expired(db: Session, *, now: datetime | None = None,
+                 batch_size: int | None = None, max_batches: int = 100) -> dict[str, int]:
+    """One reaper pass; returns how many rows of each kind were expired."""
+    cutoff = expiry_cutoff(now)
+    batch_size = batch_size or settings.PENDING_REAPER_BATCH_SIZE
+    counts = {"transfers": 0, "batches": 0, "deposits": 0}
+
+    # Batch legs expire together with their batch, never on their own
+    targets = (
+        ("transfers", Transaction, (Transaction.batch_id.is_(None),)),
+        ("batches", TransferBatch, ()),
+        ("deposits", Deposit, ()),
+    )
+    for name, model, extra in targets:
+        for _ in range(max_batches):
+            ids = _expire_batch(db, model, cutoff, batch_size, *extra)
+            if ids and model is TransferBatch:
+                db.execute(
+                    update(Transaction)
+                    .where(Transaction.batch_id.in_(ids), Transaction.status == "pending")
+                    .values(status="expired")
+                    .execution_options(**_NO_SYNC)
+                )
+            db.commit()
+            counts[name] += len(ids)
+            if len(ids) < batch_size:
+                break
+    return counts
+
+def reap_once() -> dict[str, int]:
+    db = SessionLocal()
+    try:
+        return reap_expired(db)
+    finally:
+        db.close()
+
+
+async def run_reaper(interval: float | None = None) -> None:
+    """Lifespan task: reap forever, off the event loop, until cancelled."""
+    interval = interval or settings.PENDING_REAPER_INTERVAL_SECONDS
+    while True:
+        try:
+            counts = await asyncio.to_thread(reap_once)
+            if any(counts.values()):
+                log.info("expired pending rows: %s", counts)
+        except Exception:
+            log.exception("pending reaper pass failed")
+        await asyncio.sleep(interval)
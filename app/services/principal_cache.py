@@ -0,0 +1,324 @@
+# app/services/principal_cache.py
+"""
+Cache of authenticated principals for ``get_current_user``.
+
+Tier 1 is an in-process TTL/LRU keyed by the token subject (e-mail).
+Tier 2 is optional and lives in Redis so every uvicorn worker shares it.
+Entries are immutable snapshots, never live ORM objects, so they can be
+handed to any request thread safely.
+
+Changes to a user's e-mail, status, role or password are invalidated once
+the session *commits* (invalidating at flush would let a concurrent
+request reload the still-committed old row). The subject is dropped
+locally and, with PRINCIPAL_CACHE_REDIS, from Redis and published on
+``principal:invalidate`` so the listener thread in every other worker drops
+it too (started from the lifespan). Without it other workers' entries just
+expire within PRINCIPAL_CACHE_TTL_SECONDS. A lookup that began before an
+invalidation never caches its result. A listener that loses Redis keeps
+serving tier 1 while it retries and clears it once it has resubscribed,
+since it may have missed messages.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.models.user import User
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only view of a ``User`` row (quacks like one for endpoints / UserOut)."""
+    id: int
+    email: str
+    is_active: bool
+    is_admin: bool
+    created_at: datetime | None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            created_at=user.created_at,
+        )
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["created_at"] = self.created_at.isoformat() if self.created_at else None
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Principal":
+        data = json.loads(raw)
+        if data.get("created_at"):
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return cls(**data)
+
+
+# ─────────────────────────────
+# Tier 1 — in-process TTL/LRU
+# ─────────────────────────────
+class _TTLCache:
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0        # bumped by every invalidation
+
+    def get(self, key: str) -> Principal | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Principal, generation: int | None = None) -> bool:
+        """Store unless an invalidation happened since ``generation`` was read."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+            return True
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+
+_local = _TTLCache(settings.PRINCIPAL_CACHE_MAX_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+# ─────────────────────────────
+# Tier 2 — Redis (optional)
+# ─────────────────────────────
+def _redis_key(subject: str) -> str:
+    return f"principal:{subject}"
+
+def _redis_get(subject: str) -> Principal | None:
+    from app.utils.otp import get_redis
+    try:
+        raw = get_redis().get(_redis_key(subject))
+    except Exception:
+        log.warning("principal cache: redis get failed", exc_info=True)
+        return None
+    return Principal.from_json(raw) if raw else None
+
+def _redis_set(principal: Principal) -> None:
+    from app.utils.otp import get_redis
+    try:
+        get_redis().setex(_redis_key(principal.email), settings.PRINCIPAL_CACHE_TTL_SECONDS, principal.to_json())
+    except Exception:
+        log.warning("principal cache: redis set failed", exc_info=True)
+
+async def _aredis_get(subject: str) -> Principal | None:
+    from app.utils.otp import get_async_redis
+    try:
+        raw = await get_async_redis().get(_redis_key(subject))
+    except Exception:
+        log.warning("principal cache: redis get failed", exc_info=True)
+        return None
+    return Principal.from_json(raw) if raw else None
+
+async def _aredis_set(principal: Principal) -> None:
+    from app.utils.otp import get_async_redis
+    try:
+        await get_async_redis().setex(_redis_key(principal.email), settings.PRINCIPAL_CACHE_TTL_SECONDS, principal.to_json())
+    except Exception:
+        log.warning("principal cache: redis set failed", exc_info=True)
+
+def _redis_delete(subject: str) -> None:
+    from app.utils.otp import get_redis
+    try:
+        get_redis().delete(_redis_key(subject))
+    except Exception:
+        log.warning("principal cache: redis delete failed", exc_info=True)
+
+
+# ─────────────────────────────
+# Public API
+# ─────────────────────────────
+def get_principal(db: Session, subject: str) -> Principal | None:
+    """Return the principal for a token subject, hitting the DB only on a miss."""
+    principal = _local.get(subject)
+    if principal is not None:
+        return principal
+
+    generation = _local.generation
+    if settings.PRINCIPAL_CACHE_REDIS:
+        principal = _redis_get(subject)
+        if principal is not None:
+            _local.set(subject, principal, generation)
+            return principal
+
+    user = db.query(User).filter(User.email == subject).first()
+    if not user:
+        return None
+
+    principal = Principal.from_user(user)
+    if _local.set(subject, principal, generation) and settings.PRINCIPAL_CACHE_REDIS:
+        _redis_set(principal)
+    return principal
+
+async def aget_principal(db: AsyncSession, subject: str) -> Principal | None:
+    """Async twin of get_principal for the ASYNC_MODE stack."""
+    principal = _local.get(subject)
+    if principal is not None:
+        return principal
+
+    generation = _local.generation
+    if settings.PRINCIPAL_CACHE_REDIS:
+        principal = await _aredis_get(subject)
+        if principal is not None:
+            _local.set(subject, principal, generation)
+            return principal
+
+    user = (await db.execute(select(User).where(User.email == subject))).scalars().first()
+    if not user:
+        return None
+
+    principal = Principal.from_user(user)
+    if _local.set(subject, principal, generation) and settings.PRINCIPAL_CACHE_REDIS:
+        await _aredis_set(principal)
+    return principal
+
+def invalidate_principal(subject: str) -> None:
+    """Drop a subject from both tiers and from every other worker's tier 1."""
+    from app.utils.otp import get_redis
+    _local.pop(subject)
+    if not settings.PRINCIPAL_CACHE_REDIS:
+        return
+    _redis_delete(subject)
+    try:
+        get_redis().publish(_CHANNEL, subject)
+    except Exception:
+        log.warning("principal cache: invalidation broadcast failed; other workers expire it in %ss",
+                    settings.PRINCIPAL_CACHE_TTL_SECONDS, exc_info=True)
+
+def clear_principal_cache() -> None:
+    _local.clear()
+
+
+# ─────────────────────────────
+# Invalidation hooks (flush collects, commit invalidates)
+# ─────────────────────────────
+_WATCHED = ("email", "is_active", "is_admin", "hashed_password")
+_STALE = "principal_stale"
+
+def _mark_stale(target: User, *subjects: str) -> None:
+    session = object_session(target)
+    if session is None:
+        for subject in subjects:
+            invalidate_principal(subject)
+        return
+    session.info.setdefault(_STALE, set()).update(subjects)
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in _WATCHED):
+        return
+    # Old subject too, in case the e-mail itself changed
+    _mark_stale(target, target.email, *(state.attrs["email"].history.deleted or ()))
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User) -> None:
+    _mark_stale(target, target.email)
+
+@event.listens_for(Session, "after_commit")
+def _session_committed(session: Session) -> None:
+    for subject in session.info.pop(_STALE, ()):
+        invalidate_principal(subject)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _session_rolled_back(session: Session, previous_transaction) -> None:
+    # A savepoint rollback may leave earlier changes to commit; over-invalidating is harmless
+    if not previous_transaction.nested:
+        session.info.pop(_STALE, None)
+
+
+# ─────────────────────────────
+# Cross-worker listener (lifespan)
+# ─────────────────────────────
+_CHANNEL = "principal:invalidate"
+_RETRY_SECONDS = 1.0
+_listener: threading.Thread | None = None
+_listener_stop = threading.Event()
+
+def _listen() -> None:
+    from app.utils.otp import get_redis
+    down = False
+    while not _listener_stop.is_set():
+        pubsub = None
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(_CHANNEL)
+            # Anything published while we were not subscribed is lost
+            _local.clear()
+            if down:
+                log.info("principal cache: invalidation listener resubscribed")
+                down = False
+            while not _listener_stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    data = message["data"]
+                    _local.pop(data.decode() if isinstance(data, bytes) else data)
+        except Exception:
+            # Tier 1 keeps serving (bounded by its TTL) while redis is away; one warning per outage
+            if not down:
+                log.warning("principal cache: invalidation listener lost redis; retrying", exc_info=True)
+                down = True
+            _listener_stop.wait(_RETRY_SECONDS)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+def start_principal_listener() -> None:
+    """Start the thread that applies other workers' invalidations to tier 1 (PRINCIPAL_CACHE_REDIS only)."""
+    global _listener
+    if not settings.PRINCIPAL_CACHE_REDIS:
+        return
+    if _listener is not None and _listener.is_alive():
+        return
+    _listener_stop.clear()
+    _listener = threading.Thread(target=_listen, name="principal-invalidations", daemon=True)
+    _listener.start()
+
+def stop_principal_listener() -> None:
+    global _listener
+    _listener_stop.set()
+    if _listener is not None:
+        _listener.join(timeout=5)
+        _listener = None
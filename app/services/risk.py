@@ -0,0 +1,313 @@
+# app/services/risk.py
+"""
+Velocity and new-payee checks run on every transfer initiate, after the
+accounts are validated and before the pending row is inserted.
+
+Each user and each source account keeps, per distinct rule window, one
+Redis hash of time-slot counters: the window is cut into 60 slots and each
+slot holds an initiate count (HINCRBY) and amount (HINCRBYFLOAT). One Lua
+call reads the 61 slots covering every window with one HMGET per hash,
+looks every payee up in the user's first-seen hash (one HMGET; a batch
+sends all its destinations), decides, and records the attempt in the current slots unless it is denied, pruning slots that have
+left the window. Its cost is bounded by the rules (at most 61 slots per
+window), however much traffic an account sees, and it replaces a
+``SUM(amount) ... WHERE timestamp > now() - interval`` query. A window
+counts up to one slot (1/60 of it) more history than it names, never less.
+
+Decisions:
+
+- ``allow``   – carry on as before.
+- ``step_up`` – the transfer is created, but verify also needs the user's
+  password (``confirm_step_up``); wrong passwords count towards the same
+  lockout as wrong OTPs.
+- ``deny``    – 403, nothing is inserted and nothing is recorded.
+
+Initiates count whether or not they are later verified: velocity limits
+are about attempts. If Redis is unreachable, transfers are allowed (as
+with the rate limiter) and a warning is logged.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Final
+
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.password_pool import PasswordPoolBusy
+from app.core.security import verify_password, verify_password_async
+from app.models.user import User
+from app.services.auth_service import busy_error
+from app.utils import otp
+
+log = logging.getLogger(__name__)
+
+_UNITS: Final = {"minute": 60, "hour": 3600, "day": 86_400}
+_ACTIONS: Final = {"allow": 0, "step_up": 1, "deny": 2}
+_DECISIONS: Final = {v: k for k, v in _ACTIONS.items()}
+_SCOPES: Final = ("user", "account")
+_PAYEE_TTL_MS: Final = 400 * 86_400 * 1000     # known-payee memory, refreshed on use
+_SLOTS: Final = 60                              # counter slots per window
+
+# KEYS: user's payee hash, then one slot hash per (scope, window)
+# ARGV: now_ms, amount, payee count n, new_payee_ms, new_payee_min, new_payee_action,
+#       then n (payee, amount paid to it) pairs,
+#       then (slot hash index into KEYS, metric 0=count 1=amount, threshold, window_ms, action) per rule
+# Slot hash fields: c<slot> / a<slot> = count / amount, last = newest slot written
+# Returns {action, rule index (0 = none, -1 = new payee)}
+_SCREEN_LUA = r"""
+local SLOTS = %(slots)d
+local now = tonumber(ARGV[1])
+local amount = tonumber(ARGV[2])
+local npayees = tonumber(ARGV[3])
+local windows = {}
+local rules = {}
+for i = 7 + 2 * npayees, #ARGV, 5 do
+  local k = tonumber(ARGV[i])
+  rules[#rules + 1] = {k, tonumber(ARGV[i + 1]), tonumber(ARGV[i + 2]), tonumber(ARGV[i + 4])}
+  if not windows[k] then
+    local size = tonumber(ARGV[i + 3]) / SLOTS
+    windows[k] = {size = size, slot = math.floor(now / size), count = 1, amount = amount}
+  end
+end
+for k, w in pairs(windows) do
+  local fields = {}
+  for i = w.slot - SLOTS, w.slot do
+    fields[#fields + 1] = 'c' .. i
+    fields[#fields + 1] = 'a' .. i
+  end
+  local values = redis.call('HMGET', KEYS[k], unpack(fields))
+  for j = 1, #values, 2 do
+    if values[j] then
+      w.count = w.count + tonumber(values[j])
+      w.amount = w.amount + tonumber(values[j + 1] or 0)
+    end
+  end
+end
+local action, reason = 0, 0
+for i, rule in ipairs(rules) do
+  local w = windows[rule[1]]
+  local total = rule[2] == 0 and w.count or w.amount
+  if total > rule[3] and rule[4] > action then action, reason = rule[4], i end
+end
+local payees, first_seen = {}, {}
+if npayees > 0 then
+  for p = 1, npayees do payees[p] = ARGV[5 + 2 * p] end
+  first_seen = redis.call('HMGET', KEYS[1], unpack(payees))
+  for p = 1, npayees do
+    local fresh = not first_seen[p] or now - tonumber(first_seen[p]) < tonumber(ARGV[4])
+    if fresh and tonumber(ARGV[6 + 2 * p]) >= tonumber(ARGV[5]) and tonumber(ARGV[6]) > action then
+      action, reason = tonumber(ARGV[6]), -1
+    end
+  end
+end
+if action < 2 then
+  for k, w in pairs(windows) do
+    local key = KEYS[k]
+    local last = tonumber(redis.call('HGET', key, 'last') or '')
+    if last and w.slot - last > SLOTS then
+      redis.call('DEL', key)
+      last = nil
+    end
+    if last then
+      -- Slots older than last - SLOTS went on earlier writes
+      for i = last - SLOTS, w.slot - SLOTS - 1 do
+        redis.call('HDEL', key, 'c' .. i, 'a' .. i)
+      end
+    end
+    redis.call('HINCRBY', key, 'c' .. w.slot, 1)
+    redis.call('HINCRBYFLOAT', key, 'a' .. w.slot, ARGV[2])
+    if not last or w.slot > last then redis.call('HSET', key, 'last', w.slot) end
+    redis.call('PEXPIRE', key, (SLOTS + 1) * w.size)
+  end
+  if npayees > 0 then
+    for p = 1, npayees do
+      if not first_seen[p] then redis.call('HSET', KEYS[1], payees[p], now) end
+    end
+    redis.call('PEXPIRE', KEYS[1], %(payee_ttl)d)
+  end
+end
+return {action, reason}
+""" % {"slots": _SLOTS, "payee_ttl": _PAYEE_TTL_MS}
+
+
+@dataclass(frozen=True)
+class Rule:
+    scope: str        # user / account
+    metric: str       # count / amount
+    threshold: float
+    window_ms: int
+    action: str       # step_up / deny
+
+    def describe(self) -> str:
+        window = next(unit for unit, sec in _UNITS.items() if sec * 1000 == self.window_ms)
+        return f"{self.scope} {self.metric} over {self.threshold:g} per {window}"
+
+
+@lru_cache(maxsize=None)
+def parse_rules(spec: str) -> tuple[Rule, ...]:
+    """``"account:amount:5000/hour:step_up,..."`` → Rules; empty → ()."""
+    rules = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        scope, metric, limit, action = part.split(":")
+        threshold, unit = limit.split("/")
+        if scope not in _SCOPES or metric not in ("count", "amount") or action not in ("step_up", "deny"):
+            raise ValueError(f"Invalid risk rule: {part!r}")
+        rules.append(Rule(scope, metric, float(threshold), _UNITS[unit.strip().rstrip("s")] * 1000, action))
+    return tuple(rules)
+
+
+@dataclass(frozen=True)
+class RiskDecision:
+    action: str = "allow"
+    reason: str | None = None
+
+    @property
+    def step_up(self) -> bool:
+        return self.action == "step_up"
+
+
+ALLOW: Final = RiskDecision()
+
+
+# ─────────────────────────────
+# Redis key helpers
+# ─────────────────────────────
+def _slots_key(scope: str, scope_id: int | str, window_ms: int) -> str:
+    return f"risk:{'user' if scope == 'user' else 'acct'}:{scope_id}:w{window_ms // 1000}"
+
+def _payees_key(user_id: int) -> str:
+    return f"risk:payees:{user_id}"
+
+def _step_up_key(scope_id: int | str) -> str:
+    return f"risk:stepup:{scope_id}"
+
+def _screen_args(user_id: int, account_number: str, amount: float,
+                 payees: dict[str, float]) -> tuple[list[str], list, tuple[Rule, ...]]:
+    rules = parse_rules(settings.RISK_RULES)
+    keys = [_payees_key(user_id)]
+    args = [
+        int(time.time() * 1000), amount, len(payees),
+        settings.RISK_NEW_PAYEE_SECONDS * 1000, settings.RISK_NEW_PAYEE_MIN_AMOUNT,
+        _ACTIONS[settings.RISK_NEW_PAYEE_ACTION],
+    ]
+    for payee, paid in payees.items():
+        args.extend((payee, paid))
+    for rule in rules:
+        key = _slots_key(rule.scope, user_id if rule.scope == "user" else account_number, rule.window_ms)
+        if key not in keys:
+            keys.append(key)
+        args.extend((keys.index(key) + 1, int(rule.metric == "amount"),
+                     rule.threshold, rule.window_ms, _ACTIONS[rule.action]))
+    return keys, args, rules
+
+def _to_decision(raw, rules: tuple[Rule, ...]) -> RiskDecision:
+    action, index = int(raw[0]), int(raw[1])
+    if not action:
+        return ALLOW
+    reason = "new payee" if index < 0 else rules[index - 1].describe()
+    log.info("risk check: %s (%s)", _DECISIONS[action], reason)
+    return RiskDecision(_DECISIONS[action], reason)
+
+
+# ─────────────────────────────
+# Screening (initiate)
+# ─────────────────────────────
+def _payees(amount: float, payee: str | None, payees: dict[str, float] | None) -> dict[str, float]:
+    return dict(payees or {}) if payee is None else {payee: amount}
+
+def screen_transfer(user_id: int, account_number: str, amount: float, payee: str | None = None,
+                    *, payees: dict[str, float] | None = None) -> RiskDecision:
+    """
+    Evaluate and record one initiate in every window; one Redis round trip.
+    A batch passes ``payees`` (destination → amount it receives) instead of
+    ``payee``; any new one at or above RISK_NEW_PAYEE_MIN_AMOUNT trips the rule.
+    """
+    if not settings.RISK_CHECKS_ENABLED:
+        return ALLOW
+    keys, args, rules = _screen_args(user_id, account_number, amount, _payees(amount, payee, payees))
+    try:
+        raw = otp.script(_SCREEN_LUA)(keys=keys, args=args, client=otp.get_redis())
+    except RedisError:
+        log.warning("risk checks unavailable; allowing transfer", exc_info=True)
+        return ALLOW
+    return _to_decision(raw, rules)
+
+async def ascreen_transfer(user_id: int, account_number: str, amount: float, payee: str | None = None,
+                           *, payees: dict[str, float] | None = None) -> RiskDecision:
+    if not settings.RISK_CHECKS_ENABLED:
+        return ALLOW
+    keys, args, rules = _screen_args(user_id, account_number, amount, _payees(amount, payee, payees))
+    try:
+        raw = await otp.script(_SCREEN_LUA, asynchronous=True)(keys=keys, args=args, client=otp.get_async_redis())
+    except RedisError:
+        log.warning("risk checks unavailable; allowing transfer", exc_info=True)
+        return ALLOW
+    return _to_decision(raw, rules)
+
+def raise_for_risk(decision: RiskDecision) -> None:
+    if decision.action == "deny":
+        raise HTTPException(403, detail=f"Transfer declined by risk checks: {decision.reason}")
+
+
+# ─────────────────────────────
+# Step-up (verify)
+# ─────────────────────────────
+def mark_step_up(scope_id: int | str) -> None:
+    otp.get_redis().setex(_step_up_key(scope_id), otp.OTP_TTL_SECONDS, 1)
+
+async def amark_step_up(scope_id: int | str) -> None:
+    await otp.get_async_redis().setex(_step_up_key(scope_id), otp.OTP_TTL_SECONDS, 1)
+
+def _password_needed(state: list, password: str | None) -> bool:
+    """``state`` is MGET [step-up flag, OTP failure count]; raises when the answer is already no."""
+    flagged, fails = state
+    if not flagged:
+        return False
+    if int(fails or 0) >= otp.OTP_MAX_TRIES:
+        raise HTTPException(403, detail="Too many failed attempts. This transfer is locked for 5 minutes.")
+    if not password:
+        raise HTTPException(401, detail="This transfer needs your password as well as the OTP")
+    return True
+
+def _wrong_password(locked: bool) -> HTTPException:
+    if locked:
+        return HTTPException(403, detail="Transfer locked after 3 failed attempts. Please try again later.")
+    return HTTPException(400, detail="Invalid password")
+
+def confirm_step_up(db: Session, scope_id: int | str, password: str | None, user) -> None:
+    """
+    Before the OTP is checked: if initiate flagged ``scope_id`` for step-up,
+    require the user's password. One MGET when it was not flagged.
+    """
+    state = otp.get_redis().mget(_step_up_key(scope_id), otp.fail_key(scope_id))
+    if not _password_needed(state, password):
+        return
+    hashed = db.execute(select(User.hashed_password).where(User.id == user.id)).scalar_one()
+    try:
+        ok = verify_password(password, hashed)
+    except PasswordPoolBusy:
+        raise busy_error()
+    if not ok:
+        _, locked = otp.record_otp_failure(scope_id)
+        raise _wrong_password(locked)
+
+async def aconfirm_step_up(db: AsyncSession, scope_id: int | str, password: str | None, user) -> None:
+    state = await otp.get_async_redis().mget(_step_up_key(scope_id), otp.fail_key(scope_id))
+    if not _password_needed(state, password):
+        return
+    hashed = (await db.execute(select(User.hashed_password).where(User.id == user.id))).scalar_one()
+    try:
+        ok = await verify_password_async(password, hashed)
+    except PasswordPoolBusy:
+        raise busy_error()
+    if not ok:
+        _, locked = await otp.arecord_otp_failure(scope_id)
+        raise _wrong_password(locked)
@@ -0,0 +1,297 @@
+# app/services/settlement.py
+"""
+Settlement engine for OTP-confirmed transfers and deposits.
+
+Balances are never read into Python and written back. Each leg is a
+guarded single-statement UPDATE (``balance = balance - :amt ... AND
+balance >= :amt``), the status flip is a conditional UPDATE on
+``status = 'pending'``, and everything for one settlement commits
+together. Accounts touched by a transfer are row-locked in account-number
+order first, so two transfers between the same pair of accounts cannot
+deadlock. Sharded (hot) destinations are normally not locked: their credit
+goes to one random sub-balance row (app/services/balance_shards.py). The
+exception is a sharded *source*, whose debit may fold its sub-balances
+(locking them); then every main row involved is locked up front, in the
+same order, so two hot accounts paying each other cannot deadlock on each
+other's sub-balance rows.
+
+``apply_*`` functions do the work without committing (for callers that
+batch several settlements into one transaction); ``settle_*`` wrap them
+in their own commit / rollback.
+"""
+from __future__ import annotations
+
+import logging
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models.account import BankAccount
+from app.models.deposit import Deposit
+from app.models.transaction import Transaction
+from app.models.transfer_batch import TransferBatch
+from app.services.balance_shards import account_balance, credit_shard, fold, shard_counts
+
+log = logging.getLogger(__name__)
+
+_NO_SYNC = {"synchronize_session": False}
+
+
+# ─────────────────────────────
+# Building blocks
+# ─────────────────────────────
+def lock_accounts(db: Session, numbers) -> list[str]:
+    """SELECT ... FOR UPDATE in a deterministic order; returns the numbers found."""
+    rows = db.execute(
+        select(BankAccount.account_number)
+        .where(BankAccount.account_number.in_(sorted(set(numbers))))
+        .order_by(BankAccount.account_number)
+        .with_for_update()
+    )
+    return [number for (number,) in rows]
+
+def debit(db: Session, account_number: str, amount: float, owner_id: int | None = None) -> bool:
+    """Guarded debit; False if the account is missing, not owned, or short of funds."""
+    stmt = (
+        update(BankAccount)
+        .where(BankAccount.account_number == account_number, BankAccount.balance >= amount)
+        .values(balance=BankAccount.balance - amount)
+        .execution_options(**_NO_SYNC)
+    )
+    if owner_id is not None:
+        stmt = stmt.where(BankAccount.user_id == owner_id)
+    if db.execute(stmt).rowcount == 1:
+        return True
+    # A sharded account may hold the funds in its sub-balances: fold them in and retry
+    if account_number in shard_counts(db) and fold(db, account_number):
+        return db.execute(stmt).rowcount == 1
+    return False
+
+def credit(db: Session, account_number: str, amount: float, owner_id: int | None = None) -> float | None:
+    """
+    Credit an account; returns the credited row's new balance (one
+    sub-balance for a sharded account) or None if it does not exist.
+    """
+    shards = shard_counts(db).get(account_number)
+    if shards:
+        new_balance = credit_shard(db, account_number, amount, shards, owner_id)
+        if new_balance is not None:
+            return new_balance
+    stmt = (
+        update(BankAccount)
+        .where(BankAccount.account_number == account_number)
+        .values(balance=BankAccount.balance + amount)
+        .returning(BankAccount.balance)
+        .execution_options(**_NO_SYNC)
+    )
+    if owner_id is not None:
+        stmt = stmt.where(BankAccount.user_id == owner_id)
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def _debit_failure(db: Session, account_number: str, owner_id: int) -> HTTPException:
+    """Explain why a guarded debit matched no row (only runs on the failure path)."""
+    src_owner = db.execute(
+        select(BankAccount.user_id).where(BankAccount.account_number == account_number)
+    ).scalar_one_or_none()
+    if src_owner is None:
+        return HTTPException(404, detail="Account not found")
+    if src_owner != owner_id:
+        return HTTPException(403, detail="Not owner of source account")
+    return HTTPException(400, detail="Insufficient balance")
+
+
+# ─────────────────────────────
+# Transfers
+# ─────────────────────────────
+def apply_transfer(db: Session, tx_id: int, user_id: int) -> dict:
+    """Settle a pending transfer inside the caller's transaction. Returns the row as a dict."""
+    tx = db.execute(
+        update(Transaction)
+        # Batch legs settle only through apply_batch
+        .where(Transaction.id == tx_id, Transaction.status == "pending", Transaction.batch_id.is_(None))
+        .values(status="completed")
+        .returning(*Transaction.__table__.c)
+        .execution_options(**_NO_SYNC)
+    ).mappings().first()
+    if tx is None:
+        exists = db.execute(
+            select(Transaction.id).where(Transaction.id == tx_id, Transaction.batch_id.is_(None))
+        ).first()
+        if not exists:
+            raise HTTPException(404, detail="Transaction not found")
+        raise HTTPException(409, detail="Transaction already processed")
+
+    src, dst = tx["from_account_number"], tx["to_account_number"]
+    hot = shard_counts(db)
+    lock_accounts(db, (src, dst) if src in hot or dst not in hot else (src,))
+
+    if not debit(db, tx["from_account_number"], tx["amount"], owner_id=user_id):
+        raise _debit_failure(db, tx["from_account_number"], user_id)
+    if credit(db, tx["to_account_number"], tx["amount"]) is None:
+        raise HTTPException(404, detail="Account not found")
+    return dict(tx)
+
+def settle_transfer(db: Session, tx_id: int, user_id: int) -> dict:
+    try:
+        tx = apply_transfer(db, tx_id, user_id)
+        db.commit()
+        return tx
+    except HTTPException:
+        db.rollback()
+        raise
+    except SQLAlchemyError as exc:
+        db.rollback()
+        log.exception("DB error completing transfer")
+        raise HTTPException(500, detail="Database error") from exc
+
+
+# ─────────────────────────────
+# Batches
+# ─────────────────────────────
+# Core (not ORM) statement so a list of params runs as one executemany
+_accounts = BankAccount.__table__
+_bulk_credit = (
+    update(_accounts)
+    .where(_accounts.c.account_number == bindparam("b_account"))
+    .values(balance=_accounts.c.balance + bindparam("b_amount"))
+)
+
+def apply_batch(db: Session, batch_id: int, user_id: int) -> dict:
+    """
+    Settle every pending leg of a batch in the caller's transaction with a
+    constant number of statements: claim, load legs, lock, one guarded
+    debit, one executemany credit, two status updates.
+    Legs whose destination has disappeared are marked failed; the debit is
+    all-or-nothing for the rest.
+    """
+    batch = db.execute(
+        update(TransferBatch)
+        .where(TransferBatch.id == batch_id, TransferBatch.user_id == user_id,
+               TransferBatch.status == "pending")
+        .values(status="completed")
+        .returning(TransferBatch.from_account_number)
+        .execution_options(**_NO_SYNC)
+    ).first()
+    if batch is None:
+        exists = db.execute(
+            select(TransferBatch.id).where(TransferBatch.id == batch_id, TransferBatch.user_id == user_id)
+        ).first()
+        if not exists:
+            raise HTTPException(404, detail="Batch not found")
+        raise HTTPException(409, detail="Batch already processed")
+
+    legs = db.execute(
+        select(Transaction.id, Transaction.to_account_number, Transaction.amount)
+        .where(Transaction.batch_id == batch_id, Transaction.status == "pending")
+        .order_by(Transaction.id)
+    ).all()
+
+    hot = shard_counts(db)
+    src_hot = batch.from_account_number in hot       # its debit may fold: lock hot destinations too
+    present = set(lock_accounts(db, [batch.from_account_number,
+                                     *(leg.to_account_number for leg in legs
+                                       if src_hot or leg.to_account_number not in hot)]))
+    present |= {leg.to_account_number for leg in legs if leg.to_account_number in hot}
+    ok = [leg for leg in legs if leg.to_account_number in present]
+    failed = [leg for leg in legs if leg.to_account_number not in present]
+
+    total = sum(leg.amount for leg in ok)
+    if ok and not debit(db, batch.from_account_number, total, owner_id=user_id):
+        raise _debit_failure(db, batch.from_account_number, user_id)
+
+    per_account: dict[str, float] = {}
+    for leg in ok:
+        per_account[leg.to_account_number] = per_account.get(leg.to_account_number, 0.0) + leg.amount
+    for acct in [a for a in per_account if a in hot]:
+        if credit(db, acct, per_account.pop(acct)) is None:
+            raise HTTPException(404, detail="Account not found")
+    if per_account:
+        db.execute(
+            _bulk_credit,
+            [{"b_account": acct, "b_amount": amt} for acct, amt in sorted(per_account.items())],
+        )
+
+    for status, group in (("completed", ok), ("failed", failed)):
+        if group:
+            db.execute(
+                update(Transaction)
+                .where(Transaction.id.in_([leg.id for leg in group]))
+                .values(status=status)
+                .execution_options(**_NO_SYNC)
+            )
+
+    batch_status = "completed" if not failed else ("partial" if ok else "failed")
+    if batch_status != "completed":
+        db.execute(
+            update(TransferBatch).where(TransferBatch.id == batch_id)
+            .values(status=batch_status).execution_options(**_NO_SYNC)
+        )
+
+    return {
+        "batch_id": batch_id,
+        "status": batch_status,
+        "completed": len(ok),
+        "failed": len(failed),
+        "legs": [
+            {
+                "transaction_id": leg.id,
+                "to_account_number": leg.to_account_number,
+                "amount": leg.amount,
+                "status": "completed" if leg.to_account_number in present else "failed",
+                "detail": None if leg.to_account_number in present else "Destination account not found",
+            }
+            for leg in legs
+        ],
+    }
+
+def settle_batch(db: Session, batch_id: int, user_id: int) -> dict:
+    try:
+        report = apply_batch(db, batch_id, user_id)
+        db.commit()
+        return report
+    except HTTPException:
+        db.rollback()
+        raise
+    except SQLAlchemyError as exc:
+        db.rollback()
+        log.exception("DB error completing batch transfer")
+        raise HTTPException(500, detail="Database error") from exc
+
+
+# ─────────────────────────────
+# Deposits
+# ─────────────────────────────
+def apply_deposit(db: Session, deposit_id: int, user_id: int) -> float:
+    """Credit a pending deposit inside the caller's transaction. Returns the new balance."""
+    dep = db.execute(
+        update(Deposit)
+        .where(Deposit.id == deposit_id, Deposit.user_id == user_id, Deposit.status == "pending")
+        .values(status="completed")
+        .returning(Deposit.account_number, Deposit.amount)
+        .execution_options(**_NO_SYNC)
+    ).first()
+    if dep is None:
+        raise HTTPException(409, detail="Deposit already processed")
+
+    new_balance = credit(db, dep.account_number, dep.amount, owner_id=user_id)
+    if new_balance is None:
+        raise HTTPException(404, detail="Account not found")
+    if dep.account_number in shard_counts(db):
+        new_balance = account_balance(db, dep.account_number)
+    return float(new_balance)
+
+def settle_deposit(db: Session, deposit_id: int, user_id: int) -> float:
+    try:
+        new_balance = apply_deposit(db, deposit_id, user_id)
+        db.commit()
+        return new_balance
+    except HTTPException:
+        db.rollback()
+        raise
+    except SQLAlchemyError as exc:
+        db.rollback()
+        log.exception("DB error completing deposit")
+        raise HTTPException(500, detail="Database error") from exc
@@ -0,0 +1,168 @@
+# app/services/statement_export.py
+"""
+Constant-memory statement export.
+
+Rows come off a server-side cursor (``yield_per`` → ``stream_results``) as
+plain column tuples and are encoded chunk by chunk into CSV or NDJSON,
+optionally gzip-compressed on the fly, so the worker never holds more than
+one partition of a history in memory however long it is. With
+``include_archived`` the rows of partitions already moved to the cold
+archive follow the live ones (they are all older).
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import itertools
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterator, Literal
+
+from sqlalchemy.orm import Session
+
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.services.transaction_archive import iter_archived_transactions
+from app.services.transaction_history import (
+    Direction,
+    history_query,
+    select_columns,
+    user_account_numbers,
+)
+
+ExportFormat = Literal["csv", "ndjson"]
+
+COLUMNS = ("id", "timestamp", "from_account_number", "to_account_number", "amount", "reference", "status")
+FETCH_SIZE = 1000
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _isoformat(row) -> list:
+    return [v.isoformat() if isinstance(v, datetime) else v for v in row]
+
+def _csv_rows(rows) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(_isoformat(row))
+    return buf.getvalue()
+
+def _ndjson_rows(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(COLUMNS, _isoformat(row))), separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+_ENCODERS = {"csv": _csv_rows, "ndjson": _ndjson_rows}
+
+def _header(fmt: ExportFormat) -> str:
+    return _csv_rows([COLUMNS]) if fmt == "csv" else ""
+
+def _chunks(fmt: ExportFormat, partitions) -> Iterator[bytes]:
+    encode = _ENCODERS[fmt]
+    for text in itertools.chain([_header(fmt)], map(encode, partitions)):
+        if text:
+            yield text.encode()
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits=31 → gzip container
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+async def _agzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def stream_statement(
+    user_id: int,
+    fmt: ExportFormat = "csv",
+    *,
+    gzip: bool = False,
+    direction: Direction = "all",
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    include_archived: bool = False,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Iterator[bytes]:
+    """
+    Generator for a StreamingResponse. It opens its own session because
+    request-scoped dependencies are torn down before the body is streamed.
+    """
+    db = session_factory()
+    try:
+        accounts = user_account_numbers(db, user_id)
+        stmt = history_query(
+            accounts,
+            direction=direction,
+            status=status,
+            since=since,
+            until=until,
+        )
+        if stmt is None:
+            partitions = iter(())
+        else:
+            result = db.execute(select_columns(stmt, COLUMNS), execution_options={"yield_per": FETCH_SIZE})
+            partitions = result.partitions()
+        if include_archived and accounts:
+            archived = iter_archived_transactions(
+                accounts, COLUMNS, direction=direction, status=status, since=since, until=until,
+                chunk_size=FETCH_SIZE,
+            )
+            partitions = itertools.chain(partitions, archived)
+
+        chunks = _chunks(fmt, partitions)
+        yield from (_gzip(chunks) if gzip else chunks)
+    finally:
+        db.close()
+
+
+async def astream_statement(
+    user_id: int,
+    fmt: ExportFormat = "csv",
+    *,
+    gzip: bool = False,
+    direction: Direction = "all",
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    include_archived: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Async twin of stream_statement (ASYNC_MODE): rows stream off an
+    AsyncSession and archive files are read in a worker thread, so the
+    export never parks a threadpool thread for its whole duration.
+    """
+    async def chunks() -> AsyncIterator[bytes]:
+        encode = _ENCODERS[fmt]
+        header = _header(fmt)
+        if header:
+            yield header.encode()
+        async with AsyncSessionLocal() as db:
+            accounts = await db.run_sync(user_account_numbers, user_id)
+            stmt = history_query(accounts, direction=direction, status=status, since=since, until=until)
+            if stmt is not None:
+                result = await db.stream(select_columns(stmt, COLUMNS), execution_options={"yield_per": FETCH_SIZE})
+                async for rows in result.partitions():
+                    yield encode(rows).encode()
+        if include_archived and accounts:
+            archived = iter_archived_transactions(
+                accounts, COLUMNS, direction=direction, status=status, since=since, until=until,
+                chunk_size=FETCH_SIZE,
+            )
+            while (rows := await asyncio.to_thread(next, archived, None)) is not None:
+                yield encode(rows).encode()
+
+    stream = _agzip(chunks()) if gzip else chunks()
+    async for chunk in stream:
+        yield chunk
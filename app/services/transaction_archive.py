@@ -0,0 +1,106 @@
+# app/services/transaction_archive.py
+"""
+Cold archive of detached monthly partitions.
+
+``app.maintenance.partitions`` dumps each expired ``transactions``
+partition to ``<ARCHIVE_DIR>/<table>/<YYYY-MM>.csv.gz`` (header row,
+newest row first) before dropping it. This module owns that file layout and reads it back
+for the statement export, so archived history is still downloadable.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+from app.core.config import settings
+from app.services.transaction_history import Direction
+
+# Full row, in table order, so an archive can be re-imported losslessly
+ARCHIVE_COLUMNS = {
+    "transactions": ("id", "from_account_number", "to_account_number", "amount", "reference",
+                     "timestamp", "status", "batch_id"),
+}
+_PARSERS = {
+    "id": int, "batch_id": int,
+    "amount": float,
+    "timestamp": datetime.fromisoformat,
+}
+
+
+def archive_path(table: str, month: datetime, root: str | Path | None = None) -> Path:
+    return Path(root or settings.ARCHIVE_DIR) / table / f"{month:%Y-%m}.csv.gz"
+
+def write_archive(path: Path, columns, rows) -> int:
+    """Write rows atomically (tmp file + rename); returns the row count."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    count = 0
+    with gzip.open(tmp, "wt", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([v.isoformat() if isinstance(v, datetime) else v for v in row])
+            count += 1
+    tmp.replace(path)
+    return count
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    """Archived timestamps are naive UTC; an aware bound (``...Z`` in a query) is converted to match."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _read(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", newline="") as fh:
+        for record in csv.DictReader(fh):
+            yield {
+                k: (None if v == "" else _PARSERS.get(k, str)(v))
+                for k, v in record.items()
+            }
+
+
+def iter_archived_transactions(
+    account_numbers: list[str],
+    columns,
+    *,
+    direction: Direction = "all",
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    root: str | Path | None = None,
+    chunk_size: int = 1000,
+) -> Iterator[list[tuple]]:
+    """
+    Archived transactions touching ``account_numbers``, newest first, as
+    lists of ``columns`` tuples (the shape ``Result.partitions()`` yields).
+    Files for months outside [since, until) are not opened.
+    """
+    since, until = _naive_utc(since), _naive_utc(until)
+    accounts = set(account_numbers)
+    files = sorted((Path(root or settings.ARCHIVE_DIR) / "transactions").glob("*.csv.gz"), reverse=True)
+    chunk: list[tuple] = []
+    for path in files:
+        month = datetime.strptime(path.name[:7], "%Y-%m")
+        if until and month >= until:
+            continue
+        if since and month.replace(month=month.month % 12 + 1, year=month.year + month.month // 12) <= since:
+            break                              # files are newest-first; the rest are older still
+        for row in _read(path):
+            out = row["from_account_number"] in accounts
+            into = row["to_account_number"] in accounts
+            if not ((direction in ("all", "out") and out) or (direction in ("all", "in") and into)):
+                continue
+            if status and row["status"] != status:
+                continue
+            if (since and row["timestamp"] < since) or (until and row["timestamp"] >= until):
+                continue
+            chunk.append(tuple(row[c] for c in columns))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
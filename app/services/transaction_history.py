@@ -0,0 +1,142 @@
+# app/services/transaction_history.py
+"""
+Keyset-paginated transaction history.
+
+Pages are ordered by ``(timestamp, id)`` descending and continue from an
+opaque cursor rather than an OFFSET, so page N costs the same as page 1.
+Instead of one ``from IN (...) OR to IN (...)`` predicate (which the
+planner can only answer with a full scan + sort), the query is a UNION ALL
+of one leg per (account, direction). Each leg is an ordered range scan on
+``ix_transactions_{from,to}_ts_id`` that stops after ``limit + 1`` rows.
+Pages are returned as plain column tuples (``HISTORY_COLUMNS``), not ORM
+objects, so list endpoints can serialize them without hydration.
+"""
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+from typing import Iterable, Literal
+
+from fastapi import HTTPException
+from sqlalchemy import Row, Select, select, tuple_, union_all
+from sqlalchemy.orm import Session, aliased
+
+from app.models.account import BankAccount
+from app.models.transaction import Transaction
+
+Direction = Literal["all", "in", "out"]
+
+# Same fields, same order as schemas.transaction.TransactionOut
+HISTORY_COLUMNS = ("id", "from_account_number", "to_account_number", "amount", "reference", "status", "timestamp")
+
+
+# ─────────────────────────────
+# Cursor encoding
+# ─────────────────────────────
+def encode_cursor(timestamp: datetime, tx_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{tx_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, tx_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(ts), int(tx_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, detail="Invalid cursor")
+
+
+# ─────────────────────────────
+# Query
+# ─────────────────────────────
+def user_account_numbers(db: Session, user_id: int) -> list[str]:
+    return list(
+        db.execute(select(BankAccount.account_number).where(BankAccount.user_id == user_id)).scalars()
+    )
+
+def _filtered(stmt: Select, status: str | None, since: datetime | None, until: datetime | None,
+              after: tuple[datetime, int] | None) -> Select:
+    if status:
+        stmt = stmt.where(Transaction.status == status)
+    if since:
+        stmt = stmt.where(Transaction.timestamp >= since)
+    if until:
+        stmt = stmt.where(Transaction.timestamp < until)
+    if after:
+        stmt = stmt.where(tuple_(Transaction.timestamp, Transaction.id) < after)
+    return stmt
+
+def history_query(
+    account_numbers: list[str],
+    *,
+    direction: Direction = "all",
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    after: tuple[datetime, int] | None = None,
+    limit: int | None = None,
+) -> Select | None:
+    """
+    Build the UNION ALL history query for ``account_numbers``; None if the
+    user has no accounts. ``limit=None`` means unbounded (used by export).
+    """
+    order = (Transaction.timestamp.desc(), Transaction.id.desc())
+    legs = []
+    for number in account_numbers:
+        if direction in ("all", "out"):
+            legs.append(select(Transaction).where(Transaction.from_account_number == number))
+        if direction in ("all", "in"):
+            leg = select(Transaction).where(Transaction.to_account_number == number)
+            if direction == "all":
+                # Transfers between the user's own accounts already came from the "out" leg
+                leg = leg.where(Transaction.from_account_number.notin_(account_numbers))
+            legs.append(leg)
+    if not legs:
+        return None
+
+    legs = [_filtered(leg, status, since, until, after).order_by(*order) for leg in legs]
+    if limit is not None:
+        legs = [leg.limit(limit) for leg in legs]
+    if len(legs) == 1:
+        return legs[0]
+
+    # Wrap each leg so its ORDER BY / LIMIT stays inside it on every dialect
+    union = union_all(*(select(leg.subquery()) for leg in legs)).subquery()
+    tx = aliased(Transaction, union)
+    stmt = select(tx).order_by(tx.timestamp.desc(), tx.id.desc())
+    return stmt.limit(limit) if limit is not None else stmt
+
+def select_columns(stmt: Select, columns: Iterable[str] = HISTORY_COLUMNS) -> Select:
+    """Re-select only ``columns`` of a history query, newest first, as row tuples."""
+    sub = stmt.subquery()
+    return select(*(sub.c[name] for name in columns)).order_by(sub.c.timestamp.desc(), sub.c.id.desc())
+
+def history_page(
+    db: Session,
+    user_id: int,
+    *,
+    limit: int,
+    cursor: str | None = None,
+    direction: Direction = "all",
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[list[Row], str | None]:
+    """One page of history plus the cursor for the next page (None on the last page)."""
+    stmt = history_query(
+        user_account_numbers(db, user_id),
+        direction=direction,
+        status=status,
+        since=since,
+        until=until,
+        after=decode_cursor(cursor) if cursor else None,
+        limit=limit + 1,
+    )
+    if stmt is None:
+        return [], None
+
+    rows = db.execute(select_columns(stmt)).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].timestamp, rows[-1].id)
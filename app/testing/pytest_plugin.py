@@ -0,0 +1,51 @@
+# app/testing/pytest_plugin.py
+"""
+pytest plugin that enforces the @query_budget declarations.
+
+Enable it from a conftest.py (or with ``-p app.testing.pytest_plugin``):
+
+    pytest_plugins = ["app.testing.pytest_plugin"]
+
+Every request a test makes is then checked: a test fails when an endpoint
+runs more SQL statements than its ``@query_budget(n)``, or repeats one
+statement QUERY_BUDGET_REPEAT_THRESHOLD times (N+1). The failure lists the
+statement and the app frames that issued it. Mark a test with
+``@pytest.mark.allow_query_budget`` to let it through (e.g. a test that
+seeds data through the API on purpose).
+
+The ``query_budget`` fixture budgets an arbitrary block, including the
+requests a TestClient makes inside it:
+
+    def test_history_is_constant(client, auth, query_budget):
+        with query_budget(3):
+            client.get("/transactions/?limit=500", headers=auth)
+"""
+from __future__ import annotations
+
+import pytest
+
+from app.core import query_budget as qb
+from app.core.config import settings
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "allow_query_budget: do not fail the test on query-budget or N+1 findings"
+    )
+    settings.QUERY_BUDGET_ENABLED = True
+
+
+@pytest.fixture(autouse=True)
+def _enforce_query_budgets(request):
+    qb.violations.clear()
+    yield
+    found = list(qb.violations)
+    qb.violations.clear()
+    if found and request.node.get_closest_marker("allow_query_budget") is None:
+        pytest.fail("query budget violated:\n" + "\n\n".join(found), pytrace=False)
+
+
+@pytest.fixture
+def query_budget():
+    """``with query_budget(n, **kw):`` fails the test if the block runs more than n statements."""
+    return qb.QueryBudget
@@ -0,0 +1,129 @@
+# app/utils/idempotency.py
+"""
+Idempotency-Key support for the initiate endpoints.
+
+The first request with a given key claims ``idem:{scope}:{user}:{key}``
+(SET NX) and runs; its response is stored under the same key for
+IDEMPOTENCY_TTL_SECONDS. A replay with the same key and body gets that
+response back with no DB, OTP or SMTP work. A duplicate that arrives while
+the first one is still running waits for its result (up to
+IDEMPOTENCY_WAIT_SECONDS). Reusing a key with a different body is a 422.
+
+Only successes are stored. A failed run (including 4xx such as
+insufficient balance, a risk deny or a rate limit, which depend on state
+that can change) releases the key, so a retry with it is evaluated afresh.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Final
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.utils import otp
+
+IDEMPOTENCY_TTL_SECONDS: Final = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86_400))
+IDEMPOTENCY_LOCK_SECONDS: Final = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 30))   # in-flight claim
+IDEMPOTENCY_WAIT_SECONDS: Final = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))
+_POLL_SECONDS: Final = 0.05
+MAX_KEY_LENGTH: Final = 255
+
+REPLAY_HEADER: Final = "Idempotent-Replayed"
+
+
+# ─────────────────────────────
+# Redis key helpers
+# ─────────────────────────────
+def _key(scope: str, user_id: int, idem_key: str) -> str:
+    return f"idem:{scope}:{user_id}:{idem_key}"
+
+def _fingerprint(payload: Any) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+def _pending(fp: str) -> str:
+    return json.dumps({"state": "pending", "fp": fp})
+
+def _done(fp: str, status_code: int, body: Any) -> str:
+    return json.dumps({"state": "done", "fp": fp, "status": status_code, "body": body})
+
+
+# ─────────────────────────────
+# Outcome handling (shared by sync and async)
+# ─────────────────────────────
+def _check_key(idem_key: str) -> None:
+    if len(idem_key) > MAX_KEY_LENGTH:
+        raise HTTPException(400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+def _replay(raw: str | None, fp: str):
+    """Response for a stored record, or None while it is still in flight / gone."""
+    if raw is None:
+        return None
+    record = json.loads(raw)
+    if record["fp"] != fp:
+        raise HTTPException(422, detail="Idempotency-Key was already used with a different request")
+    if record["state"] != "done":
+        return None
+    return JSONResponse(record["body"], status_code=record["status"], headers={REPLAY_HEADER: "true"})
+
+def _in_progress() -> HTTPException:
+    return HTTPException(409, detail="A request with this Idempotency-Key is still in progress",
+                         headers={"Retry-After": "1"})
+
+
+# ─────────────────────────────
+# Public API
+# ─────────────────────────────
+def run_idempotent(scope: str, user_id: int, idem_key: str | None, payload: Any,
+                   status_code: int, fn: Callable[[], Any]) -> Any:
+    """Run ``fn`` at most once per (scope, user, Idempotency-Key); without a key just run it."""
+    if not idem_key:
+        return fn()
+    _check_key(idem_key)
+    key, fp = _key(scope, user_id, idem_key), _fingerprint(payload)
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while not otp.get_redis().set(key, _pending(fp), nx=True, ex=IDEMPOTENCY_LOCK_SECONDS):
+        cached = _replay(otp.get_redis().get(key), fp)
+        if cached is not None:
+            return cached
+        if time.monotonic() >= deadline:
+            raise _in_progress()
+        time.sleep(_POLL_SECONDS)
+
+    try:
+        result = fn()
+    except BaseException:
+        otp.get_redis().delete(key)
+        raise
+    otp.get_redis().set(key, _done(fp, status_code, jsonable_encoder(result)), ex=IDEMPOTENCY_TTL_SECONDS)
+    return result
+
+async def arun_idempotent(scope: str, user_id: int, idem_key: str | None, payload: Any,
+                          status_code: int, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Async twin of run_idempotent on redis.asyncio."""
+    if not idem_key:
+        return await fn()
+    _check_key(idem_key)
+    key, fp = _key(scope, user_id, idem_key), _fingerprint(payload)
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while not await otp.get_async_redis().set(key, _pending(fp), nx=True, ex=IDEMPOTENCY_LOCK_SECONDS):
+        cached = _replay(await otp.get_async_redis().get(key), fp)
+        if cached is not None:
+            return cached
+        if time.monotonic() >= deadline:
+            raise _in_progress()
+        await asyncio.sleep(_POLL_SECONDS)
+
+    try:
+        result = await fn()
+    except BaseException:
+        await otp.get_async_redis().delete(key)
+        raise
+    await otp.get_async_redis().set(key, _done(fp, status_code, jsonable_encoder(result)), ex=IDEMPOTENCY_TTL_SECONDS)
+    return result
@@ -0,0 +1,238 @@
+# app/utils/mailer.py
+"""
+Pooled, persistent SMTP dispatcher for OTP e-mail.
+
+Request handlers call ``enqueue_otp_email`` and return immediately. A small
+set of worker threads each keep one long-lived (STARTTLS + LOGIN'd) SMTP
+connection, drain the queue in batches over that connection and reconnect
+with exponential backoff when the relay drops them. A failed connect counts
+as a delivery attempt, so while the relay is down each message is given up
+after MAIL_MAX_RETRIES instead of blocking its worker indefinitely.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+
+from app.core.metrics import SMTP_SECONDS
+from app.utils.otp import SMTP_HOST, SMTP_PASS, SMTP_PORT, SMTP_USER, build_otp_message
+
+log = logging.getLogger(__name__)
+
+# Dispatcher config
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 2))              # = pooled SMTP connections
+MAIL_QUEUE_MAX = int(os.getenv("MAIL_QUEUE_MAX", 10_000))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 50))
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", 3))
+MAIL_IDLE_NOOP_SECONDS = int(os.getenv("MAIL_IDLE_NOOP_SECONDS", 30))
+MAIL_BACKOFF_MAX_SECONDS = float(os.getenv("MAIL_BACKOFF_MAX_SECONDS", 30))
+
+
+@dataclass
+class _Outgoing:
+    msg: EmailMessage
+    attempts: int = 0
+
+
+# ─────────────────────────────
+# Metrics
+# ─────────────────────────────
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.connects = 0
+        self.send_seconds_total = 0.0
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": _queue.qsize(),
+                "queue_max": MAIL_QUEUE_MAX,
+                "workers": len(_workers),
+                "enqueued_total": self.enqueued,
+                "sent_total": self.sent,
+                "failed_total": self.failed,
+                "dropped_total": self.dropped,
+                "batches_total": self.batches,
+                "connects_total": self.connects,
+                "send_seconds_total": self.send_seconds_total,
+            }
+
+
+stats = _Stats()
+_queue: "queue.Queue[_Outgoing | None]" = queue.Queue(maxsize=MAIL_QUEUE_MAX)
+_workers: list[threading.Thread] = []
+_start_lock = threading.Lock()
+_stopping = threading.Event()     # cuts reconnect backoff short on shutdown
+
+def mailer_stats() -> dict:
+    return stats.snapshot()
+
+
+# ─────────────────────────────
+# Worker
+# ─────────────────────────────
+class _Connection:
+    """One persistent SMTP session, reopened on demand."""
+
+    def __init__(self):
+        self.smtp: smtplib.SMTP | None = None
+        self.last_used = 0.0
+        self.backoff = 0.5
+
+    def _open(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10)
+        if SMTP_PORT != 1025:
+            smtp.starttls()
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASS)
+        return smtp
+
+    def get(self) -> smtplib.SMTP:
+        if self.smtp is not None and time.monotonic() - self.last_used > MAIL_IDLE_NOOP_SECONDS:
+            # Relays silently drop idle sessions; probe before reusing
+            try:
+                if self.smtp.noop()[0] != 250:
+                    self.close()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+
+        if self.smtp is None:
+            try:
+                self.smtp = self._open()
+            except (smtplib.SMTPException, OSError):
+                # Back off, then let the caller count this as a failed attempt
+                log.warning("SMTP connect failed; backing off %.1fs", self.backoff, exc_info=True)
+                _stopping.wait(self.backoff)
+                self.backoff = min(self.backoff * 2, MAIL_BACKOFF_MAX_SECONDS)
+                raise
+            self.backoff = 0.5
+            stats.add(connects=1)
+        return self.smtp
+
+    def close(self) -> None:
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.smtp = None
+
+
+def _next_batch() -> list[_Outgoing | None]:
+    batch = [_queue.get()]
+    while len(batch) < MAIL_BATCH_SIZE and batch[-1] is not None:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+def _worker() -> None:
+    conn = _Connection()
+    while True:
+        batch = _next_batch()
+        stop = batch[-1] is None
+        items = [item for item in batch if item is not None]
+        if items:
+            stats.add(batches=1)
+        for item in items:
+            _deliver(conn, item)
+        for _ in batch:
+            _queue.task_done()
+        if stop:
+            conn.close()
+            return
+
+def _deliver(conn: _Connection, item: _Outgoing) -> None:
+    while True:
+        item.attempts += 1
+        started = time.perf_counter()
+        try:
+            conn.get().send_message(item.msg)
+            conn.last_used = time.monotonic()
+            elapsed = time.perf_counter() - started
+            stats.add(sent=1, send_seconds_total=elapsed)
+            SMTP_SECONDS.observe(elapsed, "sent")
+            return
+        except smtplib.SMTPRecipientsRefused:
+            # Permanent for this message; the connection is fine
+            SMTP_SECONDS.observe(time.perf_counter() - started, "refused")
+            stats.add(failed=1)
+            log.warning("SMTP refused recipient %s", item.msg["To"])
+            return
+        except (smtplib.SMTPException, OSError):
+            SMTP_SECONDS.observe(time.perf_counter() - started, "error")
+            conn.close()
+            if item.attempts >= MAIL_MAX_RETRIES:
+                stats.add(failed=1)
+                log.exception("SMTP send to %s failed after %d attempts", item.msg["To"], item.attempts)
+                return
+
+
+# ─────────────────────────────
+# Public API
+# ─────────────────────────────
+def start_dispatcher() -> None:
+    with _start_lock:
+        if _workers:
+            return
+        _stopping.clear()
+        for i in range(MAIL_WORKERS):
+            t = threading.Thread(target=_worker, name=f"smtp-dispatcher-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+def stop_dispatcher(timeout: float = 5.0) -> None:
+    """Flush what is queued (best effort, bounded by timeout) and stop the workers."""
+    with _start_lock:
+        workers = list(_workers)
+        _workers.clear()
+        if workers:
+            _stopping.set()
+    for _ in workers:
+        try:
+            _queue.put(None, timeout=timeout)
+        except queue.Full:
+            break
+    deadline = time.monotonic() + timeout
+    for t in workers:
+        t.join(max(0.0, deadline - time.monotonic()))
+
+def enqueue_email(msg: EmailMessage) -> bool:
+    """Queue a message for delivery. Returns False (and counts a drop) when the queue is full."""
+    if not SMTP_HOST or not msg["To"]:
+        print("SMTP not configured properly.")
+        return False
+    start_dispatcher()
+    try:
+        _queue.put_nowait(_Outgoing(msg))
+    except queue.Full:
+        stats.add(dropped=1)
+        log.error("mail queue full, dropping OTP e-mail to %s", msg["To"])
+        return False
+    stats.add(enqueued=1)
+    return True
+
+def enqueue_otp_email(to_addr: str, otp_code: str) -> bool:
+    return enqueue_email(build_otp_message(to_addr, otp_code))
+
+
+atexit.register(stop_dispatcher)
@@ -1,14 +1,79 @@
 import os
 import random
 import smtplib
+from dataclasses import dataclass
 from email.message import EmailMessage
+from functools import lru_cache
 from typing import Final
+import time
 import redis
+import redis.asyncio as aioredis
+
+from app.core.metrics import REDIS_ERRORS, REDIS_SECONDS
 
 # Redis config
 REDIS_URL: Final = os.getenv("REDIS_URL", "redis://redis:6379/0")
 OTP_TTL_SECONDS: Final = int(os.getenv("OTP_TTL_SECONDS", 300))  # 5 min default
-r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+
+# Clients are built on first use (or by the lifespan warm-up), not at import.
+# Always go through get_redis() / get_async_redis(); tests swap in fakes with
+# set_redis_client().
+r: redis.Redis | None = None
+ar: aioredis.Redis | None = None      # async mode
+
+class _TimedRedis(redis.Redis):
+    """Records every command in redis_command_duration_seconds."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        except redis.RedisError:
+            REDIS_ERRORS.inc(str(args[0]))
+            raise
+        finally:
+            REDIS_SECONDS.observe(time.perf_counter() - started, str(args[0]))
+
+class _TimedAsyncRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except redis.RedisError:
+            REDIS_ERRORS.inc(str(args[0]))
+            raise
+        finally:
+            REDIS_SECONDS.observe(time.perf_counter() - started, str(args[0]))
+
+def get_redis() -> redis.Redis:
+    global r
+    if r is None:
+        r = _TimedRedis.from_url(REDIS_URL, decode_responses=True)
+    return r
+
+def get_async_redis() -> aioredis.Redis:
+    global ar
+    if ar is None:
+        ar = _TimedAsyncRedis.from_url(REDIS_URL, decode_responses=True)
+    return ar
+
+def set_redis_client(client: redis.Redis | None, async_client: aioredis.Redis | None = None) -> None:
+    global r, ar
+    r, ar = client, async_client
+
+@lru_cache(maxsize=None)
+def script(lua: str, asynchronous: bool = False):
+    """Registered Lua script; call it with an explicit ``client=``."""
+    return (get_async_redis() if asynchronous else get_redis()).register_script(lua)
+
+async def close_redis() -> None:
+    """Drop pooled connections (lifespan shutdown); clients are rebuilt on next use."""
+    global r, ar
+    if r is not None:
+        r.close()
+    if ar is not None:
+        await ar.aclose()
+    r = ar = None
 
 # Email config
 SMTP_HOST = os.getenv("SMTP_HOST", "mailhog")
@@ -19,13 +84,18 @@ EMAIL_FROM = os.getenv("EMAIL_FROM", "SecureBank <no-reply@example.com>")
 
 DEBUG_MODE = os.getenv("DEBUG_MODE", "true").lower() == "true"
 
+# Lockout policy
+OTP_MAX_TRIES: Final = 3
+OTP_LOCK_SECONDS: Final = 300
+
 # ─────────────────────────────
 # Redis key helpers
 # ─────────────────────────────
-def _key(tx_id: int) -> str:
+def _key(tx_id: int | str) -> str:
     return f"otp:tx:{tx_id}"
 
-def _fail_key(scope_id: str | int) -> str:
+def fail_key(scope_id: str | int) -> str:
+    """Failure counter behind the lockout (also fed by wrong step-up passwords)."""
     return f"otp:fail:{scope_id}"
 
 def _generate_otp() -> str:
@@ -34,32 +104,30 @@ def _generate_otp() -> str:
 # ─────────────────────────────
 # Public API — OTP Flow
 # ─────────────────────────────
-def create_and_store_otp(tx_id: int) -> str:
+def create_and_store_otp(tx_id: int | str) -> str:
     code = _generate_otp()
-    r.setex(_key(tx_id), OTP_TTL_SECONDS, code)
+    get_redis().setex(_key(tx_id), OTP_TTL_SECONDS, code)
 
     if DEBUG_MODE:
         print(f"[DEV] OTP for tx {tx_id} = {code}")
 
     return code
 
-def verify_otp(tx_id: int, submitted: str) -> bool:
-    stored = r.get(_key(tx_id))
-    if not stored or stored != submitted:
-        return False
-    r.delete(_key(tx_id))
-    return True
+def build_otp_message(to_addr: str, otp_code: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = "Your SecureBank OTP"
+    msg["From"] = EMAIL_FROM
+    msg["To"] = to_addr
+    msg.set_content(f"Your OTP is: {otp_code}\nIt expires in {OTP_TTL_SECONDS // 60} minutes.")
+    return msg
 
 def send_otp_email(to_addr: str, otp_code: str) -> None:
+    """One-off synchronous send; request paths use app.utils.mailer instead."""
     if not SMTP_HOST or not to_addr:
         print("SMTP not configured properly.")
         return
 
-    msg = EmailMessage()
-    msg["Subject"] = "Your SecureBank OTP"
-    msg["From"] = EMAIL_FROM
-    msg["To"] = to_addr
-    msg.set_content(f"Your OTP is: {otp_code}\nIt expires in {OTP_TTL_SECONDS // 60} minutes.")
+    msg = build_otp_message(to_addr, otp_code)
 
     try:
         with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as smtp:
@@ -74,20 +142,101 @@ def send_otp_email(to_addr: str, otp_code: str) -> None:
 # ─────────────────────────────
 # OTP Failure + Lockout Logic
 # ─────────────────────────────
-def increment_otp_failures(scope_id: str | int, max_tries: int = 3, ttl: int = 300):
+# KEYS[1] = failure counter, ARGV[1] = lock TTL (s). Returns the new count.
+# INCR and EXPIRE together, so a crash in between cannot leave a counter without a TTL.
+_RECORD_FAILURE_LUA = """
+local fails = redis.call('INCR', KEYS[1])
+if fails == 1 then
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+end
+return fails
+"""
+
+def record_otp_failure(scope_id: str | int, max_tries: int = OTP_MAX_TRIES,
+                       ttl: int = OTP_LOCK_SECONDS) -> tuple[int, bool]:
     """
-    Increment OTP failure count. If max_tries exceeded, lock for TTL (seconds).
-    Returns (current_count, is_locked).
+    Count a failed attempt that did not go through check_otp (a wrong
+    step-up password). Returns (current_count, is_locked).
     """
-    key = _fail_key(scope_id)
-    count = r.incr(key)
-    if count == 1:
-        r.expire(key, ttl)
+    count = int(script(_RECORD_FAILURE_LUA)(keys=[fail_key(scope_id)], args=[ttl], client=get_redis()))
     return count, count >= max_tries
 
-def is_otp_locked(scope_id: str | int) -> bool:
-    count = r.get(_fail_key(scope_id))
-    return int(count or 0) >= 3
+# ─────────────────────────────
+# Atomic verify-and-lockout (one EVALSHA)
+# ─────────────────────────────
+# KEYS[1] = OTP code, KEYS[2] = failure counter
+# ARGV[1] = submitted code, ARGV[2] = max tries, ARGV[3] = lock TTL (s)
+# Returns {status, attempts, newly_locked}
+_CHECK_OTP_LUA = """
+local max_tries = tonumber(ARGV[2])
+local fails = tonumber(redis.call('GET', KEYS[2]) or '0')
+if fails >= max_tries then
+    return {'locked', fails, 0}
+end
+local stored = redis.call('GET', KEYS[1])
+if not stored then
+    return {'expired', fails, 0}
+end
+if stored == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return {'ok', 0, 0}
+end
+fails = redis.call('INCR', KEYS[2])
+if fails == 1 then
+    redis.call('EXPIRE', KEYS[2], tonumber(ARGV[3]))
+end
+if fails >= max_tries then
+    return {'locked', fails, 1}
+end
+return {'bad_code', fails, 0}
+"""
+
+@dataclass(frozen=True)
+class OTPCheck:
+    """Outcome of check_otp: status is ok / bad_code / locked / expired."""
+    status: str
+    attempts: int = 0
+    newly_locked: bool = False   # this very attempt tripped the lock
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+def _to_check(raw) -> OTPCheck:
+    status, attempts, newly_locked = raw
+    return OTPCheck(str(status), int(attempts), bool(int(newly_locked)))
+
+def check_otp(scope_id: int | str, submitted: str,
+              max_tries: int = OTP_MAX_TRIES, ttl: int = OTP_LOCK_SECONDS) -> OTPCheck:
+    """
+    Check lock, compare, consume the code and update/reset the failure
+    counter in a single atomic round trip. Two concurrent verifies can
+    never both succeed.
+    """
+    return _to_check(script(_CHECK_OTP_LUA)(keys=[_key(scope_id), fail_key(scope_id)],
+                                            args=[submitted, max_tries, ttl], client=get_redis()))
+
+# ─────────────────────────────
+# Async variants (redis.asyncio) — same keys, same semantics
+# ─────────────────────────────
+async def acreate_and_store_otp(tx_id: int) -> str:
+    code = _generate_otp()
+    await get_async_redis().setex(_key(tx_id), OTP_TTL_SECONDS, code)
+
+    if DEBUG_MODE:
+        print(f"[DEV] OTP for tx {tx_id} = {code}")
+
+    return code
+
+async def arecord_otp_failure(scope_id: str | int, max_tries: int = OTP_MAX_TRIES,
+                              ttl: int = OTP_LOCK_SECONDS) -> tuple[int, bool]:
+    count = int(await script(_RECORD_FAILURE_LUA, asynchronous=True)(
+        keys=[fail_key(scope_id)], args=[ttl], client=get_async_redis()
+    ))
+    return count, count >= max_tries
 
-def reset_otp_failures(scope_id: str | int):
-    r.delete(_fail_key(scope_id))
+async def acheck_otp(scope_id: int | str, submitted: str,
+                     max_tries: int = OTP_MAX_TRIES, ttl: int = OTP_LOCK_SECONDS) -> OTPCheck:
+    return _to_check(await script(_CHECK_OTP_LUA, asynchronous=True)(
+        keys=[_key(scope_id), fail_key(scope_id)], args=[submitted, max_tries, ttl], client=get_async_redis()
+    ))
@@ -0,0 +1,129 @@
+# app/utils/ratelimit.py
+"""
+Sliding-window rate limiting for the expensive hot paths.
+
+Each call checks a per-IP and (when known) a per-account window in one
+atomic Lua round trip. Every window is a Redis sorted set of request
+timestamps: expired entries are trimmed, and the request is either
+recorded in all windows or rejected with the time until the oldest entry
+leaves the tightest one. A 429 costs one Redis call and never reaches the
+database, bcrypt or SMTP.
+
+Limits come from Settings as ``"<count>/<second|minute|hour>"`` strings per
+route (empty = unlimited). If Redis is unreachable requests are let
+through rather than failing the API.
+"""
+import logging
+import time
+import uuid
+from functools import lru_cache
+from typing import Final
+
+from fastapi import HTTPException, Request
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.utils import otp
+
+log = logging.getLogger(__name__)
+
+_UNITS: Final = {"second": 1, "minute": 60, "hour": 3600}
+
+# KEYS: one sorted set per window
+# ARGV: now_ms, member, then (limit, window_ms) for each key
+# Returns 0 when admitted, else milliseconds until a slot frees up
+_SLIDING_WINDOW_LUA = r"""
+local now = tonumber(ARGV[1])
+local retry = 0
+for i, key in ipairs(KEYS) do
+  local limit = tonumber(ARGV[1 + 2 * i])
+  local window = tonumber(ARGV[2 + 2 * i])
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+  if redis.call('ZCARD', key) >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local wait = tonumber(oldest[2]) + window - now
+    if wait > retry then retry = wait end
+  end
+end
+if retry > 0 then return retry end
+for i, key in ipairs(KEYS) do
+  redis.call('ZADD', key, now, ARGV[2])
+  redis.call('PEXPIRE', key, tonumber(ARGV[2 + 2 * i]))
+end
+return 0
+"""
+
+
+
+@lru_cache(maxsize=None)
+def parse_limit(spec: str) -> tuple[int, int] | None:
+    """``"5/minute"`` → (5, 60_000 ms); empty → None."""
+    if not spec:
+        return None
+    count, unit = spec.split("/")
+    return int(count), _UNITS[unit.strip().rstrip("s")] * 1000
+
+# ─────────────────────────────
+# Redis key helpers
+# ─────────────────────────────
+def _ip_key(route: str, ip: str) -> str:
+    return f"rl:{route}:ip:{ip}"
+
+def _account_key(route: str, account: int | str) -> str:
+    return f"rl:{route}:acct:{account}"
+
+def _windows(route: str, ip: str | None, account: int | str | None) -> tuple[list[str], list]:
+    keys, args = [], [int(time.time() * 1000), uuid.uuid4().hex]
+    for key, spec in (
+        (_ip_key(route, ip) if ip else None, getattr(settings, f"RATE_LIMIT_{route.upper()}_PER_IP")),
+        (_account_key(route, account) if account is not None else None,
+         getattr(settings, f"RATE_LIMIT_{route.upper()}_PER_ACCOUNT")),
+    ):
+        limit = parse_limit(spec)
+        if key and limit:
+            keys.append(key)
+            args.extend(limit)
+    return keys, args
+
+def _too_many(retry_ms: int) -> HTTPException:
+    return HTTPException(429, detail="Too many requests, slow down",
+                         headers={"Retry-After": str(max(1, -(-int(retry_ms) // 1000)))})
+
+def client_ip(request: Request) -> str | None:
+    # uvicorn --proxy-headers already resolves X-Forwarded-For into request.client
+    return request.client.host if request.client else None
+
+
+# ─────────────────────────────
+# Public API
+# ─────────────────────────────
+def check_rate_limit(route: str, request: Request, account: int | str | None = None) -> None:
+    """Record one hit for ``route``; raise 429 if the IP or account window is full."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    keys, args = _windows(route, client_ip(request), account)
+    if not keys:
+        return
+    try:
+        retry_ms = otp.script(_SLIDING_WINDOW_LUA)(keys=keys, args=args, client=otp.get_redis())
+    except RedisError:
+        log.warning("rate limiter unavailable; admitting request", exc_info=True)
+        return
+    if retry_ms:
+        raise _too_many(retry_ms)
+
+async def acheck_rate_limit(route: str, request: Request, account: int | str | None = None) -> None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    keys, args = _windows(route, client_ip(request), account)
+    if not keys:
+        return
+    try:
+        retry_ms = await otp.script(_SLIDING_WINDOW_LUA, asynchronous=True)(
+            keys=keys, args=args, client=otp.get_async_redis()
+        )
+    except RedisError:
+        log.warning("rate limiter unavailable; admitting request", exc_info=True)
+        return
+    if retry_ms:
+        raise _too_many(retry_ms)
@@ -0,0 +1,356 @@
+"""
+End-to-end load test of the HTTP API against local stand-ins.
+
+Boots ``app.main:app`` under uvicorn in this process and drives the real
+user journey over HTTP with a pool of virtual users:
+
+    onboard:  register → login → login OTP verify → create account → deposit (+ OTP)
+    transact: transfer to a random peer (+ OTP) × --transfers → history → accounts
+
+OTPs are read from an in-process SMTP sink (the app's mailer delivers to
+it exactly as it would to a relay), so the OTP e-mail path is exercised
+too. Stand-ins:
+
+- database: a temporary SQLite file, or --database-url (a scratch Postgres;
+  its tables are dropped and recreated)
+- Redis: fakeredis, or --redis-url for a local redis-server
+- SMTP: aiosmtpd on --smtp-port (1025, where the mailer skips STARTTLS)
+
+Reports per-endpoint count, errors, p50/p95/p99 latency and throughput as
+JSON. With --baseline it compares p95 and throughput against an earlier
+report and exits 1 when any endpoint's p95 regressed by more than
+--max-regression.
+
+    pip install -r requirements-dev.txt
+    python -m benchmarks.loadtest --users 50 --concurrency 16 --output run.json
+    python -m benchmarks.loadtest --users 50 --concurrency 16 --baseline run.json
+
+Settings come from the environment as usual (ASYNC_MODE=true,
+SETTLEMENT_GROUP_COMMIT=true, ...). Rate limits are switched off unless
+--rate-limits is given, since every virtual user shares one IP. The
+transfer risk checks stay on: with more than 10 --transfers per user a
+minute, the default RISK_RULES deny the extra initiates.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import email
+import json
+import os
+import queue
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+_OTP = re.compile(r"Your OTP is: (\d{6})")
+
+
+# ─────────────────────────────
+# Stand-ins
+# ─────────────────────────────
+class SMTPSink:
+    """aiosmtpd server that keeps every OTP it receives, per recipient."""
+
+    def __init__(self, port: int):
+        from aiosmtpd.controller import Controller
+
+        self._inboxes: dict[str, queue.Queue] = defaultdict(queue.Queue)
+        self._controller = Controller(self, hostname="127.0.0.1", port=port)
+
+    async def handle_DATA(self, server, session, envelope):
+        msg = email.message_from_bytes(envelope.content)
+        match = _OTP.search(msg.get_payload(decode=True).decode())
+        if match:
+            for rcpt in envelope.rcpt_tos:
+                self._inboxes[rcpt.lower()].put(match.group(1))
+        return "250 OK"
+
+    async def next_otp(self, address: str, timeout: float = 10.0) -> str:
+        inbox = self._inboxes[address.lower()]
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return inbox.get_nowait()
+            except queue.Empty:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"no OTP e-mail for {address}")
+                await asyncio.sleep(0.005)
+
+    def start(self) -> None:
+        self._controller.start()
+
+    def stop(self) -> None:
+        self._controller.stop()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _configure(args) -> None:
+    """Environment for app settings; must run before anything imports app.*"""
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "loadtest")
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(args.smtp_port)
+    os.environ["DEBUG_MODE"] = "false"
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    if not args.rate_limits:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+
+def _prepare_database() -> None:
+    import app.models  # noqa: F401  (registers the mappers)
+    from app.db.base import Base
+    from app.db.session import get_engine
+
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+def _use_fakeredis() -> None:
+    import fakeredis
+    import fakeredis.aioredis
+
+    from app.utils import otp
+
+    server = fakeredis.FakeServer()
+    otp.set_redis_client(
+        fakeredis.FakeRedis(server=server, decode_responses=True),
+        fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+    )
+
+
+def _start_server(port: int):
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="loadtest-uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            sys.exit("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+# ─────────────────────────────
+# Virtual users
+# ─────────────────────────────
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, client, label: str, method: str, url: str, **kw):
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kw)
+        except Exception:
+            self.errors[label] += 1
+            raise
+        self.latencies[label].append(time.perf_counter() - started)
+        if resp.status_code >= 400:
+            self.errors[label] += 1
+            resp.raise_for_status()
+        return resp
+
+
+class VirtualUser:
+    def __init__(self, n: int, run_id: str):
+        self.email = f"load{n}-{run_id}@example.com"
+        self.headers: dict[str, str] = {}
+        self.account: str | None = None
+
+    async def onboard(self, client, rec: Recorder, sink: SMTPSink, deposit: float) -> None:
+        creds = {"email": self.email, "password": "load-test-pw"}
+        await rec.call(client, "POST /auth/register", "POST", "/auth/register", json=creds)
+        await rec.call(client, "POST /auth/login", "POST", "/auth/login",
+                       json={"username": self.email, "password": creds["password"]})
+        code = await sink.next_otp(self.email)
+        token = (await rec.call(client, "POST /auth/login/verify", "POST", "/auth/login/verify",
+                                json={"username": self.email, "otp_code": code})).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+        acc = await rec.call(client, "POST /accounts/", "POST", "/accounts/", json={}, headers=self.headers)
+        self.account = acc.json()["account_number"]
+        dep = await rec.call(client, "POST /deposit/deposit/initiate", "POST", "/deposit/deposit/initiate",
+                             json={"account_number": self.account, "amount": deposit}, headers=self.headers)
+        code = await sink.next_otp(self.email)
+        await rec.call(client, "POST /deposit/deposit/confirm", "POST", "/deposit/deposit/confirm",
+                       json={"deposit_id": dep.json()["deposit_id"], "otp": code}, headers=self.headers)
+
+    async def transact(self, client, rec: Recorder, sink: SMTPSink, peers: list[str],
+                       transfers: int, amount: float) -> None:
+        others = [p for p in peers if p != self.account]
+        for _ in range(transfers if others else 0):
+            init = await rec.call(
+                client, "POST /transactions/initiate", "POST", "/transactions/initiate",
+                json={"from_account_number": self.account, "to_account_number": random.choice(others),
+                      "amount": amount},
+                headers=self.headers,
+            )
+            code = await sink.next_otp(self.email)
+            await rec.call(client, "POST /transactions/verify", "POST", "/transactions/verify",
+                           json={"transaction_id": init.json()["transaction_id"], "otp_code": code},
+                           headers=self.headers)
+        await rec.call(client, "GET /transactions/", "GET", "/transactions/?limit=50", headers=self.headers)
+        await rec.call(client, "GET /accounts/", "GET", "/accounts/", headers=self.headers)
+
+
+async def _phase(users, concurrency: int, step) -> tuple[float, int]:
+    """Run ``step(user)`` for every user, at most ``concurrency`` at once."""
+    gate = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def one(user):
+        nonlocal failed
+        async with gate:
+            try:
+                await step(user)
+            except Exception:
+                failed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(u) for u in users))
+    return time.perf_counter() - started, failed
+
+
+async def _drive(args, base_url: str, sink: SMTPSink) -> dict:
+    import httpx
+
+    rec = Recorder()
+    run_id = f"{int(time.time())}"
+    users = [VirtualUser(i, run_id) for i in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        for _ in range(200):
+            if (await client.get("/health/ready")).status_code == 200:
+                break
+            await asyncio.sleep(0.05)
+        onboard_s, onboard_failed = await _phase(
+            users, args.concurrency, lambda u: u.onboard(client, rec, sink, args.transfers * args.amount)
+        )
+        peers = [u.account for u in users if u.headers and u.account]
+        ready = [u for u in users if u.account]
+        transact_s, transact_failed = await _phase(
+            ready, args.concurrency,
+            lambda u: u.transact(client, rec, sink, peers, args.transfers, args.amount),
+        )
+    return _report(args, rec, onboard_s + transact_s, onboard_failed + transact_failed)
+
+
+# ─────────────────────────────
+# Report
+# ─────────────────────────────
+def _percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def _report(args, rec: Recorder, elapsed: float, failed_users: int) -> dict:
+    endpoints = {}
+    for label in sorted(set(rec.latencies) | set(rec.errors)):
+        ordered = sorted(rec.latencies[label])
+        endpoints[label] = {
+            "count": len(ordered),
+            "errors": rec.errors[label],
+            "p50_ms": round(_percentile(ordered, 50) * 1000, 2) if ordered else None,
+            "p95_ms": round(_percentile(ordered, 95) * 1000, 2) if ordered else None,
+            "p99_ms": round(_percentile(ordered, 99) * 1000, 2) if ordered else None,
+            "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else None,
+        }
+    requests = sum(e["count"] for e in endpoints.values())
+    return {
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "transfers_per_user": args.transfers,
+            "database": args.database_url.split("://")[0],
+            "redis": "redis-server" if args.redis_url else "fakeredis",
+            "async_mode": os.getenv("ASYNC_MODE", "false"),
+            "group_commit": os.getenv("SETTLEMENT_GROUP_COMMIT", "false"),
+        },
+        "seconds": round(elapsed, 3),
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else None,
+        "failed_users": failed_users,
+        "endpoints": endpoints,
+    }
+
+def _compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    regressions = []
+    print(f"{'endpoint':34} {'p95 base':>9} {'p95 now':>9} {'Δ':>7}   {'rps base':>9} {'rps now':>9}", file=sys.stderr)
+    for label, now in report["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(label)
+        if not base or not base["p95_ms"] or not now["p95_ms"]:
+            continue
+        change = now["p95_ms"] / base["p95_ms"] - 1
+        print(f"{label:34} {base['p95_ms']:9.1f} {now['p95_ms']:9.1f} {change:+7.0%}   "
+              f"{base['throughput_rps']:9.1f} {now['throughput_rps']:9.1f}", file=sys.stderr)
+        if change > max_regression:
+            regressions.append(f"{label}: p95 {base['p95_ms']} → {now['p95_ms']} ms ({change:+.0%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--transfers", type=int, default=5, help="transfers per user")
+    parser.add_argument("--amount", type=float, default=1.0)
+    parser.add_argument("--database-url", default=None, help="scratch database (default: temporary SQLite)")
+    parser.add_argument("--redis-url", default=None, help="local redis-server (default: fakeredis)")
+    parser.add_argument("--smtp-port", type=int, default=1025)
+    parser.add_argument("--rate-limits", action="store_true", help="keep the rate limiter on")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", default=None, help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p95 increase (0.25 = +25%%)")
+    args = parser.parse_args()
+    args.database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/loadtest.sqlite"
+
+    _configure(args)
+    _prepare_database()
+    if not args.redis_url:
+        _use_fakeredis()
+    sink = SMTPSink(args.smtp_port)
+    sink.start()
+    port = _free_port()
+    server, thread = _start_server(port)
+    try:
+        report = asyncio.run(_drive(args, f"http://127.0.0.1:{port}", sink))
+    finally:
+        server.should_exit = True
+        thread.join(10)
+        sink.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = _compare(report, json.load(fh), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Shared fixtures: the app on a throwaway SQLite file, fakeredis instead of
+Redis, no SMTP, and every request checked against its @query_budget by
+app/testing/pytest_plugin.py.
+"""
+import os
+import tempfile
+
+# Settings are read when app.core.config is first imported, so this runs before any app import
+_DB_DIR = tempfile.mkdtemp(prefix="securebank-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_DB_DIR}/test.sqlite",
+    SECRET_KEY="test-secret",
+    SMTP_HOST="",                      # enqueue_email skips delivery
+    DEBUG_MODE="false",
+    RATE_LIMIT_ENABLED="false",
+    PASSWORD_POOL_WORKERS="0",         # hash inline, no process pool
+    METRICS_ENABLED="false",
+)
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from fastapi.testclient import TestClient
+
+pytest_plugins = ["app.testing.pytest_plugin"]
+
+OTP_CODE = "123456"
+PASSWORD = "correct horse"
+
+
+@pytest.fixture(autouse=True)
+def redis_client():
+    from app.utils import otp
+
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    otp.set_redis_client(client, fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    yield client
+    otp.set_redis_client(None, None)
+
+
+@pytest.fixture(autouse=True)
+def fixed_otp(monkeypatch):
+    from app.utils import otp
+
+    monkeypatch.setattr(otp, "_generate_otp", lambda: OTP_CODE)
+    return OTP_CODE
+
+
+@pytest.fixture(autouse=True)
+def database():
+    import app.models  # noqa: F401  (registers every mapper)
+    from app.db.base import Base
+    from app.db.session import get_engine
+    from app.services.balance_shards import _shard_map
+    from app.services.principal_cache import clear_principal_cache
+
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    # Ids restart with every schema, so nothing cached may outlive it
+    clear_principal_cache()
+    _shard_map.clear()
+    yield engine
+
+
+@pytest.fixture
+def db(database):
+    from app.db.session import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager: the lifespan would start background
+    # tasks and close the fake Redis clients on shutdown
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def aio_client(monkeypatch):
+    """TestClient for a second app built with ASYNC_MODE on, so the aio twins shadow the sync routes."""
+    import importlib.util
+
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "ASYNC_MODE", True)
+    spec = importlib.util.find_spec("app.main")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return TestClient(module.app)
+
+
+@pytest.fixture
+def signup(client):
+    """``signup(email)`` registers and logs a user in; returns their auth headers."""
+    def _signup(email: str) -> dict:
+        assert client.post("/auth/register", json={"email": email, "password": PASSWORD}).status_code == 200
+        assert client.post("/auth/login", json={"username": email, "password": PASSWORD}).status_code == 200
+        resp = client.post("/auth/login/verify", json={"username": email, "otp_code": OTP_CODE})
+        assert resp.status_code == 200, resp.text
+        return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    return _signup
+
+
+@pytest.fixture
+def open_account(client):
+    """``open_account(headers, deposit=0, number=None)`` creates an account (optionally funded); returns its number."""
+    def _open(headers: dict, deposit: float = 0.0, number: str | None = None) -> str:
+        resp = client.post("/accounts/", json={"account_number": number} if number else {}, headers=headers)
+        assert resp.status_code == 200, resp.text
+        number = resp.json()["account_number"]
+        if deposit:
+            dep = client.post("/deposit/deposit/initiate", json={"account_number": number, "amount": deposit},
+                              headers=headers)
+            assert dep.status_code == 200, dep.text
+            confirm = client.post("/deposit/deposit/confirm",
+                                  json={"deposit_id": dep.json()["deposit_id"], "otp": OTP_CODE}, headers=headers)
+            assert confirm.status_code == 200, confirm.text
+        return number
+    return _open
@@ -0,0 +1,46 @@
+"""
+Only allocated-looking numbers are check-digit validated; accounts opened
+with client-picked numbers keep working.
+"""
+import pytest
+
+from app.services.account_numbers import allocate_account_number, is_valid_account_number
+from tests.conftest import OTP_CODE, PASSWORD
+
+
+def test_allocated_numbers_are_luhn_checked(db):
+    number = allocate_account_number(db)
+    assert is_valid_account_number(number)
+    typo = number[:-1] + str((int(number[-1]) + 1) % 10)
+    assert not is_valid_account_number(typo)
+
+
+@pytest.mark.parametrize("number", ["12345678", "ACC-0001", "0123456789", "123456789012"])
+def test_other_shapes_are_left_to_the_lookup(number):
+    assert is_valid_account_number(number)
+
+
+def test_transfer_from_custom_numbered_account(client, signup, open_account):
+    alice, bob = signup("alice@example.com"), signup("bob@example.com")
+    src = open_account(alice, deposit=50, number="ALICE-001")
+    dst = open_account(bob, number="12345678")
+
+    resp = client.post("/transactions/initiate", headers=alice,
+                       json={"from_account_number": src, "to_account_number": dst, "amount": 20})
+    assert resp.status_code == 201, resp.text
+    resp = client.post("/transactions/verify", headers=alice,
+                       json={"transaction_id": resp.json()["transaction_id"], "otp_code": OTP_CODE,
+                             "password": PASSWORD})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["status"] == "completed"
+
+
+def test_unknown_and_mistyped_numbers(client, signup, open_account):
+    alice = signup("alice@example.com")
+    src = open_account(alice, deposit=50)
+    typo = src[:-1] + str((int(src[-1]) + 1) % 10)
+
+    for dst, status in (("NOPE-404", 404), (typo, 400)):
+        resp = client.post("/transactions/initiate", headers=alice,
+                           json={"from_account_number": src, "to_account_number": dst, "amount": 1})
+        assert resp.status_code == status, resp.text
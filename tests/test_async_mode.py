@@ -0,0 +1,80 @@
+"""
+The same flows with ASYNC_MODE on: every request is served by its twin in
+app/api/endpoints/aio.py and still has to stay within its query budget.
+"""
+import gzip
+
+import pytest
+
+from app.api.endpoints import aio
+from tests.conftest import OTP_CODE, PASSWORD
+
+
+@pytest.fixture
+def client(aio_client):
+    # signup / open_account go through the async app as well
+    return aio_client
+
+
+def _served_by_aio(client, method: str, path: str) -> bool:
+    for route in client.app.routes:
+        if getattr(route, "path", None) == path and method in getattr(route, "methods", ()):
+            return route.endpoint.__module__ == aio.__name__
+    return False
+
+
+@pytest.mark.parametrize("method, path", [
+    ("POST", "/auth/register"),
+    ("POST", "/accounts/"),
+    ("DELETE", "/accounts/{account_id}"),
+    ("GET", "/transactions/"),
+    ("POST", "/transactions/batch/initiate"),
+    ("POST", "/transactions/batch/verify"),
+    ("GET", "/transactions/export"),
+])
+def test_routes_have_async_twins(client, method, path):
+    assert _served_by_aio(client, method, path)
+
+
+def test_accounts_and_transfer(client, signup, open_account):
+    alice, bob = signup("alice@example.com"), signup("bob@example.com")
+    src, dst = open_account(alice, deposit=100), open_account(bob)
+    spare = client.post("/accounts/", json={}, headers=alice).json()
+
+    resp = client.post("/transactions/initiate", headers=alice,
+                       json={"from_account_number": src, "to_account_number": dst, "amount": 40})
+    assert resp.status_code == 201, resp.text
+    resp = client.post("/transactions/verify", headers=alice,
+                       json={"transaction_id": resp.json()["transaction_id"], "otp_code": OTP_CODE,
+                             "password": PASSWORD})
+    assert resp.status_code == 200, resp.text
+
+    assert client.delete(f"/accounts/{spare['id']}", headers=alice).status_code == 204
+    balances = {a["account_number"]: a["balance"] for a in client.get("/accounts/", headers=alice).json()}
+    assert balances == {src: 60}
+
+
+def test_batch_history_and_export(client, signup, open_account):
+    alice, bob = signup("alice@example.com"), signup("bob@example.com")
+    src = open_account(alice, deposit=100)
+    payees = [open_account(bob) for _ in range(3)]
+
+    resp = client.post("/transactions/batch/initiate", headers=alice, json={
+        "from_account_number": src,
+        "legs": [{"to_account_number": dst, "amount": 10} for dst in payees],
+    })
+    assert resp.status_code == 201, resp.text
+    resp = client.post("/transactions/batch/verify", headers=alice,
+                       json={"batch_id": resp.json()["batch_id"], "otp_code": OTP_CODE, "password": PASSWORD})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["completed"] == 3
+
+    first = client.get("/transactions/?limit=2", headers=alice)
+    assert first.status_code == 200 and len(first.json()) == 2
+    rest = client.get("/transactions/", headers=alice, params={"cursor": first.headers["X-Next-Cursor"]})
+    assert len(rest.json()) == 1 and "X-Next-Cursor" not in rest.headers
+
+    export = client.get("/transactions/export?gzip=true", headers=alice)
+    assert export.status_code == 200
+    lines = gzip.decompress(export.content).decode().strip().splitlines()
+    assert lines[0].startswith("id,timestamp") and len(lines) == 4
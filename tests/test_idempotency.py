@@ -0,0 +1,36 @@
+"""Idempotency-Key on the initiate endpoints: successes replay, failures do not stick."""
+from tests.conftest import OTP_CODE
+
+
+def test_success_is_replayed(client, signup, open_account):
+    alice, bob = signup("alice@example.com"), signup("bob@example.com")
+    src, dst = open_account(alice, deposit=50), open_account(bob)
+    body = {"from_account_number": src, "to_account_number": dst, "amount": 5}
+    headers = {**alice, "Idempotency-Key": "pay-1"}
+
+    first = client.post("/transactions/initiate", headers=headers, json=body)
+    again = client.post("/transactions/initiate", headers=headers, json=body)
+    assert first.status_code == again.status_code == 201
+    assert again.json() == first.json()
+    assert again.headers["Idempotent-Replayed"] == "true"
+
+    other = client.post("/transactions/initiate", headers=headers, json={**body, "amount": 6})
+    assert other.status_code == 422
+
+
+def test_client_error_is_not_cached(client, signup, open_account):
+    alice, bob = signup("alice@example.com"), signup("bob@example.com")
+    src, dst = open_account(alice, deposit=10), open_account(bob)
+    body = {"from_account_number": src, "to_account_number": dst, "amount": 30}
+    headers = {**alice, "Idempotency-Key": "pay-2"}
+
+    resp = client.post("/transactions/initiate", headers=headers, json=body)
+    assert resp.status_code == 400 and resp.json()["detail"] == "Insufficient balance"
+
+    dep = client.post("/deposit/deposit/initiate", json={"account_number": src, "amount": 50}, headers=alice)
+    client.post("/deposit/deposit/confirm", json={"deposit_id": dep.json()["deposit_id"], "otp": OTP_CODE},
+                headers=alice)
+
+    resp = client.post("/transactions/initiate", headers=headers, json=body)
+    assert resp.status_code == 201, resp.text
+    assert "Idempotent-Replayed" not in resp.headers
@@ -0,0 +1,33 @@
+"""Sync callers never queue on the bcrypt pool; awaiting callers may."""
+import asyncio
+import time
+
+import pytest
+
+from app.core import password_pool
+from app.core.config import settings
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_POOL_WORKERS", 1)
+    monkeypatch.setattr(password_pool, "_slots", None)
+    password_pool.submit(time.sleep, 0).result(timeout=30)       # spawn the worker up front
+    yield
+    password_pool.shutdown_password_pool()
+
+
+def test_sync_caller_fails_fast_while_worker_is_busy(one_worker):
+    busy = password_pool.submit(time.sleep, 1)
+    started = time.monotonic()
+    with pytest.raises(password_pool.PasswordPoolBusy):
+        password_pool.run(time.sleep, 0)
+    assert time.monotonic() - started < 0.5
+
+    # Awaiting callers queue behind it instead
+    asyncio.run(password_pool.run_async(time.sleep, 0))
+    assert busy.done()
+
+
+def test_sync_caller_runs_on_idle_worker(one_worker):
+    assert password_pool.run(sum, [1, 2]) == 3
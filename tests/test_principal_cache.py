@@ -0,0 +1,56 @@
+"""Cross-worker invalidation of cached principals."""
+import logging
+import time
+
+import pytest
+import redis
+
+from app.core.config import settings
+from app.services import principal_cache as pc
+from app.utils import otp
+
+
+def _principal(email: str) -> pc.Principal:
+    return pc.Principal(id=1, email=email, is_active=True, is_admin=False, created_at=None)
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+@pytest.fixture
+def shared_tier(monkeypatch):
+    monkeypatch.setattr(settings, "PRINCIPAL_CACHE_REDIS", True)
+    monkeypatch.setattr(pc, "_RETRY_SECONDS", 0.05)
+    yield
+    pc.stop_principal_listener()
+
+
+def test_listener_needs_shared_tier(monkeypatch):
+    monkeypatch.setattr(settings, "PRINCIPAL_CACHE_REDIS", False)
+    pc.start_principal_listener()
+    assert pc._listener is None
+
+
+def test_listener_applies_remote_invalidations(shared_tier, redis_client):
+    pc.start_principal_listener()
+    assert _wait_for(lambda: redis_client.pubsub_numsub(pc._CHANNEL)[0][1] == 1)
+
+    pc._local.set("alice@example.com", _principal("alice@example.com"), pc._local.generation)
+    redis_client.publish(pc._CHANNEL, "alice@example.com")     # another worker committed a change
+    assert _wait_for(lambda: pc._local.get("alice@example.com") is None)
+
+
+def test_outage_keeps_tier_one_and_warns_once(shared_tier, caplog):
+    otp.set_redis_client(redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1))
+    pc._local.set("alice@example.com", _principal("alice@example.com"), pc._local.generation)
+
+    with caplog.at_level(logging.WARNING, logger=pc.__name__):
+        pc.start_principal_listener()
+        time.sleep(0.5)                                         # several retries
+    assert pc._local.get("alice@example.com") is not None
+    assert len([r for r in caplog.records if "lost redis" in r.getMessage()]) == 1
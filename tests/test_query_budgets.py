@@ -0,0 +1,104 @@
+"""
+The hot endpoints stay within their @query_budget declarations.
+
+Nothing here asserts on statement counts directly: the pytest plugin fails
+any test whose requests exceed their endpoint's budget or repeat a
+statement (N+1). These tests only have to drive each endpoint end to end.
+"""
+import pytest
+from sqlalchemy import select
+
+from app.core.query_budget import QueryBudgetExceeded
+from app.models.account import BankAccount
+from tests.conftest import OTP_CODE, PASSWORD
+
+
+@pytest.fixture
+def alice(signup):
+    return signup("alice@example.com")
+
+@pytest.fixture
+def bob(signup):
+    return signup("bob@example.com")
+
+
+def test_register_and_login(client):
+    assert client.post("/auth/register", json={"email": "carol@example.com", "password": PASSWORD}).status_code == 200
+    assert client.post("/auth/login", json={"username": "carol@example.com", "password": PASSWORD}).status_code == 200
+    resp = client.post("/auth/login/verify", json={"username": "carol@example.com", "otp_code": OTP_CODE})
+    assert resp.status_code == 200
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {resp.json()['access_token']}"}).status_code == 200
+
+
+def test_list_accounts_cold_and_cached(client, alice, open_account):
+    numbers = {open_account(alice) for _ in range(3)}
+    for _ in range(2):        # cache miss, then hit
+        resp = client.get("/accounts/", headers=alice)
+        assert resp.status_code == 200
+        assert {a["account_number"] for a in resp.json()} == numbers
+
+
+def test_transfer_initiate_and_verify(client, alice, bob, open_account):
+    src = open_account(alice, deposit=100)
+    dst = open_account(bob)
+
+    resp = client.post("/transactions/initiate", headers=alice,
+                       json={"from_account_number": src, "to_account_number": dst, "amount": 40, "reference": "rent"})
+    assert resp.status_code == 201, resp.text
+    resp = client.post("/transactions/verify", headers=alice,
+                       json={"transaction_id": resp.json()["transaction_id"], "otp_code": OTP_CODE,
+                             "password": PASSWORD})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["status"] == "completed"
+
+    balances = {a["account_number"]: a["balance"] for a in client.get("/accounts/", headers=bob).json()}
+    assert balances[dst] == 40
+
+
+def test_batch_initiate_and_verify(client, alice, bob, open_account):
+    src = open_account(alice, deposit=100)
+    payees = [open_account(bob) for _ in range(5)]
+
+    resp = client.post("/transactions/batch/initiate", headers=alice, json={
+        "from_account_number": src,
+        "legs": [{"to_account_number": dst, "amount": 10, "reference": f"leg {i}"} for i, dst in enumerate(payees)],
+    })
+    assert resp.status_code == 201, resp.text
+    resp = client.post("/transactions/batch/verify", headers=alice,
+                       json={"batch_id": resp.json()["batch_id"], "otp_code": OTP_CODE, "password": PASSWORD})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["completed"] == 5
+
+
+def test_history_does_not_grow_with_rows(client, alice, bob, open_account, query_budget):
+    src = open_account(alice, deposit=100)
+    dst = open_account(bob)
+    for _ in range(4):
+        tx = client.post("/transactions/initiate", headers=alice,
+                         json={"from_account_number": src, "to_account_number": dst, "amount": 1})
+        client.post("/transactions/verify", headers=alice,
+                    json={"transaction_id": tx.json()["transaction_id"], "otp_code": OTP_CODE, "password": PASSWORD})
+
+    with query_budget(3):
+        resp = client.get("/transactions/?limit=500", headers=alice)
+    assert resp.status_code == 200
+    assert len(resp.json()) == 4
+
+
+def test_n_plus_one_loop_is_reported(db, alice, open_account, query_budget):
+    numbers = [open_account(alice) for _ in range(3)]
+
+    def balances():
+        # One SELECT per account: the shape the detector exists to catch
+        return [db.execute(select(BankAccount.balance).where(BankAccount.account_number == n)).scalar_one()
+                for n in numbers]
+
+    with query_budget() as budget:
+        balances()
+    [(statement, seen)] = budget.repeated().items()
+    assert seen.count == 3
+    assert any("(N+1?)" in finding for finding in budget.findings())
+
+    with pytest.raises(QueryBudgetExceeded, match="budget is 2"):
+        with query_budget(2):
+            balances()
@@ -0,0 +1,43 @@
+"""New-payee screening covers every destination of a batch."""
+import pytest
+
+from app.core.config import settings
+from tests.conftest import OTP_CODE, PASSWORD
+
+
+@pytest.fixture
+def accounts(signup, open_account):
+    alice, bob = signup("alice@example.com"), signup("bob@example.com")
+    return alice, open_account(alice, deposit=4000), [open_account(bob) for _ in range(2)]
+
+def _batch(client, headers, src, legs):
+    resp = client.post("/transactions/batch/initiate", headers=headers, json={
+        "from_account_number": src,
+        "legs": [{"to_account_number": dst, "amount": amount} for dst, amount in legs],
+    })
+    assert resp.status_code == 201, resp.text
+    return resp.json()
+
+
+def test_new_payee_in_batch_steps_up(client, accounts):
+    alice, src, (big, small) = accounts
+    # Split legs still add up to the threshold for that destination
+    batch = _batch(client, alice, src, [(big, 600), (big, 600), (small, 10)])
+    assert batch["step_up"]
+
+    verify = {"batch_id": batch["batch_id"], "otp_code": OTP_CODE}
+    assert client.post("/transactions/batch/verify", headers=alice, json=verify).status_code == 401
+    resp = client.post("/transactions/batch/verify", headers=alice, json={**verify, "password": PASSWORD})
+    assert resp.status_code == 200, resp.text
+
+
+def test_small_legs_do_not_step_up(client, accounts):
+    alice, src, payees = accounts
+    assert not _batch(client, alice, src, [(dst, 10) for dst in payees])["step_up"]
+
+
+def test_known_payees_do_not_step_up(client, accounts, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_NEW_PAYEE_SECONDS", 0)     # new only until first paid
+    alice, src, payees = accounts
+    assert _batch(client, alice, src, [(dst, 1000) for dst in payees])["step_up"]
+    assert not _batch(client, alice, src, [(dst, 1000) for dst in payees])["step_up"]
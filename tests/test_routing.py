@@ -0,0 +1,39 @@
+"""Read-replica routing never probes on the request path."""
+import pytest
+
+from app.db import routing
+
+
+@pytest.fixture
+def replica_set(tmp_path, monkeypatch):
+    rs = routing.ReplicaSet([f"sqlite:///{tmp_path}/replica.sqlite", f"sqlite:///{tmp_path}/missing/replica.sqlite"])
+    monkeypatch.setattr(routing, "replicas", rs)
+    yield rs
+    rs.dispose()
+
+
+def test_pick_does_not_connect(replica_set, monkeypatch):
+    monkeypatch.setattr(routing._Replica, "probe", lambda self: pytest.fail("probed on the request path"))
+    assert replica_set.pick() is not None
+
+
+def test_probe_marks_unreachable_replica_down(replica_set):
+    up, down = replica_set.replicas
+    replica_set.probe_all()
+    assert up.healthy() and not down.healthy()
+    assert {replica_set.pick() for _ in range(4)} == {up.engine}
+
+
+def test_no_pin_lookup_without_a_healthy_replica(replica_set, monkeypatch):
+    for replica in replica_set.replicas:
+        replica.mark_down()
+    monkeypatch.setattr(routing, "is_pinned", lambda subject: pytest.fail("asked redis for a pin"))
+    session = routing.read_session("alice@example.com")
+    assert session.get_bind() is routing.SessionLocal().get_bind()
+    session.close()
+
+
+def test_pinned_user_reads_from_primary(replica_set):
+    routing.pin_primary("alice@example.com")
+    assert routing.read_session("alice@example.com").get_bind() not in {r.engine for r in replica_set.replicas}
+    assert routing.read_session("bob@example.com").get_bind() in {r.engine for r in replica_set.replicas}
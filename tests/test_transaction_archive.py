@@ -0,0 +1,38 @@
+"""The cold-archive reader behind GET /transactions/export?archived=true."""
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.services.transaction_archive import ARCHIVE_COLUMNS, archive_path, iter_archived_transactions, write_archive
+
+COLUMNS = ARCHIVE_COLUMNS["transactions"]
+
+
+def _archive(root, *timestamps):
+    rows = [(i, "11111111", "22222222", 1.0, None, ts, "completed", None)
+            for i, ts in enumerate(sorted(timestamps, reverse=True), 1)]
+    write_archive(archive_path("transactions", timestamps[0], root), COLUMNS, rows)
+
+
+def test_aware_bounds_compare_as_utc(tmp_path):
+    _archive(tmp_path, datetime(2024, 3, 10, 12), datetime(2024, 3, 20, 12))
+    # 10:00 at UTC-3 is 13:00 UTC: after the first row, before the second
+    since = datetime(2024, 3, 10, 10, tzinfo=timezone(timedelta(hours=-3)))
+    until = datetime(2024, 4, 1, tzinfo=timezone.utc)
+
+    chunks = list(iter_archived_transactions(["11111111"], ("id", "timestamp"), since=since, until=until,
+                                             root=tmp_path))
+    assert chunks == [[(1, datetime(2024, 3, 20, 12))]]
+
+
+def test_export_with_aware_since(client, signup, open_account, tmp_path, monkeypatch):
+    alice = signup("alice@example.com")
+    number = open_account(alice)
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    rows = [(1, number, "22222222", 5.0, "old", datetime(2024, 3, 20, 12), "completed", None)]
+    write_archive(archive_path("transactions", datetime(2024, 3, 1), tmp_path), COLUMNS, rows)
+
+    resp = client.get("/transactions/export", headers=alice,
+                      params={"archived": "true", "since": "2024-03-01T00:00:00Z"})
+    assert resp.status_code == 200
+    lines = resp.text.strip().splitlines()
+    assert len(lines) == 2 and "old" in lines[1]